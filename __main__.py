@@ -1,11 +1,221 @@
 import sys
+from argparse import ArgumentParser, ArgumentTypeError
 
-from PyQt5.QtWidgets import QApplication
-
-from qt_classes.main_window import MainWindow
+from settings import Settings
 
 MAX_BYTES = 10 ** 6
+# Any other arguments are the GUI's.
+_COMMANDS = ("render", "benchmark", "-h", "--help")
+
+
+def _positive_int(text) -> int:
+    value = _int(text)
+    if value <= 0:
+        raise ArgumentTypeError(f"must be positive, not {value}")
+    return value
+
+
+def _non_negative_int(text) -> int:
+    value = _int(text)
+    if value < 0:
+        raise ArgumentTypeError(f"must not be negative, not {value}")
+    return value
+
+
+def _int(text) -> int:
+    try:
+        return int(text)
+    except ValueError:
+        raise ArgumentTypeError(f"invalid int value: {text!r}") from None
+
+
+def _create_parser():
+    parser = ArgumentParser(
+        prog="bitviewer",
+        description="A python bit viewer.",
+        epilog="Without a command, the GUI is opened: "
+        "bitviewer [file] [--offset N] [--row-width N] [--bit-size N]",
+    )
+    subparsers = parser.add_subparsers(dest="command")
+
+    render = subparsers.add_parser(
+        "render", help="Render a file to a PNG or PGM image without a GUI."
+    )
+    render.add_argument("file")
+    render.add_argument("output", help="The image file, .png or .pgm")
+    render.add_argument("--format", choices=["png", "pgm"])
+    render.add_argument("--max-bytes", type=int, default=0)
+    render.add_argument(
+        "--transforms",
+        default="",
+        help="Transforms applied to the data, e.g. 'manchester | descramble:12,17'.",
+    )
+    render.add_argument("--offset", type=_non_negative_int, default=0)
+    render.add_argument("--row-width", type=_positive_int, default=Settings.row_width)
+    render.add_argument("--bit-size", type=_positive_int, default=1)
+    render.add_argument(
+        "--symbol-bits",
+        type=int,
+        default=1,
+        choices=[1, 2, 4, 8],
+        help="The number of bits shown by each cell.",
+    )
+    render.add_argument(
+        "--compare", help="Render the XOR of the file and this file instead."
+    )
+    render.add_argument(
+        "--compare-shift",
+        type=int,
+        default=0,
+        help="Compare bit i of the compared file to bit i + n of the file.",
+    )
+    render.add_argument(
+        "--show-missing",
+        action="store_true",
+        help="Show bits that only one of the compared files has in their own color.",
+    )
+    render.add_argument(
+        "--frames",
+        default="",
+        help="Start rows where frames start, e.g. 'sync:0x47', 'length:16,16,4' "
+        "or 'file:frames.txt'. The offset is then into each frame.",
+    )
+    render.add_argument("--start-row", type=_non_negative_int, default=0)
+    render.add_argument("--rows", type=_positive_int)
+    render.add_argument("--start-column", type=_non_negative_int, default=0)
+    render.add_argument("--columns", type=_positive_int)
+    render.add_argument(
+        "--bit-borders-start",
+        type=int,
+        default=Settings.bit_borders_start,
+        help="The minimal bit size for drawing borders around bits.",
+    )
+    render.add_argument("--grid-width", type=_non_negative_int, default=0)
+    render.add_argument("--grid-h-offset", type=_non_negative_int, default=0)
+    render.add_argument("--grid-height", type=_non_negative_int, default=0)
+    render.add_argument("--grid-v-offset", type=_non_negative_int, default=0)
+    render.add_argument("--compress-level", type=int, default=6, choices=range(10))
+
+    benchmark = subparsers.add_parser(
+        "benchmark", help="Time the rendering hot path, offscreen."
+    )
+    benchmark.add_argument(
+        "--filter", default="", help="Only run cases with this text in their name."
+    )
+    benchmark.add_argument("--output", help="Save the results to this JSON file.")
+    benchmark.add_argument(
+        "--baseline",
+        help="Compare to the results in this JSON file, failing on regressions.",
+    )
+    benchmark.add_argument(
+        "--tolerance",
+        type=float,
+        help="The allowed slowdown relative to the baseline, 0.25 by default.",
+    )
+    return parser
+
+
+def _create_gui_parser():
+    parser = ArgumentParser(prog="bitviewer", description="A python bit viewer.")
+    parser.add_argument("file", nargs="?", help="A file to open.")
+    parser.add_argument("--offset", type=_non_negative_int, help="The first bit shown.")
+    parser.add_argument("--row-width", type=_positive_int)
+    parser.add_argument("--bit-size", type=_positive_int)
+    return parser
+
+
+def _render(args):
+    from renderer import RenderOptions, render_file
+    from frames import parse_framing
+    from transforms import parse_transforms
+
+    options = RenderOptions(
+        offset=args.offset,
+        row_width=args.row_width,
+        bit_size=args.bit_size,
+        start_row=args.start_row,
+        rows=args.rows,
+        start_column=args.start_column,
+        columns=args.columns,
+        bit_borders=args.bit_size >= args.bit_borders_start,
+        grid_width=args.grid_width,
+        grid_h_offset=args.grid_h_offset,
+        grid_height=args.grid_height,
+        grid_v_offset=args.grid_v_offset,
+        symbol_bits=args.symbol_bits,
+        show_missing=args.show_missing,
+    )
+    render_file(
+        args.file,
+        args.output,
+        options,
+        args.format,
+        args.max_bytes,
+        args.compress_level,
+        parse_transforms(args.transforms),
+        args.compare,
+        args.compare_shift,
+        parse_framing(args.frames),
+    )
+
+
+def _benchmark(args):
+    import benchmark
+
+    tolerance = benchmark.DEFAULT_TOLERANCE
+    if args.tolerance is not None:
+        tolerance = args.tolerance
+    baseline = benchmark.load(args.baseline) if args.baseline else None
+
+    application = benchmark.create_gui_application()
+    results = benchmark.run(args.filter)
+    del application
+    if args.output:
+        benchmark.save(results, args.output)
+    if baseline is None:
+        return 0
+
+    comparisons = benchmark.compare(results, baseline)
+    print()
+    benchmark.print_comparisons(comparisons, tolerance)
+    regressions = [c for c in comparisons if c.is_regression(tolerance)]
+    if regressions:
+        print(f"{len(regressions)} of {len(comparisons)} cases regressed")
+        return 1
+    return 0
+
+
+def _run_gui(argv):
+    from PyQt5.QtWidgets import QApplication
+    from qt_classes.main_window import MainWindow
+
+    # QApplication removes the arguments it handles.
+    app = QApplication(argv)
+    args = _create_gui_parser().parse_args(app.arguments()[1:])
+    window = MainWindow()
+    if args.file is not None:
+        window.open_file(args.file, args.offset, args.row_width, args.bit_size)
+    app.exec()
+
+
+def main(argv):
+    parser = _create_parser()
+    if len(argv) < 2 or argv[1] not in _COMMANDS:
+        _run_gui(argv)
+        return
+
+    args = parser.parse_args(argv[1:])
+    if args.command == "render":
+        try:
+            _render(args)
+        except (OSError, ValueError) as e:
+            parser.exit(1, f"{parser.prog}: error: {e}\n")
+    elif args.command == "benchmark":
+        try:
+            sys.exit(_benchmark(args))
+        except (OSError, ValueError, KeyError) as e:
+            parser.exit(1, f"{parser.prog}: error: {e}\n")
+
 
-app = QApplication(sys.argv)
-window = MainWindow()
-app.exec()
+if __name__ == "__main__":
+    main(sys.argv)
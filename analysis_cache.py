@@ -0,0 +1,151 @@
+import hashlib
+import json
+import os
+from threading import Lock, get_ident
+from typing import Dict, Optional, Sequence
+
+import numpy as np
+
+# Entries of other versions are never read, and are evicted like old entries.
+CACHE_VERSION = 1
+_SAMPLES = 16
+_SAMPLE_BYTES = 2 ** 12
+_ARRAYS_SUFFIX = ".npz"
+_JSON_SUFFIX = ".json"
+
+
+def file_identity(filename) -> str:
+    # The path, size and modification time of the file, and samples of its
+    # content spread over the whole file, so a file rewritten within the
+    # resolution of the modification time is told apart too.
+    path = os.path.abspath(filename)
+    with open(path, "rb") as f:
+        stat = os.fstat(f.fileno())
+        digest = hashlib.blake2b(digest_size=16)
+        digest.update(repr((path, stat.st_size, stat.st_mtime_ns)).encode())
+        last = max(stat.st_size - _SAMPLE_BYTES, 0)
+        for i in range(_SAMPLES):
+            f.seek(last * i // (_SAMPLES - 1))
+            digest.update(f.read(_SAMPLE_BYTES))
+    return digest.hexdigest()
+
+
+class AnalysisCache:
+    # Data derived from files, kept between runs in a directory. Entries are
+    # found by a key, e.g. the file identity and the transforms, and a name, and
+    # the least recently used entries are deleted when the directory grows past
+    # max_bytes. A max_bytes of 0 disables the cache.
+
+    def __init__(self, directory, max_bytes: int) -> None:
+        super().__init__()
+        self._directory = directory
+        self._max_bytes = max_bytes
+        self._lock = Lock()
+
+    @property
+    def directory(self):
+        return self._directory
+
+    @property
+    def max_bytes(self) -> int:
+        return self._max_bytes
+
+    @max_bytes.setter
+    def max_bytes(self, max_bytes: int):
+        self._max_bytes = max_bytes
+        with self._lock:
+            self._evict()
+
+    def load(self, key: Sequence, name: str) -> Optional[Dict[str, np.ndarray]]:
+        filename = self._read_filename(key, name, _ARRAYS_SUFFIX)
+        if filename is None:
+            return None
+        try:
+            with np.load(filename, allow_pickle=False) as arrays:
+                return {array: arrays[array] for array in arrays.files}
+        except (OSError, ValueError, KeyError):
+            return None
+
+    def save(self, key: Sequence, name: str, arrays: Dict[str, np.ndarray]):
+        self._write(key, name, _ARRAYS_SUFFIX, lambda f: np.savez(f, **arrays))
+
+    def load_json(self, key: Sequence, name: str):
+        filename = self._read_filename(key, name, _JSON_SUFFIX)
+        if filename is None:
+            return None
+        try:
+            with open(filename) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def save_json(self, key: Sequence, name: str, value):
+        self._write(
+            key, name, _JSON_SUFFIX, lambda f: f.write(json.dumps(value).encode())
+        )
+
+    def _filename(self, key, name, suffix):
+        key = repr((CACHE_VERSION,) + tuple(key)).encode()
+        digest = hashlib.blake2b(key, digest_size=16).hexdigest()
+        return os.path.join(self._directory, f"{digest}.{name}{suffix}")
+
+    def _read_filename(self, key, name, suffix) -> Optional[str]:
+        if not self._max_bytes:
+            return None
+        filename = self._filename(key, name, suffix)
+        try:
+            # Marks the entry as recently used.
+            os.utime(filename)
+        except OSError:
+            return None
+        return filename
+
+    def _write(self, key, name, suffix, write):
+        if not self._max_bytes:
+            return
+        filename = self._filename(key, name, suffix)
+        # Written aside and then renamed, so a partial entry is never read.
+        temp_filename = f"{filename}.{os.getpid()}.{get_ident()}.tmp"
+        try:
+            os.makedirs(self._directory, exist_ok=True)
+            with open(temp_filename, "wb") as f:
+                write(f)
+            os.replace(temp_filename, filename)
+        except OSError:
+            _remove(temp_filename)
+            return
+        with self._lock:
+            self._evict()
+
+    def _entries(self):
+        try:
+            names = os.listdir(self._directory)
+        except OSError:
+            return []
+        entries = []
+        for name in names:
+            if not name.endswith((_ARRAYS_SUFFIX, _JSON_SUFFIX)):
+                continue
+            filename = os.path.join(self._directory, name)
+            try:
+                stat = os.stat(filename)
+            except OSError:
+                continue
+            entries.append((filename, stat.st_size, stat.st_mtime))
+        return entries
+
+    def _evict(self):
+        entries = sorted(self._entries(), key=lambda entry: entry[2])
+        used = sum(size for _, size, _ in entries)
+        for filename, size, _ in entries:
+            if used <= self._max_bytes:
+                break
+            _remove(filename)
+            used -= size
+
+
+def _remove(filename):
+    try:
+        os.remove(filename)
+    except OSError:
+        pass
@@ -1,21 +1,372 @@
 from math import ceil
-from typing import Optional, List, Iterable
+from typing import Optional, List, Sequence, Tuple
 
-from bitmap import Bitmap
+import numpy as np
+
+from analysis_cache import AnalysisCache, file_identity
+from autocorrelation import AutocorrelationResult, find_periods
+from bit_export import Selection, export_range, export_rows
+from bit_extraction import extract_rows_into
+from bitmap import Bitmap, DensityMap
+from compare import CompareDataSource, DifferenceIndex, build_difference_index
+from compressed_data_source import CompressedDataSource
+from data_source import DataSource, open_data_source
+from density_pyramid import DensityPyramid
+from frames import FileFraming, FrameIndex, Framing
+from transforms import Transform, apply_transforms, format_transforms
 
 
 class App:
-    def __init__(self) -> None:
+    def __init__(self, cache: Optional[AnalysisCache] = None) -> None:
         super().__init__()
-        self._data: Optional[bytes] = None
+        # Keeps derived data, e.g. the density pyramid, between runs.
+        self._cache = cache
+        self._filename: Optional[str] = None
+        self._file_id: Optional[str] = None
+        self._max_bytes = 0
+        self._transforms: List[Transform] = []
+        self._source: Optional[DataSource] = None
+        self._data: Optional[DataSource] = None
+        self._density_pyramid: Optional[DensityPyramid] = None
+        self._compare_filename: Optional[str] = None
+        self._compare_source: Optional[DataSource] = None
+        self._compare_file_id: Optional[str] = None
+        self._compare_shift = 0
+        self._difference_index: Optional[DifferenceIndex] = None
+        self._density_pyramid_saved = False
+        # Rows start where the frames start, once they are indexed.
+        self._framing: Optional[Framing] = None
+        self._frame_index: Optional[FrameIndex] = None
+        self._framing_error: Optional[str] = None
+
+    @property
+    def filename(self) -> Optional[str]:
+        return self._filename
+
+    @property
+    def max_bytes(self) -> int:
+        return self._max_bytes
+
+    @property
+    def transforms(self) -> List[Transform]:
+        return list(self._transforms)
+
+    @property
+    def data(self) -> Optional[DataSource]:
+        # The viewed data, after the transforms and any comparison.
+        return self._data
+
+    @property
+    def num_bytes(self) -> int:
+        return len(self._data) if self._data is not None else 0
+
+    @property
+    def file_num_bytes(self) -> int:
+        # The size of the transformed file, without the compared file.
+        data = self._data
+        if isinstance(data, CompareDataSource):
+            data = data.first
+        return len(data) if data is not None else 0
 
     @property
     def num_bits(self):
         return len(self._data) * 8 if self._data is not None else 0
 
-    def load_file(self, filename, max_bytes):
-        with open(filename, "rb") as f:
-            self._data = f.read(max_bytes)
+    def num_blocks(self, block_bytes: int) -> int:
+        return ceil(len(self._data) / block_bytes) if self._data is not None else 0
+
+    @property
+    def density_pyramid(self) -> Optional[DensityPyramid]:
+        return self._density_pyramid
+
+    @property
+    def file_key(self) -> Optional[Tuple]:
+        # Identifies the transformed data of the file, ignoring any comparison.
+        if self._file_id is None:
+            return None
+        return self._file_id, self._max_bytes, format_transforms(self._transforms)
+
+    @property
+    def data_key(self) -> Optional[Tuple]:
+        # Identifies the data, as compared to another file.
+        if self._compare_source is None:
+            return self.file_key
+        if self._file_id is None or self._compare_file_id is None:
+            return None
+        return self.file_key + (self._compare_file_id, self._compare_shift)
+
+    def load_file(self, filename, max_bytes=0):
+        self.close()
+        self._source = open_data_source(filename, max_bytes)
+        self._filename = filename
+        self._max_bytes = max_bytes
+        self._file_id = self._identify(filename)
+        self.set_transforms(self._transforms)
+
+    @property
+    def needs_index(self) -> bool:
+        return _needs_index(self._source)
+
+    @property
+    def compare_needs_index(self) -> bool:
+        return _needs_index(self._compare_source)
+
+    @property
+    def is_sized(self) -> bool:
+        # False while the size of a compressed file is still being found.
+        return all(
+            not isinstance(source, CompressedDataSource) or source.is_sized
+            for source in (self._source, self._compare_source)
+        )
+
+    def build_index(self, progress=None, should_stop=None) -> bool:
+        return _build_index(self._source, progress, should_stop)
+
+    def build_compare_index(self, progress=None, should_stop=None) -> bool:
+        return _build_index(self._compare_source, progress, should_stop)
+
+    @property
+    def compare_filename(self) -> Optional[str]:
+        return self._compare_filename
+
+    @property
+    def is_comparing(self) -> bool:
+        return self._compare_source is not None
+
+    @property
+    def compare_shift(self) -> int:
+        return self._compare_shift
+
+    @property
+    def common_bits(self) -> Optional[Tuple[int, int]]:
+        # The bits both compared files have, or None when not comparing.
+        if not isinstance(self._data, CompareDataSource):
+            return None
+        return self._data.common_bits
+
+    @property
+    def difference_index(self) -> Optional[DifferenceIndex]:
+        return self._difference_index
+
+    def load_compare_file(self, filename, max_bytes=0, shift=0):
+        # The data becomes the XOR of the two files, with bit i of this file
+        # compared to bit i + shift of the first one.
+        self.close_compare()
+        self.save_analysis()
+        self._compare_source = open_data_source(filename, max_bytes)
+        self._compare_filename = filename
+        self._compare_file_id = self._identify(filename)
+        self._compare_shift = shift
+        self.set_transforms(self._transforms)
+
+    def set_compare_shift(self, shift: int):
+        self.save_analysis()
+        self._compare_shift = shift
+        self.set_transforms(self._transforms)
+
+    def close_compare(self):
+        if self._compare_source is None:
+            return
+        self.save_analysis()
+        self._compare_source.close()
+        self._compare_source = None
+        self._compare_filename = None
+        self._compare_file_id = None
+        self.set_transforms(self._transforms)
+
+    def build_difference_index(self, progress=None, should_stop=None) -> bool:
+        data = self._data
+        if not isinstance(data, CompareDataSource):
+            return True
+        key = self.data_key
+        arrays = self._cache.load(key, "differences") if key is not None else None
+        if arrays is not None:
+            index = DifferenceIndex(arrays["starts"], arrays["ends"])
+        else:
+            index = build_difference_index(data, progress, should_stop)
+            if index is None:
+                return False
+            if key is not None:
+                arrays = {"starts": index.starts, "ends": index.ends}
+                self._cache.save(key, "differences", arrays)
+        self._difference_index = index
+        return True
+
+    @property
+    def framing(self) -> Optional[Framing]:
+        return self._framing
+
+    @property
+    def frame_index(self) -> Optional[FrameIndex]:
+        return self._frame_index
+
+    @property
+    def framing_error(self) -> Optional[str]:
+        # Why the frames could not be indexed.
+        return self._framing_error
+
+    def set_framing(self, framing: Optional[Framing]):
+        # The frames are indexed by build_frame_index(), and until then the rows
+        # have the same width.
+        self._framing = framing
+        self._frame_index = None
+        self._framing_error = None
+
+    def build_frame_index(self, progress=None, should_stop=None) -> bool:
+        data, framing = self._data, self._framing
+        if data is None or framing is None:
+            return True
+        # A file of frame starts may change without changing the spec.
+        key = self.data_key
+        if key is not None and not isinstance(framing, FileFraming):
+            key += (framing.spec,)
+        else:
+            key = None
+        arrays = self._cache.load(key, "frames") if key is not None else None
+        if arrays is not None:
+            index = FrameIndex(arrays["starts"])
+        else:
+            try:
+                index = framing.build_index(data, progress, should_stop)
+            except (OSError, ValueError) as e:
+                self._framing_error = str(e)
+                return True
+            if index is None:
+                return False
+            if key is not None:
+                self._cache.save(key, "frames", {"starts": index.starts})
+        self._frame_index = index
+        return True
+
+    def row_starts(self, offset, row_width, start_row, num_rows) -> np.ndarray:
+        # The first bit of each row, where the offset is into each frame.
+        if self._frame_index is None:
+            rows = np.arange(start_row, start_row + num_rows, dtype=np.int64)
+            return offset + rows * row_width
+        return self._frame_index.row_starts(start_row, num_rows) + offset
+
+    def row_bounds(
+        self, offset, row_width, start_row, num_rows
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        # The first bit of each row, and the bit after its last one.
+        starts = self.row_starts(offset, row_width, start_row, num_rows + 1)
+        if self._frame_index is None:
+            ends = starts[:num_rows] + row_width
+        else:
+            ends = np.append(starts[1:] - offset, self.num_bits)[:num_rows]
+        return starts[:num_rows], np.minimum(ends, self.num_bits)
+
+    def export_selection(
+        self,
+        output,
+        selection: Selection,
+        realign: bool,
+        progress=None,
+        should_stop=None,
+    ) -> bool:
+        # Writes the selected bits, see export_rows(). Returns False when
+        # stopped.
+        data = self._data
+        if data is None:
+            return True
+        if realign and self._frame_index is None and selection.is_full_width:
+            # The selected rows are one range of bits.
+            start = selection.offset + selection.first_row * selection.row_width
+            end = selection.offset + selection.last_row * selection.row_width
+            end = min(end, self.num_bits)
+            return export_range(data, start, end, output, progress, should_stop)
+        return export_rows(
+            data, selection, self.row_bounds, output, realign, progress, should_stop
+        )
+
+    def num_rows(self, offset, row_width) -> int:
+        if self._frame_index is not None:
+            return len(self._frame_index)
+        return ceil(max(self.num_bits - offset, 0) / row_width)
+
+    def build_overview(self, progress=None, should_stop=None) -> bool:
+        # Restores the density pyramid from the cache, or builds it and saves it
+        # there. Returns False when stopped.
+        pyramid = self._density_pyramid
+        if pyramid is None or pyramid.is_built:
+            return True
+        key = self.data_key
+        if key is not None:
+            arrays = self._cache.load(key, "density_pyramid")
+            if arrays is not None and pyramid.restore(arrays):
+                self._density_pyramid_saved = True
+                return True
+        if not pyramid.build(progress, should_stop):
+            return False
+        self.save_analysis()
+        return True
+
+    def save_analysis(self):
+        # Saves the density pyramid, if it was built since it was last saved or
+        # restored.
+        key = self.data_key
+        pyramid = self._density_pyramid
+        if key is None or pyramid is None or not pyramid.is_built:
+            return
+        if not self._density_pyramid_saved:
+            self._cache.save(key, "density_pyramid", pyramid.arrays())
+            self._density_pyramid_saved = True
+
+    def _identify(self, filename) -> Optional[str]:
+        if self._cache is None:
+            return None
+        try:
+            return file_identity(filename)
+        except OSError:
+            return None
+
+    def set_transforms(self, transforms: Sequence[Transform]):
+        # The source stays open, and the transformed data is only computed for
+        # what is read from it.
+        self.save_analysis()
+        self._transforms = list(transforms)
+        self._difference_index = None
+        self._frame_index = None
+        self._framing_error = None
+        if self._source is None:
+            return
+        self._data = apply_transforms(self._source, self._transforms)
+        if self._compare_source is not None:
+            self._data = CompareDataSource(
+                self._data,
+                apply_transforms(self._compare_source, self._transforms),
+                self._compare_shift,
+            )
+        self._density_pyramid = DensityPyramid(self._data)
+        self._density_pyramid_saved = False
+
+    def refresh(self) -> int:
+        if self._data is None:
+            return 0
+        return self._data.refresh()
+
+    def close(self):
+        self.save_analysis()
+        if self._compare_source is not None:
+            self._compare_source.close()
+            self._compare_source = None
+            self._compare_filename = None
+            self._compare_file_id = None
+        if self._source is not None:
+            self._source.close()
+            self._source = None
+        self._data = None
+        self._filename = None
+        self._file_id = None
+        self._density_pyramid = None
+        self._difference_index = None
+
+    def find_row_widths(
+        self, max_row_width: int, count: int = 10
+    ) -> Optional[AutocorrelationResult]:
+        if self._data is None:
+            return
+        return find_periods(self._data, max_row_width, count)
 
     def create_bitmap(
         self,
@@ -25,41 +376,100 @@ class App:
         start_row: int,
         visible_rows: int,
         visible_columns: int,
+        bitmap: Optional[Bitmap] = None,
     ) -> Optional[Bitmap]:
+        # Written into bitmap when given, reusing its buffer.
         if self._data is None:
             return
+        if bitmap is None:
+            bitmap = Bitmap()
+        if self._frame_index is not None:
+            return self._create_frames_bitmap(
+                offset, start_column, start_row, visible_rows, visible_columns, bitmap
+            )
 
         start = start_row * row_width + start_column + offset
         num_rows = min(ceil((self.num_bits - start) / row_width), visible_rows + 1) - 1
+        num_rows = max(num_rows, 0)
         bits_per_row = min(row_width, visible_columns)
         bytes_per_row = ceil(bits_per_row / 8)
-        mask = 2 ** (bytes_per_row * 8) - 1
-        result = bytearray()
-        for _ in range(num_rows):
-            result.extend(self._get_row_bytes(start, bytes_per_row, mask))
-            start += row_width
-        remainder = []
-        last_byte = start // 8 + bytes_per_row
-        if last_byte < len(self._data):
-            result.extend(self._get_row_bytes(start, bytes_per_row, mask))
+        last_start = start + num_rows * row_width
+        remainder_bits = 0
+        if last_start // 8 + bytes_per_row < len(self._data):
+            num_rows += 1
         else:
-            remainder = self._get_end_bits(start)
-        return Bitmap(result, bits_per_row, bytes_per_row, remainder)
-
-    def _get_row_bytes(self, start, num_bytes, mask) -> Iterable[int]:
-        i, bi = start // 8, start % 8
-        if not bi:
-            return self._data[i : i + num_bytes]
-
-        return (
-            (int.from_bytes(self._data[i : i + num_bytes + 1], "big") >> (8 - bi))
-            & mask
-        ).to_bytes(num_bytes, "big")
-
-    def _get_end_bits(self, start) -> List[bool]:
-        i, bi = start // 8, start % 8
-        return [bit for byte in self._data[i:] for bit in self._byte_to_bits(byte)][bi:]
-
-    @staticmethod
-    def _byte_to_bits(b):
-        return [bool((b >> i) & 1) for i in range(7, -1, -1)]
+            remainder_bits = max(min(self.num_bits - last_start, bits_per_row), 0)
+        rows = bitmap.reset(bits_per_row, num_rows, remainder_bits)
+        starts = range(start, start + num_rows * row_width, row_width)
+        extract_rows_into(self._data, starts, bits_per_row, rows)
+        if remainder_bits:
+            extract_rows_into(self._data, [last_start], remainder_bits, rows[num_rows:])
+        return bitmap
+
+    def _create_frames_bitmap(
+        self, offset, start_column, start_row, visible_rows, visible_columns, bitmap
+    ) -> Bitmap:
+        # Rows are left aligned, and end where the next frame starts.
+        num_rows = max(min(visible_rows + 1, len(self._frame_index) - start_row), 0)
+        starts, ends = self.row_bounds(offset, 0, start_row, num_rows)
+        starts = starts + start_column
+        bits_per_row = visible_columns
+        rows = bitmap.reset(bits_per_row, num_rows)
+        extract_rows_into(self._data, starts, bits_per_row, rows)
+        bitmap.row_bits = np.clip(ends - starts, 0, bits_per_row)
+        return bitmap
+
+    def create_density_map(
+        self,
+        offset: int,
+        row_width: int,
+        start_column: int,
+        start_row: int,
+        visible_rows: int,
+        visible_columns: int,
+        block_bytes: int,
+    ) -> Optional[DensityMap]:
+        if self._data is None:
+            return
+
+        num_blocks = self.num_blocks(block_bytes)
+        start = start_row * row_width + start_column + offset // (block_bytes * 8)
+        columns = min(row_width, visible_columns)
+        num_rows = min(
+            (num_blocks - start - columns) // row_width + 1, visible_rows + 1
+        )
+        num_rows = max(num_rows, 0)
+        bytes_per_row = ceil(columns / 4) * 4
+        result = b""
+        if num_rows:
+            densities = self._density_pyramid.densities(
+                block_bytes, start, num_rows, columns, row_width
+            )
+            if densities is None:
+                # Not quick to count before the overview is built.
+                return None
+            result = np.pad(densities, ((0, 0), (0, bytes_per_row - columns)))
+            result = result.tobytes()
+
+        remainder = b""
+        last_start = start + num_rows * row_width
+        if num_rows <= visible_rows and last_start < num_blocks:
+            remainder_columns = min(num_blocks - last_start, columns)
+            remainder = self._density_pyramid.densities(
+                block_bytes, last_start, 1, remainder_columns, row_width
+            )
+            if remainder is None:
+                return None
+            remainder = remainder.tobytes()
+        return DensityMap(result, columns, bytes_per_row, remainder)
+
+
+def _needs_index(source: Optional[DataSource]) -> bool:
+    return isinstance(source, CompressedDataSource) and source.needs_index
+
+
+def _build_index(source: Optional[DataSource], progress, should_stop) -> bool:
+    if not _needs_index(source):
+        return True
+    # The new size shows after refresh().
+    return source.build_index(progress, should_stop)
@@ -0,0 +1,106 @@
+from dataclasses import dataclass
+from math import ceil
+from time import perf_counter
+from typing import List, Tuple
+
+import numpy as np
+
+from data_source import DataSource
+
+_WINDOW_BITS = 2 ** 20
+_MAX_WINDOWS = 16
+_MIN_WINDOWS = 2
+_TIME_BUDGET = 1.0
+_FUNDAMENTAL_RATIO = 0.8
+_PEAKS_PER_PERIOD = 20
+
+
+@dataclass
+class AutocorrelationResult:
+    periods: List[Tuple[int, float]]
+    bits_analyzed: int
+    elapsed: float
+
+
+def find_periods(
+    data: DataSource, max_period: int, count: int = 10
+) -> AutocorrelationResult:
+    start_time = perf_counter()
+    window_bytes = _WINDOW_BITS // 8
+    num_windows = min(ceil(len(data) / window_bytes), _MAX_WINDOWS)
+    max_period = max(min(max_period, _WINDOW_BITS // 4, len(data) * 8 // 2), 1)
+
+    fft_size = 1 << (_WINDOW_BITS + max_period - 1).bit_length()
+    correlation = np.zeros(max_period + 1)
+    overlap = np.zeros(max_period + 1)
+    bits_analyzed = 0
+    for start in _window_starts(len(data), window_bytes, num_windows):
+        if start >= len(data):
+            break
+        if (
+            bits_analyzed >= _MIN_WINDOWS * _WINDOW_BITS
+            and perf_counter() - start_time > _TIME_BUDGET
+        ):
+            break
+        chunk = np.frombuffer(data[start : start + window_bytes], dtype=np.uint8)
+        bits = np.unpackbits(chunk).astype(np.float32)
+        bits -= bits.mean()
+        spectrum = np.fft.rfft(bits, fft_size)
+        window = np.fft.irfft(spectrum * np.conj(spectrum), fft_size)
+        correlation += window[: max_period + 1]
+        overlap += np.maximum(len(bits) - np.arange(max_period + 1), 1)
+        bits_analyzed += len(bits)
+
+    if not bits_analyzed or correlation[0] <= 0:
+        return AutocorrelationResult([], bits_analyzed, perf_counter() - start_time)
+
+    scores = (correlation / overlap) / (correlation[0] / overlap[0])
+    return AutocorrelationResult(
+        _best_periods(scores, count), bits_analyzed, perf_counter() - start_time
+    )
+
+
+def _window_starts(size, window_bytes, num_windows):
+    # Ordered so that the windows analyzed before the time budget runs out are
+    # spread over the whole file.
+    if num_windows <= 1:
+        return [0]
+    last = max(size - window_bytes, 0)
+    index_bits = (num_windows - 1).bit_length()
+    order = sorted(range(num_windows), key=lambda i: format(i, f"0{index_bits}b")[::-1])
+    return [last * i // (num_windows - 1) for i in order]
+
+
+def _best_periods(scores, count):
+    lags = np.arange(2, len(scores) - 1)
+    peaks = lags[
+        (scores[lags] > 0)
+        & (scores[lags] >= scores[lags - 1])
+        & (scores[lags] >= scores[lags + 1])
+    ]
+    peaks = peaks[np.argsort(-scores[peaks], kind="stable")][
+        : count * _PEAKS_PER_PERIOD
+    ]
+    best = []
+    for lag in peaks.tolist():
+        lag = _fundamental(scores, lag)
+        if any(lag % period == 0 for period, _ in best):
+            continue
+        best.append((lag, float(scores[lag])))
+        if len(best) == count:
+            break
+    return best
+
+
+def _fundamental(scores, lag):
+    # A period p also correlates at every multiple of p, so prefer the smallest
+    # divisor of `lag` that correlates almost as well.
+    threshold = scores[lag] * _FUNDAMENTAL_RATIO
+    divisors = set()
+    for i in range(1, int(lag ** 0.5) + 1):
+        if lag % i == 0:
+            divisors.update((i, lag // i))
+    for divisor in sorted(divisors):
+        if divisor >= 2 and scores[divisor] >= threshold:
+            return divisor
+    return lag
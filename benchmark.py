@@ -0,0 +1,224 @@
+import json
+import os
+import platform
+import sys
+import timeit
+from dataclasses import dataclass
+from datetime import datetime
+from functools import partial
+from itertools import product
+from math import ceil
+from tempfile import TemporaryDirectory
+from typing import Callable, Dict, Iterator, List
+
+import numpy as np
+
+from app import App
+from bit_extraction import extract_rows
+from bitmap import Bitmap
+
+FILE_SIZES = [2 ** 20, 2 ** 26]
+OFFSETS = [0, 3]
+ROW_WIDTHS = [64, 80, 1000]
+VIEWPORTS = [(500, 500), (1920, 1080)]
+BIT_SIZES = [1, 3, 10]
+SYMBOL_BITS = [1, 4, 8]
+BIT_BORDERS_START = 3
+DEFAULT_TOLERANCE = 0.25
+_MIN_TIME = 0.05
+_REPEAT = 5
+_SEED = 0
+
+
+@dataclass
+class Case:
+    name: str
+    function: Callable[[], object]
+
+
+@dataclass
+class Comparison:
+    name: str
+    baseline: float
+    current: float
+
+    @property
+    def ratio(self) -> float:
+        return self.current / self.baseline
+
+    def is_regression(self, tolerance) -> bool:
+        return self.ratio > 1 + tolerance
+
+
+def run(name_filter: str = "", output=sys.stdout) -> Dict[str, float]:
+    with TemporaryDirectory() as tmp:
+        results = {}
+        for case in _cases(tmp):
+            if name_filter not in case.name:
+                continue
+            results[case.name] = _time(case.function)
+            print(f"{case.name}: {_format_time(results[case.name])}", file=output)
+        return results
+
+
+def save(results: Dict[str, float], filename):
+    with open(filename, "w") as f:
+        json.dump({"metadata": _metadata(), "results": results}, f, indent=2)
+
+
+def load(filename) -> Dict[str, float]:
+    with open(filename) as f:
+        return json.load(f)["results"]
+
+
+def compare(results: Dict[str, float], baseline: Dict[str, float]) -> List[Comparison]:
+    return [
+        Comparison(name, baseline[name], current)
+        for name, current in results.items()
+        if name in baseline
+    ]
+
+
+def print_comparisons(comparisons: List[Comparison], tolerance, output=sys.stdout):
+    for comparison in comparisons:
+        status = "REGRESSION" if comparison.is_regression(tolerance) else "ok"
+        print(
+            f"{comparison.name}: {_format_time(comparison.baseline)} -> "
+            f"{_format_time(comparison.current)} ({comparison.ratio:.2f}x) {status}",
+            file=output,
+        )
+
+
+def _time(function) -> float:
+    timer = timeit.Timer(function)
+    elapsed = timer.timeit(1)
+    number = max(int(_MIN_TIME / max(elapsed, 1e-9)), 1)
+    return min(timer.repeat(_REPEAT, number)) / number
+
+
+def _format_time(seconds) -> str:
+    if seconds < 1e-3:
+        return f"{seconds * 1e6:.1f}us"
+    if seconds < 1:
+        return f"{seconds * 1e3:.2f}ms"
+    return f"{seconds:.3f}s"
+
+
+def _metadata():
+    return {
+        "time": datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "platform": platform.platform(),
+        "processor": platform.processor(),
+    }
+
+
+def _cases(directory) -> Iterator[Case]:
+    rng = np.random.default_rng(_SEED)
+    for size in FILE_SIZES:
+        filename = os.path.join(directory, f"{size}.bin")
+        rng.integers(0, 256, size, dtype=np.uint8).tofile(filename)
+        app = App()
+        app.load_file(filename)
+        try:
+            yield from _file_cases(app, f"size={size // 2 ** 20}MiB")
+        finally:
+            app.close()
+
+
+def _file_cases(app: App, size_name) -> Iterator[Case]:
+    for offset, row_width in product(OFFSETS, ROW_WIDTHS):
+        name = f"{size_name}/offset={offset}/row_width={row_width}"
+        last_row = (app.num_bits - offset - 1) // row_width
+        yield Case(
+            f"end_row/{name}",
+            partial(app.create_bitmap, offset, row_width, 0, last_row, 0, row_width),
+        )
+
+        for (width, height), bit_size in product(VIEWPORTS, BIT_SIZES):
+            view_name = f"{name}/viewport={width}x{height}/bit_size={bit_size}"
+            yield from _view_cases(
+                app, offset, row_width, width, height, bit_size, view_name
+            )
+
+
+def _view_cases(app: App, offset, row_width, width, height, bit_size, name):
+    # Views start in the middle of the file, away from the pages touched while
+    # creating it.
+    visible_columns = width // bit_size
+    visible_rows = height // bit_size + 1
+    start_row = app.num_bits // row_width // 2
+    bits_per_row = min(row_width, visible_columns)
+    start = offset + start_row * row_width
+    starts = range(start, start + visible_rows * row_width, row_width)
+    yield Case(
+        f"extract_rows/{name}",
+        partial(extract_rows, app.data, starts, bits_per_row),
+    )
+    yield Case(
+        f"create_bitmap/{name}",
+        partial(
+            app.create_bitmap,
+            offset,
+            row_width,
+            0,
+            start_row,
+            visible_rows,
+            visible_columns,
+            Bitmap(),
+        ),
+    )
+    for symbol_bits in SYMBOL_BITS:
+        # The same cells as symbols of more bits, keeping the one bit names.
+        symbol_name = f"{name}/symbol_bits={symbol_bits}" if symbol_bits > 1 else name
+        yield Case(
+            f"render_view/{symbol_name}",
+            partial(
+                _render_view,
+                app,
+                offset,
+                row_width,
+                bit_size,
+                symbol_bits,
+                start_row // symbol_bits,
+                width,
+                height,
+            ),
+        )
+
+
+def _render_view(
+    app: App, offset, row_width, bit_size, symbol_bits, start_row, width, height
+):
+    # Renders every tile covering the view, as BitsWidget does with an empty
+    # tile cache.
+    from qt_classes.tile_renderer import TileSpec, cells_per_tile, render_tile
+
+    cells = cells_per_tile(bit_size)
+    last_row = start_row + height // bit_size + 1
+    last_column = min(width // bit_size, row_width)
+    for tile_row in range(start_row // cells, ceil(last_row / cells)):
+        for tile_column in range(ceil(last_column / cells)):
+            spec = TileSpec(
+                0,
+                app.num_bits,
+                offset,
+                row_width,
+                bit_size,
+                symbol_bits,
+                bit_size >= BIT_BORDERS_START,
+                False,
+                (0xFFFFFFFF, 0xFF0000FF),
+                0,
+                tile_row,
+                tile_column,
+            )
+            render_tile(app, spec)
+
+
+def create_gui_application():
+    os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+    from PyQt5.QtGui import QGuiApplication
+
+    return QGuiApplication.instance() or QGuiApplication(sys.argv[:1])
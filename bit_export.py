@@ -0,0 +1,124 @@
+from dataclasses import dataclass
+from math import ceil
+from typing import BinaryIO, Callable, Optional, Tuple
+
+import numpy as np
+
+from bit_extraction import extract_rows
+from data_source import DataSource
+
+CHUNK_BYTES = 2 ** 20
+
+
+@dataclass(frozen=True)
+class Selection:
+    # Rows [first_row, last_row) and bit columns [first_column, last_column) of
+    # a view whose rows are row_width bits wide, or start where frames start,
+    # with offset bits skipped.
+    offset: int
+    row_width: int
+    first_row: int
+    last_row: int
+    first_column: int
+    last_column: int
+
+    @property
+    def width(self) -> int:
+        return self.last_column - self.first_column
+
+    @property
+    def is_full_width(self) -> bool:
+        return self.first_column == 0 and self.last_column == self.row_width
+
+
+def export_range(
+    data: DataSource,
+    start: int,
+    end: int,
+    output: BinaryIO,
+    progress: Optional[Callable[[int, int], None]] = None,
+    should_stop: Optional[Callable[[], bool]] = None,
+    chunk_bytes: int = CHUNK_BYTES,
+) -> bool:
+    # Writes bits [start, end) realigned to the first bit of the output, with
+    # the last byte padded with zeros. A range starting at a byte boundary is
+    # written as it is read, without shifting. Returns False when stopped.
+    end = max(end, start)
+    if start % 8:
+        chunk_bits = chunk_bytes * 8
+        for chunk_start in range(start, end, chunk_bits):
+            if should_stop is not None and should_stop():
+                return False
+            num_bits = min(chunk_bits, end - chunk_start)
+            output.write(extract_rows(data, [chunk_start], num_bits))
+            if progress is not None:
+                progress(chunk_start + num_bits - start, end - start)
+        return True
+
+    first_byte, end_byte = start // 8, end // 8
+    for chunk_start in range(first_byte, end_byte, chunk_bytes):
+        if should_stop is not None and should_stop():
+            return False
+        output.write(data.read(chunk_start, min(chunk_bytes, end_byte - chunk_start)))
+        if progress is not None:
+            progress((chunk_start - first_byte) * 8, end - start)
+    if end % 8:
+        last = data.read(end_byte, 1)[0]
+        output.write(bytes([last & (0xFF00 >> (end % 8)) & 0xFF]))
+    if progress is not None:
+        progress(1, 1)
+    return True
+
+
+def export_rows(
+    data: DataSource,
+    selection: Selection,
+    row_bounds: Callable[[int, int, int, int], Tuple[np.ndarray, np.ndarray]],
+    output: BinaryIO,
+    realign: bool,
+    progress: Optional[Callable[[int, int], None]] = None,
+    should_stop: Optional[Callable[[], bool]] = None,
+    chunk_bytes: int = CHUNK_BYTES,
+) -> bool:
+    # Writes the selected bits of each row, either one after the other from the
+    # first bit of the output, or as a rectangle with each row padded to whole
+    # bytes. Bits past the end of a row are left out, or are zeros in a
+    # rectangle. row_bounds(offset, row_width, start_row, num_rows) gives the
+    # first bit of each row and the bit after its last one. Returns False when
+    # stopped.
+    width = selection.width
+    num_rows = selection.last_row - selection.first_row
+    if width <= 0 or num_rows <= 0:
+        return True
+    rows_per_chunk = max(chunk_bytes // ceil(width / 8), 1)
+    columns = np.arange(width)
+    # Bits that did not fill a byte, written with the next rows.
+    carry = np.empty(0, dtype=np.uint8)
+    for first_row in range(selection.first_row, selection.last_row, rows_per_chunk):
+        if should_stop is not None and should_stop():
+            return False
+        rows = min(rows_per_chunk, selection.last_row - first_row)
+        starts, ends = row_bounds(
+            selection.offset, selection.row_width, first_row, rows
+        )
+        starts = starts + selection.first_column
+        row_bits = np.clip(ends - starts, 0, width)[:, None]
+        packed = np.frombuffer(extract_rows(data, starts, width), dtype=np.uint8)
+        packed = packed.reshape(len(starts), -1)
+        if realign:
+            bits = np.unpackbits(packed, axis=1)[:, :width]
+            bits = np.concatenate([carry, bits[columns < row_bits]])
+            whole = len(bits) // 8 * 8
+            output.write(np.packbits(bits[:whole]).tobytes())
+            carry = bits[whole:]
+        else:
+            if (row_bits < width).any():
+                bits = np.unpackbits(packed, axis=1)[:, :width]
+                bits[columns >= row_bits] = 0
+                packed = np.packbits(bits, axis=1)
+            output.write(packed.tobytes())
+        if progress is not None:
+            progress(first_row + rows - selection.first_row, num_rows)
+    if len(carry):
+        output.write(np.packbits(carry).tobytes())
+    return True
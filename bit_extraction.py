@@ -0,0 +1,116 @@
+from math import ceil, gcd
+from typing import Sequence
+
+import numpy as np
+from numpy.lib.stride_tricks import as_strided
+
+_SPARSE_FACTOR = 4
+
+
+def extract_rows(data, starts: Sequence[int], bits_per_row: int) -> bytes:
+    if not len(starts) or bits_per_row <= 0:
+        return b""
+    rows = np.empty((len(starts), ceil(bits_per_row / 8)), dtype=np.uint8)
+    _extract_rows_numpy(data, starts, bits_per_row, rows)
+    return rows.tobytes()
+
+
+def extract_rows_into(data, starts: Sequence[int], bits_per_row: int, out):
+    # Writes each row to the first bytes of a row of the numpy array out, e.g.
+    # a view of a reused buffer with padded rows, instead of allocating them.
+    if not len(starts) or bits_per_row <= 0:
+        return
+    rows = out[: len(starts), : ceil(bits_per_row / 8)]
+    _extract_rows_numpy(data, starts, bits_per_row, rows)
+
+
+def _extract_rows_numpy(data, starts, bits_per_row, rows):
+    span = rows.shape[1] + 1
+    if not isinstance(starts, range):
+        _shift_gathered_rows(data, np.asarray(starts, dtype=np.int64), rows)
+    elif _is_dense(len(starts) * starts.step // 8, span, len(starts)):
+        first = starts.start // 8
+        buf = _read_padded(data, first, starts[-1] // 8 + span)
+        _shift_strided_rows(buf, starts, rows, first_byte=first)
+    else:
+        buf = _read_rows(data, [start // 8 for start in starts], span)
+        _shift_strided_rows(buf, starts, rows, row_span=span)
+    rows[:, -1] &= _tail_mask(bits_per_row)
+
+
+def _shift_strided_rows(buf, starts: range, rows, first_byte=0, row_span=None):
+    # Rows whose index differs by `group` share the same bit shift, and the rows
+    # of each such group are a constant number of bytes apart in `buf`.
+    # Rows are either where they are in the data (relative to `first_byte`),
+    # or were copied `row_span` bytes apart.
+    group = 8 // gcd(starts.step, 8)
+    num_rows, bytes_per_row = rows.shape
+    for phase in range(min(group, num_rows)):
+        start = starts[phase]
+        if row_span is None:
+            byte, byte_step = start // 8 - first_byte, starts.step * group // 8
+        else:
+            byte, byte_step = phase * row_span, row_span * group
+        view = as_strided(
+            buf[byte:],
+            shape=(len(range(phase, num_rows, group)), bytes_per_row + 1),
+            strides=(byte_step, 1),
+            writeable=False,
+        )
+        out = rows[phase::group]
+        shift = start % 8
+        if not shift:
+            out[:] = view[:, :-1]
+        else:
+            np.left_shift(view[:, :-1], shift, out=out)
+            out |= view[:, 1:] >> (8 - shift)
+
+
+def _shift_gathered_rows(data, starts, rows):
+    bytes_per_row = rows.shape[1]
+    byte_starts = starts // 8
+    shifts = (starts % 8).astype(np.uint16)[:, None]
+    buf, byte_starts = _gather_source(data, byte_starts, bytes_per_row + 1)
+    gathered = buf[byte_starts[:, None] + np.arange(bytes_per_row + 1)]
+    if not shifts.any():
+        rows[:] = gathered[:, :-1]
+        return
+    words = gathered.astype(np.uint16)
+    words = (words[:, :-1] << 8) | words[:, 1:]
+    rows[:] = (words << shifts) >> 8
+
+
+def _gather_source(data, byte_starts, span):
+    # Rows that are far apart are read one by one instead of as a single range.
+    first = int(byte_starts.min())
+    last = int(byte_starts.max()) + span
+    if _is_dense(last - first, span, len(byte_starts)):
+        return _read_padded(data, first, last), byte_starts - first
+
+    buf = _read_rows(data, byte_starts.tolist(), span)
+    return buf, np.arange(len(byte_starts), dtype=np.int64) * span
+
+
+def _read_rows(data, byte_starts, span):
+    buf = np.zeros(span * len(byte_starts), dtype=np.uint8)
+    for row, i in enumerate(byte_starts):
+        chunk = data[i : i + span]
+        buf[row * span : row * span + len(chunk)] = np.frombuffer(chunk, np.uint8)
+    return buf
+
+
+def _read_padded(data, start, end):
+    chunk = data[start:end]
+    if len(chunk) == end - start:
+        return np.frombuffer(chunk, dtype=np.uint8)
+    buf = np.zeros(end - start, dtype=np.uint8)
+    buf[: len(chunk)] = np.frombuffer(chunk, dtype=np.uint8)
+    return buf
+
+
+def _is_dense(total_bytes, span, num_rows):
+    return total_bytes <= _SPARSE_FACTOR * span * num_rows
+
+
+def _tail_mask(bits_per_row):
+    return (0xFF << (-bits_per_row % 8)) & 0xFF
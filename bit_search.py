@@ -0,0 +1,159 @@
+import multiprocessing
+import string
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from math import ceil
+from typing import Iterator, List, Optional, Sequence
+
+import numpy as np
+
+from compressed_data_source import detect_compression
+from data_source import worker_data_source
+from transforms import Transform, apply_transforms
+
+CHUNK_BYTES = 2 ** 23
+_BINARY_DONT_CARE = "xX?."
+_HEX_DONT_CARE = "xX?"
+
+
+@dataclass
+class BitPattern:
+    bits: np.ndarray
+    mask: np.ndarray
+
+    def __len__(self):
+        return len(self.bits)
+
+
+def parse_pattern(text: str) -> BitPattern:
+    # Binary patterns start with 0b and hex patterns with 0x. Without a prefix,
+    # a binary pattern starting with a zero and a don't care bit, e.g. 0x10,
+    # would read as hex, so the prefix is required.
+    text = "".join(text.split()).replace("_", "")
+    prefix, digits = text[:2].lower(), text[2:]
+    if prefix == "0x":
+        bits = []
+        for c in digits:
+            if c in _HEX_DONT_CARE:
+                bits.extend([None] * 4)
+            elif c in string.hexdigits:
+                nibble = int(c, 16)
+                bits.extend((nibble >> i) & 1 for i in range(3, -1, -1))
+            else:
+                raise ValueError(f"Invalid hex digit: {c!r}")
+    elif prefix == "0b":
+        bits = []
+        for c in digits:
+            if c in _BINARY_DONT_CARE:
+                bits.append(None)
+            elif c in "01":
+                bits.append(int(c))
+            else:
+                raise ValueError(f"Invalid binary digit: {c!r}")
+    else:
+        raise ValueError(
+            "Start the pattern with 0b for binary or 0x for hex, e.g. 0b1011x01 "
+            "or 0x47??1F"
+        )
+
+    if not any(b is not None for b in bits):
+        raise ValueError(
+            "The pattern must contain at least one bit that is not don't care"
+        )
+    return BitPattern(
+        np.array([b or 0 for b in bits], dtype=np.uint8),
+        np.array([b is not None for b in bits], dtype=bool),
+    )
+
+
+def find_in_bytes(buf: np.ndarray, pattern: BitPattern, limit: int) -> np.ndarray:
+    limit = min(limit, len(buf) * 8 - len(pattern) + 1)
+    if limit <= 0:
+        return np.empty(0, dtype=np.int64)
+
+    matches = [_find_with_shift(buf, pattern, limit, shift) for shift in range(8)]
+    return np.sort(np.concatenate(matches))
+
+
+def _find_with_shift(buf, pattern, limit, shift):
+    # Matches starting `shift` bits into a byte are first filtered by comparing
+    # the whole byte that covers the most care bits, then verified bit by bit.
+    byte_offset, mask, value = _best_byte(pattern, shift)
+    count = ceil((limit - shift) / 8)
+    if count <= 0:
+        return np.empty(0, dtype=np.int64)
+
+    window = buf[byte_offset : byte_offset + count]
+    candidates = np.flatnonzero((window & mask) == value) * 8 + shift
+    for i in np.flatnonzero(pattern.mask).tolist():
+        if not len(candidates):
+            break
+        positions = candidates + i
+        bits = (buf[positions >> 3] >> (7 - (positions & 7))) & 1
+        candidates = candidates[bits == pattern.bits[i]]
+    return candidates
+
+
+def _best_byte(pattern, shift):
+    best = (0, 0, 0)
+    best_care = -1
+    for byte_offset in range(ceil((len(pattern) + shift) / 8)):
+        mask = value = 0
+        for t in range(8):
+            i = byte_offset * 8 + t - shift
+            if 0 <= i < len(pattern) and pattern.mask[i]:
+                mask |= 0x80 >> t
+                value |= int(pattern.bits[i]) << (7 - t)
+        care = bin(mask).count("1")
+        if care > best_care:
+            best, best_care = (byte_offset, mask, value), care
+    return best
+
+
+def search_chunk(
+    filename, max_bytes, transforms, size, start, chunk_bytes, pattern: BitPattern
+) -> List[int]:
+    with worker_data_source(filename, max_bytes) as source:
+        data = apply_transforms(source, transforms, cache_bytes=0)
+        end = min(start + chunk_bytes, size, len(data))
+        overlap = ceil((len(pattern) - 1) / 8)
+        chunk = np.frombuffer(data[start : end + overlap], dtype=np.uint8)
+    positions = find_in_bytes(chunk, pattern, (end - start) * 8)
+    return (positions + start * 8).tolist()
+
+
+def search_file(
+    filename,
+    size,
+    pattern: BitPattern,
+    max_bytes=0,
+    transforms: Sequence[Transform] = (),
+    chunk_bytes=CHUNK_BYTES,
+    max_workers: Optional[int] = None,
+) -> Iterator[List[int]]:
+    # `size` is the size of the transformed data, which is searched.
+    if max_workers is None and detect_compression(filename) is not None:
+        # A compressed file is decompressed in order, in a single worker.
+        max_workers = 1
+    context = multiprocessing.get_context("spawn")
+    transforms = list(transforms)
+    with ProcessPoolExecutor(max_workers, mp_context=context) as executor:
+        futures = [
+            executor.submit(
+                search_chunk,
+                filename,
+                max_bytes,
+                transforms,
+                size,
+                start,
+                chunk_bytes,
+                pattern,
+            )
+            for start in range(0, size, chunk_bytes)
+        ]
+        try:
+            for future in futures:
+                yield future.result()
+        finally:
+            for future in futures:
+                future.cancel()
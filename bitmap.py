@@ -1,10 +1,107 @@
 from dataclasses import dataclass
-from typing import List
+from math import ceil
+from threading import local
+from typing import Optional
+
+import numpy as np
+
+# QImage expects each scanline to start at a multiple of 32 bits.
+_SCANLINE_ALIGNMENT = 4
+
+_thread_bitmaps = local()
 
 
-@dataclass
 class Bitmap:
+    # Rows of bits, packed most significant bit first, written in place into a
+    # buffer that is kept between bitmaps, so creating a bitmap no larger than
+    # the last one allocates nothing. Rows are padded to the scanline alignment
+    # of QImage, which can use them without copying. After the full rows there
+    # may be a partial row of remainder_bits bits, padded with zeros.
+
+    def __init__(self) -> None:
+        super().__init__()
+        self._buffer = np.empty(0, dtype=np.uint8)
+        self._width = 0
+        self._stride = 0
+        self._num_rows = 0
+        self._remainder_bits = 0
+        # The number of bits in each row, when rows end before the width.
+        self.row_bits: Optional[np.ndarray] = None
+
+    def reset(self, width: int, num_rows: int, remainder_bits: int = 0) -> np.ndarray:
+        # Resizes the bitmap, growing the buffer only when it is too small, and
+        # returns its rows to be written. The partial row is cleared.
+        self._width = max(width, 0)
+        bytes_per_row = self.bytes_per_row
+        self._stride = ceil(bytes_per_row / _SCANLINE_ALIGNMENT) * _SCANLINE_ALIGNMENT
+        self._num_rows = num_rows
+        self._remainder_bits = remainder_bits
+        self.row_bits = None
+        size = self._stride * self.height
+        if len(self._buffer) < size:
+            self._buffer = np.empty(size, dtype=np.uint8)
+        rows = self.rows
+        if remainder_bits:
+            rows[num_rows] = 0
+        return rows
+
+    @property
+    def width(self) -> int:
+        return self._width
+
+    @property
+    def bytes_per_row(self) -> int:
+        return ceil(self._width / 8)
+
+    @property
+    def stride(self) -> int:
+        # The bytes from the start of a row to the start of the next one.
+        return self._stride
+
+    @property
+    def num_rows(self) -> int:
+        # The full rows, without the partial row.
+        return self._num_rows
+
+    @property
+    def remainder_bits(self) -> int:
+        return self._remainder_bits
+
+    @property
+    def height(self) -> int:
+        return self._num_rows + bool(self._remainder_bits)
+
+    @property
+    def rows(self) -> np.ndarray:
+        # All the rows, padding included, as a view of the buffer.
+        size = self._stride * self.height
+        return self._buffer[:size].reshape(self.height, self._stride)
+
+    @property
+    def full_rows(self) -> np.ndarray:
+        return self.rows[: self._num_rows, : self.bytes_per_row]
+
+    @property
+    def remainder(self) -> np.ndarray:
+        # The packed bits of the partial row.
+        if not self._remainder_bits:
+            return self._buffer[:0]
+        return self.rows[self._num_rows, : ceil(self._remainder_bits / 8)]
+
+
+def thread_bitmap() -> Bitmap:
+    # A bitmap kept for the calling thread, e.g. a rendering thread, so each
+    # bitmap it creates reuses the same buffer. Its rows are overwritten by the
+    # thread's next bitmap, so they must not be kept.
+    bitmap = getattr(_thread_bitmaps, "bitmap", None)
+    if bitmap is None:
+        bitmap = _thread_bitmaps.bitmap = Bitmap()
+    return bitmap
+
+
+@dataclass
+class DensityMap:
     data: bytes
     width: int
     bytes_per_row: int
-    remainder: List[bool]
+    remainder: bytes
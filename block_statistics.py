@@ -0,0 +1,103 @@
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from dataclasses import dataclass
+from math import ceil
+from typing import Iterator, Optional, Sequence
+
+import numpy as np
+
+from compressed_data_source import detect_compression
+from data_source import worker_data_source
+from density_pyramid import popcount
+from transforms import Transform, apply_transforms
+
+CHUNK_BYTES = 2 ** 23
+MAX_BLOCKS = 2 ** 16
+MIN_BLOCK_BYTES = 2 ** 9
+_BYTE_ONES = popcount(np.arange(256, dtype=np.uint8)).astype(np.int64)
+
+
+@dataclass
+class BlockStatistics:
+    first_block: int
+    # Shannon entropy of the bytes of each block, in bits per byte.
+    entropy: np.ndarray
+    # The fraction of one bits in each block.
+    density: np.ndarray
+
+
+def statistics_block_bytes(size: int) -> int:
+    # The smallest power of two, from MIN_BLOCK_BYTES, that splits the data into
+    # at most MAX_BLOCKS blocks.
+    block_bytes = MIN_BLOCK_BYTES
+    while block_bytes * MAX_BLOCKS < size:
+        block_bytes *= 2
+    return block_bytes
+
+
+def block_statistics(buf: np.ndarray, block_bytes: int) -> BlockStatistics:
+    # The last block may be partial.
+    num_blocks = ceil(len(buf) / block_bytes)
+    sizes = np.full(num_blocks, block_bytes)
+    if num_blocks:
+        sizes[-1] = len(buf) - (num_blocks - 1) * block_bytes
+
+    blocks = np.repeat(np.arange(num_blocks, dtype=np.intp) * 256, sizes)
+    counts = np.bincount(blocks + buf, minlength=num_blocks * 256)
+    counts = counts.reshape(num_blocks, 256)
+    p = counts / sizes[:, None]
+    with np.errstate(divide="ignore", invalid="ignore"):
+        entropy = np.where(p > 0, -p * np.log2(p), 0).sum(axis=1)
+    density = counts @ _BYTE_ONES / (sizes * 8)
+    return BlockStatistics(0, entropy, density)
+
+
+def statistics_chunk(
+    filename, max_bytes, transforms, size, start, chunk_bytes, block_bytes
+) -> BlockStatistics:
+    with worker_data_source(filename, max_bytes) as source:
+        data = apply_transforms(source, transforms, cache_bytes=0)
+        end = min(start + chunk_bytes, size, len(data))
+        buf = np.frombuffer(data[start:end], dtype=np.uint8)
+    statistics = block_statistics(buf, block_bytes)
+    statistics.first_block = start // block_bytes
+    return statistics
+
+
+def compute_statistics(
+    filename,
+    size,
+    block_bytes,
+    max_bytes=0,
+    transforms: Sequence[Transform] = (),
+    chunk_bytes=CHUNK_BYTES,
+    max_workers: Optional[int] = None,
+) -> Iterator[BlockStatistics]:
+    # Yields the statistics of each chunk as soon as it is done, in any order.
+    # `size` is the size of the transformed data.
+    if max_workers is None and detect_compression(filename) is not None:
+        # A compressed file is decompressed in order, in a single worker.
+        max_workers = 1
+    chunk_bytes = max(chunk_bytes // block_bytes, 1) * block_bytes
+    context = multiprocessing.get_context("spawn")
+    transforms = list(transforms)
+    with ProcessPoolExecutor(max_workers, mp_context=context) as executor:
+        futures = [
+            executor.submit(
+                statistics_chunk,
+                filename,
+                max_bytes,
+                transforms,
+                size,
+                start,
+                chunk_bytes,
+                block_bytes,
+            )
+            for start in range(0, size, chunk_bytes)
+        ]
+        try:
+            for future in as_completed(futures):
+                yield future.result()
+        finally:
+            for future in futures:
+                future.cancel()
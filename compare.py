@@ -0,0 +1,197 @@
+from typing import Callable, Optional, Tuple
+
+import numpy as np
+
+from data_source import DataSource
+
+CHUNK_BYTES = 2 ** 23
+# Differing bytes closer than this are one region, which keeps the index small
+# where the differences are dense.
+MIN_GAP_BYTES = 32
+_LEADING_ZEROS = np.array([8 - i.bit_length() for i in range(256)], dtype=np.int64)
+_TRAILING_ZEROS = np.array(
+    [(i & -i).bit_length() - 1 if i else 8 for i in range(256)], dtype=np.int64
+)
+
+
+class CompareDataSource(DataSource):
+    # The XOR of two sources, where bit i of the second source is compared to
+    # bit i + shift of the first one. Bits that only one of them has are XORed
+    # with zeros.
+
+    def __init__(self, first: DataSource, second: DataSource, shift: int = 0) -> None:
+        super().__init__()
+        self._first = first
+        self._second = second
+        self._shift = shift
+        self._size = self._compute_size()
+
+    @property
+    def first(self) -> DataSource:
+        return self._first
+
+    @property
+    def shift(self) -> int:
+        return self._shift
+
+    @property
+    def common_bits(self) -> Tuple[int, int]:
+        # The bits that both sources have.
+        start = max(self._shift, 0)
+        end = min(len(self._first) * 8, len(self._second) * 8 + self._shift)
+        return start, max(end, start)
+
+    def __len__(self) -> int:
+        return self._size
+
+    def read(self, start: int, size: int) -> bytes:
+        end = min(start + size, self._size)
+        if end <= start:
+            return b""
+        result = _read_padded(self._first, start, end)
+        result ^= self._read_second(start, end)
+        return result.tobytes()
+
+    def refresh(self) -> int:
+        self._first.refresh()
+        self._second.refresh()
+        self._size = self._compute_size()
+        return self._size
+
+    def close(self):
+        self._first.close()
+        self._second.close()
+
+    def _compute_size(self):
+        bits = max(len(self._first) * 8, len(self._second) * 8 + self._shift)
+        return -(-bits // 8)
+
+    def _read_second(self, start, end) -> np.ndarray:
+        whole, shift = divmod(start * 8 - self._shift, 8)
+        buf = _read_padded(self._second, whole, whole + end - start + 1)
+        if not shift:
+            return buf[:-1]
+        wide = buf.astype(np.uint16)
+        return ((wide[:-1] << shift | wide[1:] >> (8 - shift)) & 0xFF).astype(np.uint8)
+
+
+class DifferenceIndex:
+    # The differing regions, as sorted bit ranges [starts[i], ends[i]).
+
+    def __init__(self, starts: np.ndarray, ends: np.ndarray) -> None:
+        super().__init__()
+        self._starts = starts
+        self._ends = ends
+
+    @property
+    def starts(self) -> np.ndarray:
+        return self._starts
+
+    @property
+    def ends(self) -> np.ndarray:
+        return self._ends
+
+    @property
+    def differing_bits(self) -> int:
+        return int((self._ends - self._starts).sum())
+
+    def __len__(self):
+        return len(self._starts)
+
+    def next(self, position: int) -> Optional[int]:
+        # The start of the first region starting after position.
+        i = np.searchsorted(self._starts, position, side="right")
+        return int(self._starts[i]) if i < len(self._starts) else None
+
+    def previous(self, position: int) -> Optional[int]:
+        # The start of the last region starting before position.
+        i = np.searchsorted(self._starts, position, side="left") - 1
+        return int(self._starts[i]) if i >= 0 else None
+
+
+def build_difference_index(
+    data: CompareDataSource,
+    progress: Optional[Callable[[int, int], None]] = None,
+    should_stop: Optional[Callable[[], bool]] = None,
+    chunk_bytes: int = CHUNK_BYTES,
+) -> Optional[DifferenceIndex]:
+    # Scans the bits both sources have in chunks, and adds the bits only one of
+    # them has as differences. Returns None when stopped.
+    common_start, common_end = data.common_bits
+    first_byte, end_byte = common_start // 8, -(-common_end // 8)
+    byte_runs, starts, ends = [], [], []
+    for chunk_start in range(first_byte, end_byte, chunk_bytes):
+        if should_stop is not None and should_stop():
+            return None
+        chunk_end = min(chunk_start + chunk_bytes, end_byte)
+        xor = np.frombuffer(data.read(chunk_start, chunk_end - chunk_start), np.uint8)
+        xor = _mask_edges(xor, chunk_start, common_start, common_end)
+        chunk_runs, chunk_starts, chunk_ends = _find_runs(xor, chunk_start)
+        byte_runs.append(chunk_runs)
+        starts.append(chunk_starts)
+        ends.append(chunk_ends)
+        if progress is not None:
+            progress(chunk_end - first_byte, end_byte - first_byte)
+
+    if byte_runs:
+        byte_runs = np.concatenate(byte_runs)
+        starts, ends = np.concatenate(starts), np.concatenate(ends)
+        # Regions that continue into the next chunk.
+        joins = byte_runs[1:, 0] - byte_runs[:-1, 1] < MIN_GAP_BYTES
+        starts, ends = _join(starts, ends, joins)
+    else:
+        starts = ends = np.empty(0, dtype=np.int64)
+
+    total_bits = len(data) * 8
+    if common_start:
+        starts, ends = np.r_[0, starts], np.r_[common_start, ends]
+    if common_end < total_bits:
+        starts, ends = np.r_[starts, common_end], np.r_[ends, total_bits]
+    starts, ends = _join(starts, ends, starts[1:] == ends[:-1])
+    if progress is not None:
+        progress(1, 1)
+    return DifferenceIndex(starts.astype(np.int64), ends.astype(np.int64))
+
+
+def _mask_edges(xor: np.ndarray, chunk_start, common_start, common_end):
+    # Clears the bits of the first and last bytes outside the common bits.
+    first, last = common_start // 8, (common_end - 1) // 8
+    if not (chunk_start <= first or last < chunk_start + len(xor)):
+        return xor
+    xor = xor.copy()
+    if chunk_start <= first:
+        xor[first - chunk_start] &= 0xFF >> (common_start % 8)
+    if last < chunk_start + len(xor):
+        xor[last - chunk_start] &= (0xFF00 >> ((common_end - 1) % 8 + 1)) & 0xFF
+    return xor
+
+
+def _find_runs(xor: np.ndarray, chunk_start):
+    # The runs of differing bytes, close runs joined, with bit precise bounds.
+    edges = np.diff((xor != 0).astype(np.int8), prepend=0, append=0)
+    run_starts, run_ends = np.flatnonzero(edges == 1), np.flatnonzero(edges == -1)
+    starts = (chunk_start + run_starts) * 8 + _LEADING_ZEROS[xor[run_starts]]
+    ends = (chunk_start + run_ends) * 8 - _TRAILING_ZEROS[xor[run_ends - 1]]
+    joins = run_starts[1:] - run_ends[:-1] < MIN_GAP_BYTES
+    starts, ends = _join(starts, ends, joins)
+    run_starts, run_ends = _join(run_starts, run_ends, joins)
+    runs = np.stack([run_starts, run_ends], axis=1) + chunk_start
+    return runs, starts, ends
+
+
+def _join(starts: np.ndarray, ends: np.ndarray, joins: np.ndarray):
+    # Joins each region i + 1 where joins[i] to the region before it.
+    if not len(starts):
+        return starts, ends
+    return starts[np.r_[True, ~joins]], ends[np.r_[~joins, True]]
+
+
+def _read_padded(source: DataSource, start, end) -> np.ndarray:
+    # Bytes before the start or past the end of the source are zeros.
+    buf = np.zeros(end - start, dtype=np.uint8)
+    first = max(start, 0)
+    chunk = source.read(first, max(end - first, 0))
+    buf[first - start : first - start + len(chunk)] = np.frombuffer(
+        chunk, dtype=np.uint8
+    )
+    return buf
@@ -0,0 +1,480 @@
+import json
+import lzma
+import os
+import zlib
+from bisect import bisect_right
+from collections import OrderedDict
+from dataclasses import dataclass
+from threading import Lock
+from typing import Callable, List, Optional, Tuple
+
+from data_source import DataSource, _capped_size
+
+try:
+    from compression import zstd
+except ImportError:
+    zstd = None
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+CHECKPOINT_BYTES = 2 ** 22
+SIDECAR_SUFFIX = ".bvidx"
+_SIDECAR_VERSION = 1
+_READ_BYTES = 2 ** 16
+_OUTPUT_BYTES = 2 ** 20
+_BLOCK_BYTES = 2 ** 18
+_CACHE_BYTES = 2 ** 26
+_MAGICS = {
+    b"\x1f\x8b": "gzip",
+    b"\xfd7zXZ\x00": "xz",
+    b"\x28\xb5\x2f\xfd": "zstd",
+}
+_XZ_HEADER_BYTES = 12
+_XZ_FOOTER_BYTES = 12
+_ERRORS: Tuple[type, ...] = (zlib.error, lzma.LZMAError, EOFError)
+if zstd is not None:
+    _ERRORS += (zstd.ZstdError,)
+if zstandard is not None:
+    _ERRORS += (zstandard.ZstdError,)
+
+
+@dataclass
+class Checkpoint:
+    # A position in the decompressed data where decompression can start. Restart
+    # points, at the start of a gzip member, xz block or zstd frame, need no
+    # state and are saved to the sidecar file. Other checkpoints hold a copy of
+    # the decompressor, which only exists in memory.
+    offset: int
+    compressed_offset: int
+    header_offset: Optional[int] = None
+    compressed_end: Optional[int] = None
+    state: object = None
+
+
+def detect_compression(filename) -> Optional[str]:
+    with open(filename, "rb") as f:
+        head = f.read(max(len(magic) for magic in _MAGICS))
+    for magic, compression in _MAGICS.items():
+        if head.startswith(magic):
+            return compression
+    return None
+
+
+def _new_decompressor(compression):
+    if compression == "gzip":
+        return zlib.decompressobj(wbits=31)
+    if compression == "xz":
+        return lzma.LZMADecompressor(format=lzma.FORMAT_XZ)
+    if zstd is not None:
+        return zstd.ZstdDecompressor()
+    if zstandard is not None:
+        return _ZstandardDecompressor()
+    raise OSError("Reading zstd files needs Python 3.14 or the zstandard package")
+
+
+class _ZstandardDecompressor:
+    # Gives the zstandard package the interface of the other decompressors.
+
+    def __init__(self) -> None:
+        self._decompressor = zstandard.ZstdDecompressor().decompressobj()
+        self._output = b""
+
+    @property
+    def eof(self) -> bool:
+        return self._decompressor.eof and not self._output
+
+    @property
+    def unused_data(self) -> bytes:
+        return self._decompressor.unused_data
+
+    def decompress(self, data, max_length=-1) -> bytes:
+        if data:
+            self._output += self._decompressor.decompress(data)
+        if max_length < 0:
+            max_length = len(self._output)
+        output, self._output = self._output[:max_length], self._output[max_length:]
+        return output
+
+
+class _Inflater:
+    # Decompresses from a checkpoint on, continuing with the following gzip
+    # members, xz streams or zstd frames.
+
+    def __init__(self, source: "CompressedDataSource", checkpoint: Checkpoint):
+        self._source = source
+        self.start = checkpoint.offset
+        self.offset = checkpoint.offset
+        self.members: List[Checkpoint] = []
+        self._position = checkpoint.compressed_offset
+        self._input = b""
+        self._eof = False
+        if checkpoint.state is not None:
+            self._decompressor = checkpoint.state.copy()
+        else:
+            self._decompressor = _new_decompressor(source.compression)
+            if checkpoint.header_offset is not None:
+                # An xz block is decompressed on its own, with the header of its
+                # stream, and ends before the stream index, which doesn't match.
+                self._input = source.read_compressed(
+                    checkpoint.header_offset, _XZ_HEADER_BYTES
+                )
+        self._end = checkpoint.compressed_end
+
+    @property
+    def compressed_position(self) -> int:
+        return self._position - len(self._input)
+
+    def checkpoint(self) -> Optional[Checkpoint]:
+        if not hasattr(self._decompressor, "copy") or self._decompressor.eof:
+            return None
+        return Checkpoint(
+            self.offset, self.compressed_position, state=self._decompressor.copy()
+        )
+
+    def read(self, max_length: int) -> bytes:
+        try:
+            while not self._eof:
+                if self._decompressor.eof:
+                    self._next_member()
+                    continue
+                output = self._decompressor.decompress(self._input, max_length)
+                self._input = getattr(self._decompressor, "unconsumed_tail", b"")
+                if output:
+                    self.offset += len(output)
+                    return output
+                if not self._decompressor.eof and not self._fill():
+                    # A truncated file ends with what could be decompressed.
+                    self._eof = True
+        except _ERRORS:
+            # Such as trailing garbage after the last member.
+            self._eof = True
+        return b""
+
+    def _fill(self) -> bool:
+        size = _READ_BYTES
+        if self._end is not None:
+            size = min(size, self._end - self._position)
+        chunk = self._source.read_compressed(self._position, size)
+        self._position += len(chunk)
+        self._input += chunk
+        return bool(chunk)
+
+    def _next_member(self):
+        self._input = self._decompressor.unused_data + self._input
+        # xz streams may be followed by padding, and gzip files by zeros.
+        while not self._input.lstrip(b"\0"):
+            self._input = b""
+            if not self._fill():
+                self._eof = True
+                return
+        self._input = self._input.lstrip(b"\0")
+        self._decompressor = _new_decompressor(self._source.compression)
+        self.members.append(Checkpoint(self.offset, self.compressed_position))
+
+
+class CompressedDataSource(DataSource):
+    def __init__(
+        self, filename, max_bytes=0, checkpoint_bytes=CHECKPOINT_BYTES
+    ) -> None:
+        super().__init__()
+        self._filename = filename
+        self._compression = detect_compression(filename)
+        if self._compression is None:
+            raise ValueError(f"{filename} is not a gzip, xz or zstd file")
+        self._file = open(filename, "rb")
+        self._file_size = os.fstat(self._file.fileno()).st_size
+        self._file_lock = Lock()
+        self._max_bytes = max_bytes
+        self._checkpoint_bytes = checkpoint_bytes
+        self._checkpoints = [Checkpoint(0, 0)]
+        self._offsets = [0]
+        self._total_size: Optional[int] = None
+        self._size = 0
+        self._lock = Lock()
+        self._decompress_lock = Lock()
+        self._cursor: Optional[_Inflater] = None
+        self._max_blocks = _CACHE_BYTES // _BLOCK_BYTES
+        self._blocks: "OrderedDict[int, bytes]" = OrderedDict()
+
+        index = self._load_sidecar()
+        if index is None and self._compression == "xz":
+            index = _xz_index(self.read_compressed, self._file_size)
+        if index is not None:
+            self._set_checkpoints(*index)
+
+    @property
+    def compression(self) -> str:
+        return self._compression
+
+    @property
+    def sidecar_filename(self) -> str:
+        return self._filename + SIDECAR_SUFFIX
+
+    @property
+    def is_sized(self) -> bool:
+        return self._total_size is not None
+
+    @property
+    def needs_index(self) -> bool:
+        # Until the size is known, and for gzip files until there are
+        # checkpoints about every checkpoint_bytes. xz and zstd decompressors
+        # cannot be copied, so their only checkpoints are restart points.
+        if self._total_size is None:
+            return True
+        if self._compression != "gzip":
+            return False
+        ends = self._offsets[1:] + [self._total_size]
+        gaps = (end - start for start, end in zip(self._offsets, ends))
+        return max(gaps) > 2 * self._checkpoint_bytes
+
+    def __len__(self) -> int:
+        return self._size
+
+    def read(self, start: int, size: int) -> bytes:
+        end = min(start + size, self._size)
+        if end <= start:
+            return b""
+        if end - start > self._max_blocks * _BLOCK_BYTES // 4:
+            return self._decompress(start, end)
+
+        first, last = start // _BLOCK_BYTES, (end - 1) // _BLOCK_BYTES
+        blocks = []
+        index = first
+        while index <= last:
+            block = self._cached_block(index) or self._decompress_blocks(index, last)
+            blocks.append(block)
+            index += len(block) // _BLOCK_BYTES
+            if len(block) % _BLOCK_BYTES or not block:
+                break
+        offset = first * _BLOCK_BYTES
+        return b"".join(blocks)[start - offset : end - offset]
+
+    def refresh(self) -> int:
+        return self._size
+
+    def close(self):
+        self._cursor = None
+        self._file.close()
+
+    def read_compressed(self, position, size) -> bytes:
+        with self._file_lock:
+            self._file.seek(position)
+            return self._file.read(size)
+
+    def build_index(
+        self,
+        progress: Optional[Callable[[int, int], None]] = None,
+        should_stop: Optional[Callable[[], bool]] = None,
+    ) -> bool:
+        # Decompresses the whole file once, adding checkpoints and growing the
+        # size as it goes. Returns False when stopped.
+        inflater = _Inflater(self, Checkpoint(0, 0))
+        last_checkpoint = 0
+        while True:
+            if should_stop is not None and should_stop():
+                return False
+            if self._max_bytes and inflater.offset >= self._max_bytes:
+                break
+            output = inflater.read(_OUTPUT_BYTES)
+            if not output:
+                break
+            for member in inflater.members:
+                self._add_checkpoint(member)
+                last_checkpoint = member.offset
+            inflater.members.clear()
+            if inflater.offset - last_checkpoint >= self._checkpoint_bytes:
+                checkpoint = inflater.checkpoint()
+                if checkpoint is not None:
+                    self._add_checkpoint(checkpoint)
+                    last_checkpoint = checkpoint.offset
+            if self._total_size is None:
+                self._size = _capped_size(inflater.offset, self._max_bytes)
+            if progress is not None:
+                progress(inflater.compressed_position, self._file_size)
+
+        if self._total_size is None:
+            if not self._max_bytes or inflater.offset < self._max_bytes:
+                self._total_size = inflater.offset
+                self._save_sidecar()
+            else:
+                self._total_size = self._max_bytes
+            self._size = _capped_size(self._total_size, self._max_bytes)
+        if progress is not None:
+            progress(self._file_size, self._file_size)
+        return True
+
+    def _set_checkpoints(self, checkpoints: List[Checkpoint], total_size: int):
+        with self._lock:
+            self._checkpoints = checkpoints
+            self._offsets = [checkpoint.offset for checkpoint in checkpoints]
+            self._total_size = total_size
+            self._size = _capped_size(total_size, self._max_bytes)
+
+    def _add_checkpoint(self, checkpoint: Checkpoint):
+        with self._lock:
+            i = bisect_right(self._offsets, checkpoint.offset)
+            if self._offsets[i - 1] == checkpoint.offset:
+                return
+            self._checkpoints.insert(i, checkpoint)
+            self._offsets.insert(i, checkpoint.offset)
+
+    def _checkpoint_at(self, offset) -> Checkpoint:
+        with self._lock:
+            return self._checkpoints[bisect_right(self._offsets, offset) - 1]
+
+    def _cached_block(self, index) -> Optional[bytes]:
+        with self._lock:
+            block = self._blocks.get(index)
+            if block is not None:
+                self._blocks.move_to_end(index)
+            return block
+
+    def _decompress_blocks(self, first, last) -> bytes:
+        # Decompresses from block `first` up to the next cached block, and
+        # caches the blocks. A partial last block is only cached once the size
+        # is final.
+        end = first + 1
+        while end <= last and self._cached_block(end) is None:
+            end += 1
+        start = first * _BLOCK_BYTES
+        data = self._decompress(start, min(end * _BLOCK_BYTES, self._size))
+        with self._lock:
+            for i in range(0, len(data), _BLOCK_BYTES):
+                block = data[i : i + _BLOCK_BYTES]
+                if len(block) == _BLOCK_BYTES or self._total_size is not None:
+                    self._blocks[first + i // _BLOCK_BYTES] = block
+            while len(self._blocks) > self._max_blocks:
+                self._blocks.popitem(last=False)
+        return data
+
+    def _decompress(self, start, end) -> bytes:
+        with self._decompress_lock:
+            inflater = self._cursor
+            checkpoint = self._checkpoint_at(start)
+            if inflater is None or not checkpoint.offset <= inflater.offset <= start:
+                inflater = _Inflater(self, checkpoint)
+            self._cursor = None
+
+            parts = []
+            position = inflater.offset
+            while position < end:
+                output = inflater.read(min(end - position, _OUTPUT_BYTES))
+                if not output:
+                    # xz blocks end on their own, and the next block has its
+                    # own checkpoint.
+                    checkpoint = self._checkpoint_at(position)
+                    if checkpoint.offset != position or position == inflater.start:
+                        break
+                    inflater = _Inflater(self, checkpoint)
+                    continue
+                if position + len(output) > start:
+                    parts.append(output[max(start - position, 0) :])
+                position += len(output)
+            self._cursor = inflater
+        return b"".join(parts)
+
+    def _load_sidecar(self) -> Optional[Tuple[List[Checkpoint], int]]:
+        try:
+            with open(self.sidecar_filename) as f:
+                index = json.load(f)
+            if index["version"] != _SIDECAR_VERSION or index["file"] != self._stat():
+                return None
+            checkpoints = [
+                Checkpoint(*checkpoint) for checkpoint in index["checkpoints"]
+            ]
+            return checkpoints, index["size"]
+        except (OSError, ValueError, KeyError, TypeError):
+            return None
+
+    def _save_sidecar(self):
+        with self._lock:
+            checkpoints = [
+                [
+                    checkpoint.offset,
+                    checkpoint.compressed_offset,
+                    checkpoint.header_offset,
+                    checkpoint.compressed_end,
+                ]
+                for checkpoint in self._checkpoints
+                if checkpoint.state is None
+            ]
+        index = {
+            "version": _SIDECAR_VERSION,
+            "file": self._stat(),
+            "size": self._total_size,
+            "checkpoints": checkpoints,
+        }
+        try:
+            with open(self.sidecar_filename, "w") as f:
+                json.dump(index, f)
+        except OSError:
+            # The index is rebuilt the next time, e.g. on read only media.
+            pass
+
+    def _stat(self):
+        stat = os.fstat(self._file.fileno())
+        return [stat.st_size, stat.st_mtime_ns]
+
+
+def _xz_index(
+    read: Callable[[int, int], bytes], file_size: int
+) -> Optional[Tuple[List[Checkpoint], int]]:
+    # Each block of an xz file can be decompressed on its own, and the index at
+    # the end of each stream has the sizes of its blocks. Streams are read from
+    # the last one backwards.
+    streams = []
+    end = file_size
+    while end > 0:
+        if end >= 4 and read(end - 4, 4) == b"\0" * 4:
+            end -= 4
+            continue
+        footer = read(end - _XZ_FOOTER_BYTES, _XZ_FOOTER_BYTES)
+        if len(footer) != _XZ_FOOTER_BYTES or footer[10:] != b"YZ":
+            return None
+        index_size = (int.from_bytes(footer[4:8], "little") + 1) * 4
+        index_start = end - _XZ_FOOTER_BYTES - index_size
+        records = _xz_index_records(read(index_start, index_size))
+        if records is None:
+            return None
+        blocks_size = sum((unpadded + 3) // 4 * 4 for unpadded, _ in records)
+        stream_start = index_start - blocks_size - _XZ_HEADER_BYTES
+        if stream_start < 0 or read(stream_start, 6) != b"\xfd7zXZ\x00":
+            return None
+        streams.append((stream_start, records))
+        end = stream_start
+
+    checkpoints = []
+    offset = 0
+    for stream_start, records in reversed(streams):
+        position = stream_start + _XZ_HEADER_BYTES
+        for unpadded, size in records:
+            end = position + (unpadded + 3) // 4 * 4
+            checkpoints.append(Checkpoint(offset, position, stream_start, end))
+            position = end
+            offset += size
+    if not checkpoints:
+        return None
+    return checkpoints, offset
+
+
+def _xz_index_records(index: bytes) -> Optional[List[Tuple[int, int]]]:
+    if not index or index[0] != 0:
+        return None
+    position = 1
+    values = []
+    while position < len(index) and (not values or len(values) < values[0] * 2 + 1):
+        value = 0
+        for shift in range(0, 63, 7):
+            if position >= len(index):
+                return None
+            byte = index[position]
+            position += 1
+            value |= (byte & 0x7F) << shift
+            if not byte & 0x80:
+                break
+        values.append(value)
+    if not values or len(values) != values[0] * 2 + 1:
+        return None
+    return list(zip(values[1::2], values[2::2]))
@@ -0,0 +1,153 @@
+import mmap
+import os
+from contextlib import contextmanager
+from threading import Lock
+from typing import Iterator, Union
+
+# The compressed file of a worker process, see worker_data_source.
+_worker_compressed_source = None
+
+
+class DataSource:
+    def __len__(self) -> int:
+        raise NotImplementedError
+
+    def read(self, start: int, size: int) -> bytes:
+        raise NotImplementedError
+
+    def refresh(self) -> int:
+        return len(self)
+
+    def close(self):
+        pass
+
+    def __getitem__(self, item: Union[int, slice]):
+        if isinstance(item, slice):
+            start, stop, step = item.indices(len(self))
+            if step != 1:
+                raise ValueError("DataSource only supports contiguous slices")
+            return self.read(start, max(stop - start, 0))
+
+        if item < 0:
+            item += len(self)
+        if not 0 <= item < len(self):
+            raise IndexError("DataSource index out of range")
+        return self.read(item, 1)[0]
+
+
+class MmapDataSource(DataSource):
+    def __init__(self, filename, max_bytes=0) -> None:
+        super().__init__()
+        self._file = open(filename, "rb")
+        self._max_bytes = max_bytes
+        try:
+            self._mmap = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        except (ValueError, OSError):
+            self._file.close()
+            raise
+        self._size = _capped_size(len(self._mmap), max_bytes)
+
+    def __len__(self) -> int:
+        return self._size
+
+    def read(self, start: int, size: int) -> bytes:
+        end = min(start + size, self._size)
+        return self._mmap[start:end]
+
+    def refresh(self) -> int:
+        # The size shrinks before and grows after remapping, so reads never pass
+        # the end of the mapping. The old mapping is unmapped once the reads
+        # still using it finish.
+        size = _capped_size(os.fstat(self._file.fileno()).st_size, self._max_bytes)
+        if size < self._size:
+            self._size = size
+        if size > len(self._mmap):
+            self._mmap = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        self._size = size
+        return size
+
+    def close(self):
+        self._mmap.close()
+        self._file.close()
+
+
+class FileDataSource(DataSource):
+    def __init__(self, filename, max_bytes=0) -> None:
+        super().__init__()
+        self._file = open(filename, "rb")
+        self._max_bytes = max_bytes
+        self._lock = Lock()
+        self._size = 0
+        self.refresh()
+
+    def __len__(self) -> int:
+        return self._size
+
+    def read(self, start: int, size: int) -> bytes:
+        size = min(size, self._size - start)
+        if size <= 0:
+            return b""
+        with self._lock:
+            self._file.seek(start)
+            return self._file.read(size)
+
+    def refresh(self) -> int:
+        file_size = os.fstat(self._file.fileno()).st_size
+        self._size = _capped_size(file_size, self._max_bytes)
+        return self._size
+
+    def close(self):
+        self._file.close()
+
+
+class BytesDataSource(DataSource):
+    def __init__(self, data: bytes) -> None:
+        super().__init__()
+        self._data = data
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def read(self, start: int, size: int) -> bytes:
+        return bytes(self._data[start : start + size])
+
+
+def open_data_source(filename, max_bytes=0) -> DataSource:
+    # Imported here, since the compressed data source builds on this module.
+    from compressed_data_source import CompressedDataSource, detect_compression
+
+    if detect_compression(filename) is not None:
+        return CompressedDataSource(filename, max_bytes)
+    try:
+        return MmapDataSource(filename, max_bytes)
+    except (ValueError, OSError):
+        return FileDataSource(filename, max_bytes)
+
+
+@contextmanager
+def worker_data_source(filename, max_bytes=0) -> Iterator[DataSource]:
+    # Opens the data for a task of a worker process. A compressed file stays
+    # open between the tasks of a worker, so each task continues decompressing
+    # where the previous one stopped.
+    global _worker_compressed_source
+    from compressed_data_source import CompressedDataSource, detect_compression
+
+    if detect_compression(filename) is None:
+        source = open_data_source(filename, max_bytes)
+        try:
+            yield source
+        finally:
+            source.close()
+        return
+
+    key = (filename, max_bytes)
+    if _worker_compressed_source is None or _worker_compressed_source[0] != key:
+        source = CompressedDataSource(filename, max_bytes)
+        if not source.is_sized:
+            source.build_index()
+        _worker_compressed_source = (key, source)
+    yield _worker_compressed_source[1]
+
+
+def _capped_size(size, max_bytes):
+    return min(size, max_bytes) if max_bytes else size
@@ -0,0 +1,232 @@
+from math import ceil
+from threading import Lock
+from typing import Callable, Dict, List, Optional
+
+import numpy as np
+from numpy.lib.stride_tricks import as_strided
+
+from data_source import DataSource
+
+_BASE_BLOCK_BYTES = 16
+_MAX_BASE_BLOCKS = 2 ** 25
+_CHUNK_BYTES = 2 ** 24
+# Blocks counted from the data for a view while the levels are not built.
+_MAX_COUNT_BYTES = 2 ** 22
+_POPCOUNT = np.array([bin(i).count("1") for i in range(256)], dtype=np.uint8)
+
+
+def popcount(buf: np.ndarray) -> np.ndarray:
+    return _POPCOUNT[buf]
+
+
+class DensityPyramid:
+    def __init__(self, data: DataSource) -> None:
+        super().__init__()
+        self._data = data
+        self._size = 0
+        self._base_block_bytes = _base_block_bytes(len(data))
+        self._levels: List[np.ndarray] = []
+        self._lock = Lock()
+
+    @property
+    def base_block_bytes(self) -> int:
+        return self._base_block_bytes
+
+    @property
+    def is_built(self) -> bool:
+        return bool(self._levels) and self._size == len(self._data)
+
+    @property
+    def nbytes(self) -> int:
+        return sum(level.nbytes for level in self._levels)
+
+    def build(
+        self,
+        progress: Optional[Callable[[int, int], None]] = None,
+        should_stop: Optional[Callable[[], bool]] = None,
+    ) -> bool:
+        # Builds the levels for the current size of the data, or extends them
+        # when the data grew, on the calling thread. densities() keeps using the
+        # levels built before until then. Returns False when stopped.
+        size = len(self._data)
+        with self._lock:
+            levels, built_size = self._levels, self._size
+            base_block_bytes = self._base_block_bytes
+        if levels and size == built_size:
+            return True
+        if levels and size > built_size and base_block_bytes == _base_block_bytes(size):
+            levels = self._extend_levels(
+                levels, built_size, size, base_block_bytes, should_stop
+            )
+        else:
+            base_block_bytes = _base_block_bytes(size)
+            levels = self._build_levels(size, base_block_bytes, progress, should_stop)
+        if levels is None:
+            return False
+        with self._lock:
+            self._levels = levels
+            self._size = size
+            self._base_block_bytes = base_block_bytes
+        return True
+
+    def arrays(self) -> Dict[str, np.ndarray]:
+        # The built levels, to be restored with restore().
+        with self._lock:
+            arrays = {f"level{i}": level for i, level in enumerate(self._levels)}
+            arrays["size"] = np.array([self._size, self._base_block_bytes])
+        return arrays
+
+    def restore(self, arrays: Dict[str, np.ndarray]) -> bool:
+        # Restores levels built before for the same data.
+        size, base_block_bytes = (int(value) for value in arrays["size"])
+        if size != len(self._data) or base_block_bytes != _base_block_bytes(size):
+            return False
+        levels = [arrays[f"level{i}"] for i in range(len(arrays) - 1)]
+        with self._lock:
+            self._levels = levels
+            self._size = size
+            self._base_block_bytes = base_block_bytes
+        return True
+
+    def densities(
+        self, block_bytes, first_block, rows, columns, row_step
+    ) -> Optional[np.ndarray]:
+        # Until the levels are built for the current size of the data, only
+        # blocks quick to count are counted from the data, and None is returned
+        # for the others, since building the levels is a pass over all of it.
+        size = len(self._data)
+        with self._lock:
+            levels, built_size = self._levels, self._size
+            base_block_bytes = self._base_block_bytes
+        if levels and built_size == size and block_bytes >= base_block_bytes:
+            level_index = (block_bytes // base_block_bytes).bit_length() - 1
+            counts = self._level_counts(
+                levels[min(level_index, len(levels) - 1)],
+                first_block,
+                rows,
+                columns,
+                row_step,
+            )
+        elif (
+            block_bytes < _base_block_bytes(size)
+            or rows * columns * block_bytes <= _MAX_COUNT_BYTES
+        ):
+            counts = self._count_from_data(
+                size, block_bytes, first_block, rows, columns, row_step
+            )
+        else:
+            return None
+        block_bits = np.full(counts.shape, block_bytes * 8, dtype=np.int64)
+        last_block = ceil(size / block_bytes) - 1
+        last_bits = (size - last_block * block_bytes) * 8
+        indices = self._block_indices(first_block, rows, columns, row_step)
+        block_bits[indices == last_block] = last_bits
+        return (counts.astype(np.int64) * 255 // block_bits).astype(np.uint8)
+
+    def _build_levels(self, size, base_block_bytes, progress, should_stop):
+        counts = self._count_blocks(0, size, base_block_bytes, progress, should_stop)
+        if counts is None:
+            return None
+        levels = [counts]
+        while len(levels[-1]) > 1:
+            levels.append(_sum_pairs(levels[-1], base_block_bytes << len(levels)))
+        return levels
+
+    def _extend_levels(self, old_levels, old_size, size, base_block_bytes, should_stop):
+        # Only the blocks from the previously partial last block onwards are
+        # counted again.
+        first_block = old_size // base_block_bytes
+        counts = self._count_blocks(
+            first_block * base_block_bytes, size, base_block_bytes, None, should_stop
+        )
+        if counts is None:
+            return None
+        levels = [np.concatenate([old_levels[0][:first_block], counts])]
+        while len(levels[-1]) > 1:
+            level_index = len(levels)
+            first_block //= 2
+            tail = _sum_pairs(
+                levels[-1][first_block * 2 :], base_block_bytes << level_index
+            )
+            if level_index < len(old_levels):
+                tail = np.concatenate([old_levels[level_index][:first_block], tail])
+            levels.append(tail)
+        return levels
+
+    @staticmethod
+    def _level_counts(level, first_block, rows, columns, row_step):
+        if first_block + (rows - 1) * row_step + columns > len(level):
+            raise IndexError("Blocks out of range")
+        return as_strided(
+            level[first_block:],
+            shape=(rows, columns),
+            strides=(row_step * level.itemsize, level.itemsize),
+            writeable=False,
+        )
+
+    def _count_from_data(self, size, block_bytes, first_block, rows, columns, row_step):
+        counts = np.empty((rows, columns), dtype=np.uint32)
+        for row in range(rows):
+            start = (first_block + row * row_step) * block_bytes
+            buf = np.zeros(columns * block_bytes, dtype=np.uint8)
+            chunk = self._data.read(start, min(len(buf), size - start))
+            buf[: len(chunk)] = np.frombuffer(chunk, dtype=np.uint8)
+            counts[row] = popcount(buf).reshape(columns, block_bytes).sum(axis=1)
+        return counts
+
+    @staticmethod
+    def _block_indices(first_block, rows, columns, row_step):
+        return (
+            first_block
+            + np.arange(rows, dtype=np.int64)[:, None] * row_step
+            + np.arange(columns, dtype=np.int64)
+        )
+
+    def _count_blocks(self, start_byte, size, block_bytes, progress, should_stop):
+        first_block = start_byte // block_bytes
+        counts = np.zeros(
+            ceil(size / block_bytes) - first_block, dtype=_counts_dtype(block_bytes)
+        )
+        chunk_bytes = max(_CHUNK_BYTES // block_bytes, 1) * block_bytes
+        for start in range(start_byte, size, chunk_bytes):
+            if should_stop is not None and should_stop():
+                return None
+            chunk = self._data.read(start, min(chunk_bytes, size - start))
+            buf = np.frombuffer(chunk, dtype=np.uint8)
+            bits = popcount(buf)
+            if len(bits) % block_bytes:
+                bits = np.concatenate(
+                    [bits, np.zeros(-len(bits) % block_bytes, dtype=np.uint8)]
+                )
+            first = (start - start_byte) // block_bytes
+            counts[first : first + len(bits) // block_bytes] = bits.reshape(
+                -1, block_bytes
+            ).sum(axis=1)
+            if progress is not None:
+                progress(min(start + chunk_bytes, size), size)
+        return counts
+
+
+def _sum_pairs(level: np.ndarray, block_bytes) -> np.ndarray:
+    # The counts of blocks of block_bytes, from the counts of their halves.
+    if len(level) % 2:
+        level = np.append(level, 0).astype(level.dtype)
+    return level.reshape(-1, 2).sum(axis=1, dtype=_counts_dtype(block_bytes))
+
+
+def _base_block_bytes(size):
+    block_bytes = _BASE_BLOCK_BYTES
+    while ceil(size / block_bytes) > _MAX_BASE_BLOCKS:
+        block_bytes *= 2
+    return block_bytes
+
+
+def _counts_dtype(block_bytes):
+    max_count = block_bytes * 8
+    if max_count <= np.iinfo(np.uint8).max:
+        return np.uint8
+    if max_count <= np.iinfo(np.uint16).max:
+        return np.uint16
+    if max_count <= np.iinfo(np.uint32).max:
+        return np.uint32
+    return np.uint64
@@ -0,0 +1,207 @@
+from array import array
+from dataclasses import dataclass
+from math import ceil
+from typing import Callable, Optional
+
+import numpy as np
+
+from bit_search import find_in_bytes, parse_pattern
+from data_source import DataSource
+
+CHUNK_BYTES = 2 ** 23
+# Row starts below this fit in 32 bits, which halves the size of the index.
+_MAX_COMPACT = 2 ** 32
+# A length field is read from a window of data, which is read again past it.
+_WINDOW_BYTES = 2 ** 16
+
+
+class FrameIndex:
+    # The first bit of each frame, sorted. Each frame ends where the next one
+    # starts, and the last one at the end of the data.
+
+    def __init__(self, starts: np.ndarray) -> None:
+        super().__init__()
+        dtype = np.uint32 if not len(starts) or starts[-1] < _MAX_COMPACT else np.int64
+        self._starts = np.asarray(starts).astype(dtype, copy=False)
+
+    @property
+    def starts(self) -> np.ndarray:
+        return self._starts
+
+    def __len__(self):
+        return len(self._starts)
+
+    def row_starts(self, start_row: int, num_rows: int) -> np.ndarray:
+        return self._starts[start_row : start_row + num_rows].astype(np.int64)
+
+    def row_of(self, position: int) -> int:
+        # The frame that has the bit at position.
+        row = int(np.searchsorted(self._starts, position, side="right")) - 1
+        return max(row, 0)
+
+
+class Framing:
+    # Where the frames start, shown as the rows of the view. Built in a single
+    # streaming pass over the data, returning None when stopped.
+
+    @property
+    def spec(self) -> str:
+        raise NotImplementedError
+
+    def build_index(
+        self,
+        data: DataSource,
+        progress: Optional[Callable[[int, int], None]] = None,
+        should_stop: Optional[Callable[[], bool]] = None,
+    ) -> Optional[FrameIndex]:
+        raise NotImplementedError
+
+
+@dataclass(frozen=True)
+class SyncFraming(Framing):
+    # Frames start at each match of a sync word. The bits before the first
+    # match are a frame too.
+    pattern: str
+
+    @property
+    def spec(self) -> str:
+        return f"sync:{self.pattern}"
+
+    def build_index(self, data, progress=None, should_stop=None):
+        pattern = parse_pattern(self.pattern)
+        size = len(data)
+        overlap = ceil((len(pattern) - 1) / 8)
+        starts = [np.zeros(1, dtype=np.int64)]
+        for start in range(0, size, CHUNK_BYTES):
+            if should_stop is not None and should_stop():
+                return None
+            end = min(start + CHUNK_BYTES, size)
+            chunk = np.frombuffer(data.read(start, end - start + overlap), np.uint8)
+            matches = find_in_bytes(chunk, pattern, (end - start) * 8)
+            starts.append(matches.astype(np.int64) + start * 8)
+            if progress is not None:
+                progress(end, size)
+        starts = np.concatenate(starts)
+        if len(starts) > 1 and starts[1] == 0:
+            starts = starts[1:]
+        return FrameIndex(starts)
+
+
+@dataclass(frozen=True)
+class LengthFraming(Framing):
+    # Each frame has an unsigned, most significant bit first length field,
+    # field_bits wide and field_offset bits into the frame. The frame is
+    # (length + adjust) * unit_bits long. Indexing ends at a frame that would
+    # end before its length field, e.g. in padding after the frames.
+    field_offset: int
+    field_bits: int
+    adjust: int = 0
+    unit_bits: int = 8
+
+    @property
+    def spec(self) -> str:
+        args = [self.field_offset, self.field_bits, self.adjust, self.unit_bits]
+        return f"length:{','.join(str(arg) for arg in args)}"
+
+    def build_index(self, data, progress=None, should_stop=None):
+        num_bits = len(data) * 8
+        field_end = self.field_offset + self.field_bits
+        starts = array("q")
+        window_start, window = 0, b""
+        position = 0
+        while position + field_end <= num_bits:
+            starts.append(position)
+            first = position + self.field_offset
+            if first // 8 + ceil(self.field_bits / 8) + 1 > window_start + len(window):
+                if should_stop is not None and should_stop():
+                    return None
+                window_start = first // 8
+                window_bytes = _WINDOW_BYTES + ceil(self.field_bits / 8) + 1
+                window = data.read(window_start, window_bytes)
+                if progress is not None:
+                    progress(window_start, len(data))
+            length = _read_field(window, first - window_start * 8, self.field_bits)
+            frame_bits = (length + self.adjust) * self.unit_bits
+            if frame_bits < field_end:
+                break
+            position += frame_bits
+        if position < num_bits and (not starts or starts[-1] != position):
+            starts.append(position)
+        if progress is not None:
+            progress(1, 1)
+        return FrameIndex(np.frombuffer(starts, dtype=np.int64))
+
+
+@dataclass(frozen=True)
+class FileFraming(Framing):
+    # Frame starts read from a text file, one bit offset per line, in decimal
+    # or in hex with a 0x prefix. Empty lines and lines starting with # are
+    # skipped.
+    filename: str
+
+    @property
+    def spec(self) -> str:
+        return f"file:{self.filename}"
+
+    def build_index(self, data, progress=None, should_stop=None):
+        starts = array("q")
+        with open(self.filename) as f:
+            for line_number, line in enumerate(f, 1):
+                if should_stop is not None and should_stop():
+                    return None
+                line = line.strip()
+                if not line or line.startswith("#"):
+                    continue
+                try:
+                    starts.append(int(line, 0))
+                except (ValueError, OverflowError):
+                    raise ValueError(
+                        f"{self.filename}:{line_number}: invalid offset {line!r}"
+                    ) from None
+        starts = np.frombuffer(starts, dtype=np.int64)
+        if len(starts) and (starts[0] < 0 or (np.diff(starts) <= 0).any()):
+            raise ValueError(
+                f"{self.filename}: the offsets must be positive and increasing"
+            )
+        return FrameIndex(starts)
+
+
+def parse_framing(text: str) -> Optional[Framing]:
+    # None for rows of the same width.
+    text = text.strip()
+    if not text:
+        return None
+    name, _, arg = text.partition(":")
+    name = name.strip().lower()
+    if name == "sync":
+        arg = "".join(arg.split())
+        parse_pattern(arg)
+        return SyncFraming(arg)
+    if name == "length":
+        args = [_parse_int(value) for value in arg.split(",") if value.strip()]
+        if not 2 <= len(args) <= 4 or args[0] < 0 or args[1] <= 0:
+            raise ValueError(
+                "length needs a field offset and size in bits, and optionally an "
+                "adjustment and a unit in bits, e.g. length:16,16,4,8"
+            )
+        if len(args) == 4 and args[3] <= 0:
+            raise ValueError(f"The unit must be positive, not {args[3]}")
+        return LengthFraming(*args)
+    if name == "file":
+        if not arg.strip():
+            raise ValueError("file needs a filename, e.g. file:frames.txt")
+        return FileFraming(arg.strip())
+    raise ValueError(f"Unknown framing: {name!r}")
+
+
+def _read_field(window: bytes, bit, num_bits) -> int:
+    first, last = bit // 8, (bit + num_bits - 1) // 8
+    value = int.from_bytes(window[first : last + 1], "big")
+    return (value >> ((last + 1) * 8 - bit - num_bits)) & ((1 << num_bits) - 1)
+
+
+def _parse_int(text):
+    try:
+        return int(text.strip(), 0)
+    except ValueError:
+        raise ValueError(f"Invalid number: {text.strip()!r}") from None
@@ -0,0 +1,159 @@
+import json
+import os
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager, nullcontext
+from dataclasses import asdict, dataclass
+from typing import Deque, Dict, Iterator, List, Optional, Tuple
+
+import numpy as np
+
+WINDOW = 300
+PERCENTILES = (50, 95, 99)
+MAX_EVENTS = 10 ** 6
+_NULL_CONTEXT = nullcontext()
+
+
+@dataclass
+class Event:
+    name: str
+    # The frame being painted when the event started, or None outside frames,
+    # e.g. for tiles rendered in the background.
+    frame: Optional[int]
+    thread: int
+    start: float
+    duration: float
+
+
+class Profiler:
+    # Times named stages, keeping the last WINDOW durations of each stage for
+    # percentiles, and records every event while recording a trace. When
+    # neither timing nor recording, stage() returns a shared no-op context.
+
+    def __init__(self, window: int = WINDOW) -> None:
+        self._window = window
+        self._timing = False
+        self._recording = False
+        self._durations: Dict[str, Deque[float]] = {}
+        self._events: List[Event] = []
+        self._frame: Optional[int] = None
+        self._num_frames = 0
+        self._origin = time.perf_counter()
+        self._lock = threading.Lock()
+
+    @property
+    def enabled(self) -> bool:
+        return self._timing or self._recording
+
+    @property
+    def timing(self) -> bool:
+        return self._timing
+
+    @timing.setter
+    def timing(self, timing: bool):
+        self._timing = timing
+
+    @property
+    def recording(self) -> bool:
+        return self._recording
+
+    @recording.setter
+    def recording(self, recording: bool):
+        if recording and not self._recording:
+            with self._lock:
+                self._events = []
+        self._recording = recording
+
+    @property
+    def num_events(self) -> int:
+        return len(self._events)
+
+    def frame(self):
+        if not self.enabled:
+            return _NULL_CONTEXT
+        return self._timed("frame", True)
+
+    def stage(self, name: str):
+        if not self.enabled:
+            return _NULL_CONTEXT
+        return self._timed(name, False)
+
+    def percentiles(self) -> Dict[str, Tuple[float, ...]]:
+        with self._lock:
+            durations = {name: list(values) for name, values in self._durations.items()}
+        return {
+            name: tuple(np.percentile(values, PERCENTILES))
+            for name, values in durations.items()
+            if values
+        }
+
+    def reset(self):
+        with self._lock:
+            self._durations.clear()
+            self._events = []
+
+    def save_trace(self, filename, chrome: bool = True):
+        with self._lock:
+            events = list(self._events)
+        if chrome:
+            trace = {"traceEvents": [_chrome_event(event) for event in events]}
+        else:
+            trace = {
+                "percentiles": PERCENTILES,
+                "summary": self.percentiles(),
+                "events": [asdict(event) for event in events],
+            }
+        with open(filename, "w") as f:
+            json.dump(trace, f)
+
+    @contextmanager
+    def _timed(self, name, is_frame) -> Iterator[None]:
+        if is_frame:
+            self._frame = self._num_frames
+            self._num_frames += 1
+        frame = (
+            self._frame
+            if threading.current_thread() is threading.main_thread()
+            else None
+        )
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            end = time.perf_counter()
+            if is_frame:
+                self._frame = None
+            self._add(name, frame, start, end)
+
+    def _add(self, name, frame, start, end):
+        with self._lock:
+            durations = self._durations.get(name)
+            if durations is None:
+                durations = self._durations[name] = deque(maxlen=self._window)
+            durations.append(end - start)
+            if self._recording and len(self._events) < MAX_EVENTS:
+                self._events.append(
+                    Event(
+                        name,
+                        frame,
+                        threading.get_ident(),
+                        start - self._origin,
+                        end - start,
+                    )
+                )
+
+
+def _chrome_event(event: Event) -> dict:
+    return {
+        "name": event.name,
+        "ph": "X",
+        "pid": os.getpid(),
+        "tid": event.thread,
+        "ts": event.start * 1e6,
+        "dur": event.duration * 1e6,
+        "args": {} if event.frame is None else {"frame": event.frame},
+    }
+
+
+NO_PROFILER = Profiler()
@@ -1,35 +1,102 @@
+import os
+from functools import partial
 from math import ceil
 
-from PyQt5.QtCore import Qt
+from PyQt5.QtCore import QElapsedTimer, QRect, Qt, QThread, QTimer, pyqtSignal
 from PyQt5.QtGui import (
     QPainter,
     QPen,
-    QBrush,
     QPixmap,
     QImage,
     QPaintEvent,
     QColor,
     QWheelEvent,
     QMouseEvent,
+    QRegion,
 )
 from PyQt5.QtWidgets import (
     QWidget,
     QVBoxLayout,
-    QScrollBar,
     QHBoxLayout,
 )
 
 from app import App
+from bit_export import Selection
+from profiler import PERCENTILES, Profiler
+from qt_classes.statistics_bar import StatisticsBar
+from qt_classes.tile_cache import TileCache
+from qt_classes.tile_renderer import (
+    TileRenderer,
+    TileSpec,
+    cells_per_tile,
+    draw_h_grid,
+    draw_v_grid,
+    zoom_block_bytes,
+)
+from qt_classes.virtual_scroll_bar import VirtualScrollBar
+
+_VISIBLE_PRIORITY = 1
+_PREFETCH_PRIORITY = 0
+_FOLLOW_INTERVAL_MS = 100
+_OVERLAY_MARGIN = 4
+_FRAME_INTERVAL_MS = 16
+_SELECTION_FILL = QColor(255, 160, 0, 64)
+_SELECTION_BORDER = QColor(255, 120, 0)
+
+
+class _IndexThread(QThread):
+    progress = pyqtSignal(int)
+
+    def __init__(self, build) -> None:
+        super().__init__()
+        self._build = build
+        self._percent = -1
+        self._stopped = False
+
+    def stop(self):
+        self._stopped = True
+
+    def run(self):
+        self._build(self._on_progress, lambda: self._stopped)
+
+    def _on_progress(self, done, total):
+        percent = done * 100 // max(total, 1)
+        if percent != self._percent:
+            self._percent = percent
+            self.progress.emit(percent)
 
 
 class BitsWidget(QWidget):
+    index_progress = pyqtSignal(int)
+    index_finished = pyqtSignal()
+    difference_index_progress = pyqtSignal(int)
+    difference_index_finished = pyqtSignal()
+    overview_progress = pyqtSignal(int)
+    overview_finished = pyqtSignal()
+    frame_index_progress = pyqtSignal(int)
+    frame_index_finished = pyqtSignal()
+    selection_changed = pyqtSignal()
+    export_progress = pyqtSignal(int)
+    export_finished = pyqtSignal()
+
     def __init__(
-        self, offset, bit_size, row_width, grid_width, grid_height, bit_border_threshold
+        self,
+        offset,
+        bit_size,
+        row_width,
+        grid_width,
+        grid_height,
+        bit_border_threshold,
+        tile_cache_bytes,
+        analysis_cache=None,
     ) -> None:
         super().__init__()
-        self._app = App()
+        self._app = App(analysis_cache)
         self._offset = offset
         self._bit_size = bit_size
+        self._symbol_bits = 1
+        self._show_missing = False
+        self._zoom_out = 0
         self._row_width = row_width
         self._grid_width = grid_width
         self._grid_h_offset = 0
@@ -44,17 +111,65 @@ class BitsWidget(QWidget):
         self._bit_border_threshold = bit_border_threshold
         self._easter_egg = 0
         self._painting = False
+        self._tile_cache = TileCache(tile_cache_bytes)
+        self._profiler = Profiler()
+        self._renderer = TileRenderer(self._app, self, self._profiler)
+        self._renderer.tile_ready.connect(self._on_tile_ready)
+        self._data_version = 0
+        # The (row, column) on screen, which follows the scroll bars once per
+        # frame.
+        self._position = (0, 0)
+        # The composed view, and what it shows.
+        self._frame = None
+        self._frame_key = None
+        self._frame_position = (0, 0)
+        self._frame_right = 0
+        self._frame_tiles = set()
+        # Changes are painted at most once per frame interval.
+        self._frame_timer = QTimer(self)
+        self._frame_timer.setSingleShot(True)
+        self._frame_timer.timeout.connect(self._on_frame_timer)
+        self._frame_clock = QElapsedTimer()
+        self._frame_clock.start()
+        self._repaint_pending = False
+        self._last_position = (0, 0)
+        self._auto_scroll = False
+        self._follow_timer = QTimer(self)
+        self._follow_timer.setInterval(_FOLLOW_INTERVAL_MS)
+        self._follow_timer.timeout.connect(self.refresh)
+        self._index_thread = None
+        # The compared file is indexed after the first one.
+        self._index_compare = False
+        self._difference_thread = None
+        # Builds the zoomed out overview after the first screen is shown.
+        self._overview_thread = None
+        # The size of the data the overview is being built for.
+        self._overview_bits = 0
+        self._frames_thread = None
+        self._export_thread = None
+        self._export_filename = None
+        self._export_error = None
+        # The selected (first row, last row, first column, last column) cells,
+        # with exclusive ends, and the cell the selection started from.
+        self._selection = None
+        self._selection_anchor = None
+        self._select_rows = False
+        # Shows the data decompressed so far while a compressed file is indexed.
+        self._index_timer = QTimer(self)
+        self._index_timer.setInterval(_FOLLOW_INTERVAL_MS)
+        self._index_timer.timeout.connect(self.refresh)
 
         self._bits_area = QWidget()
 
-        self._h_scrollbar = QScrollBar(orientation=Qt.Horizontal)
-        self._h_scrollbar.setMinimum(0)
-        self._h_scrollbar.valueChanged.connect(self._on_scrollbar_change)
+        self._h_scrollbar = VirtualScrollBar(Qt.Horizontal)
+        self._h_scrollbar.position_changed.connect(self._on_scrollbar_change)
         self._h_scrollbar.hide()
-        self._v_scrollbar = QScrollBar(orientation=Qt.Vertical)
-        self._v_scrollbar.setMinimum(0)
-        self._v_scrollbar.valueChanged.connect(self._on_scrollbar_change)
+        self._v_scrollbar = VirtualScrollBar(Qt.Vertical)
+        self._v_scrollbar.position_changed.connect(self._on_scrollbar_change)
         self._v_scrollbar.hide()
+        self._statistics_bar = StatisticsBar()
+        self._statistics_bar.set_cache(analysis_cache)
+        self._statistics_bar.hide()
 
         inner_layout = QVBoxLayout()
         inner_layout.setContentsMargins(0, 0, 0, 0)
@@ -69,7 +184,11 @@ class BitsWidget(QWidget):
         outer_layout.setSpacing(0)
         outer_layout.addWidget(inner_widget, stretch=1)
         outer_layout.addWidget(self._v_scrollbar)
+        outer_layout.addWidget(self._statistics_bar)
         self.setLayout(outer_layout)
+        # Everything is painted by paintEvent, which lets scroll() move the
+        # pixels on screen instead of repainting them.
+        self.setAttribute(Qt.WA_OpaquePaintEvent)
 
     @property
     def offset(self) -> int:
@@ -78,6 +197,7 @@ class BitsWidget(QWidget):
     @offset.setter
     def offset(self, new_offset):
         self._offset = new_offset
+        self._clear_selection()
 
     @property
     def bit_size(self) -> int:
@@ -87,6 +207,34 @@ class BitsWidget(QWidget):
     def bit_size(self, size: int):
         self._bit_size = size
 
+    @property
+    def symbol_bits(self) -> int:
+        return self._symbol_bits
+
+    @symbol_bits.setter
+    def symbol_bits(self, symbol_bits: int):
+        self._symbol_bits = symbol_bits
+        self._clear_selection()
+
+    @property
+    def show_missing(self) -> bool:
+        return self._show_missing
+
+    @show_missing.setter
+    def show_missing(self, show_missing: bool):
+        self._show_missing = show_missing
+
+    @property
+    def zoom_out(self) -> int:
+        return self._zoom_out
+
+    @zoom_out.setter
+    def zoom_out(self, zoom_out: int):
+        self._zoom_out = zoom_out
+        self._clear_selection()
+        if zoom_out:
+            self._start_overview()
+
     @property
     def row_width(self) -> int:
         return self._row_width
@@ -94,6 +242,7 @@ class BitsWidget(QWidget):
     @row_width.setter
     def row_width(self, width: int):
         self._row_width = width
+        self._clear_selection()
 
     @property
     def grid_width(self) -> int:
@@ -135,75 +284,846 @@ class BitsWidget(QWidget):
     def _bits_area_height(self):
         return self._bits_area.height()
 
+    @property
+    def _num_cells(self):
+        if not self._zoom_out:
+            return (self._app.num_bits - self._offset) // self._symbol_bits
+        block_bytes = zoom_block_bytes(self._zoom_out)
+        return self._app.num_blocks(block_bytes) - self._offset // (block_bytes * 8)
+
+    @property
+    def _has_frames(self):
+        # Zoomed out, the rows have the same width.
+        return self._app.frame_index is not None and not self._zoom_out
+
     @property
     def _num_rows(self):
-        return ceil((self._app.num_bits - self._offset) / self._row_width)
+        if self._has_frames:
+            return len(self._app.frame_index)
+        return ceil(self._num_cells / self._row_width)
+
+    @property
+    def follow(self) -> bool:
+        return self._follow_timer.isActive()
+
+    @follow.setter
+    def follow(self, follow: bool):
+        if follow:
+            self._follow_timer.start()
+        else:
+            self._follow_timer.stop()
+
+    @property
+    def auto_scroll(self) -> bool:
+        return self._auto_scroll
+
+    @auto_scroll.setter
+    def auto_scroll(self, auto_scroll: bool):
+        self._auto_scroll = auto_scroll
+
+    @property
+    def profiler(self) -> Profiler:
+        return self._profiler
+
+    @property
+    def statistics_bar(self) -> StatisticsBar:
+        return self._statistics_bar
+
+    @property
+    def tile_cache(self) -> TileCache:
+        return self._tile_cache
 
     def set_bit_border_threshold(self, threshold):
         self._bit_border_threshold = threshold
 
+    def set_tile_cache_size(self, max_bytes):
+        self._tile_cache.max_bytes = max_bytes
+
+    @property
+    def is_indexing(self) -> bool:
+        return self._index_thread is not None
+
     def load_file(self, filename, max_bytes):
-        self._app.load_file(filename, max_bytes)
+        self.stop_indexing()
+        self._renderer.cancel_all()
+        try:
+            self._app.load_file(filename, max_bytes)
+        finally:
+            # A file that could not be opened leaves nothing to show.
+            self._invalidate()
+        if self._app.needs_index:
+            self._start_indexing(self._app.build_index)
+        else:
+            self._update_statistics_bar()
+            self._start_analysis()
 
-    def paintEvent(self, a0: QPaintEvent) -> None:
-        super().paintEvent(a0)
-        if not self._app.num_bits:
+    def stop_indexing(self):
+        self._stop_analysis()
+        self._stop_export()
+        self._index_compare = False
+        if self._index_thread is None:
+            return
+        self._index_thread.stop()
+        self._index_thread.wait()
+        self._index_thread = None
+        self._index_timer.stop()
+
+    def _start_indexing(self, build):
+        self._index_thread = _IndexThread(build)
+        self._index_thread.progress.connect(self.index_progress)
+        self._index_thread.finished.connect(self._on_index_finished)
+        self._index_thread.start()
+        self._index_timer.start()
+
+    def _on_index_finished(self):
+        if self._index_thread is not self.sender():
+            return
+        self._index_thread = None
+        self._index_timer.stop()
+        self.refresh()
+        if self._index_compare:
+            self._index_compare = False
+            self._start_indexing(self._app.build_compare_index)
+            return
+        self._update_statistics_bar()
+        self.index_finished.emit()
+        self._start_analysis()
+
+    def _invalidate(self):
+        self._clear_selection()
+        self._data_version += 1
+        self._tile_cache.clear()
+        self._frame = None
+
+    @property
+    def is_comparing(self) -> bool:
+        return self._app.is_comparing
+
+    @property
+    def compare_filename(self):
+        return self._app.compare_filename
+
+    @property
+    def compare_shift(self) -> int:
+        return self._app.compare_shift
+
+    @compare_shift.setter
+    def compare_shift(self, shift: int):
+        self._stop_analysis()
+        self._cancel_export()
+        self._renderer.cancel_all()
+        self._app.set_compare_shift(shift)
+        self._invalidate()
+        self._start_analysis()
+
+    @property
+    def difference_index(self):
+        return self._app.difference_index
+
+    @property
+    def is_indexing_differences(self) -> bool:
+        return self._difference_thread is not None
+
+    def load_compare_file(self, filename, max_bytes):
+        self._stop_analysis()
+        self._cancel_export()
+        self._renderer.cancel_all()
+        self._app.load_compare_file(filename, max_bytes, self._app.compare_shift)
+        self._invalidate()
+        if not self._app.compare_needs_index:
+            self._start_analysis()
+        elif self._index_thread is None:
+            self._start_indexing(self._app.build_compare_index)
+        else:
+            self._index_compare = True
+
+    def close_compare(self):
+        self._stop_analysis()
+        self._cancel_export()
+        self._index_compare = False
+        self._renderer.cancel_all()
+        self._app.close_compare()
+        self._invalidate()
+        if self._index_thread is None:
+            self._start_analysis()
+
+    def _start_analysis(self):
+        self._start_overview()
+        self._start_difference_index()
+        self._start_frame_index()
+
+    def _stop_analysis(self):
+        self._stop_overview()
+        self._stop_difference_index()
+        self._stop_frame_index()
+
+    @property
+    def is_loading(self) -> bool:
+        return any(
+            thread is not None
+            for thread in (
+                self._index_thread,
+                self._overview_thread,
+                self._difference_thread,
+                self._frames_thread,
+                self._export_thread,
+            )
+        )
+
+    def cancel_loading(self):
+        # Keeps what was loaded so far: a compressed file shows the data
+        # decompressed until then, and the overview is built again on its
+        # thread when zooming out.
+        self.stop_indexing()
+        self.refresh()
+
+    def _start_overview(self):
+        # The overview is built once the size of the data is known. Until then,
+        # zoomed out tiles too large to count from the data are left blank.
+        if self._app.density_pyramid is None or self._index_thread is not None:
+            return
+        if self._app.density_pyramid.is_built or self._overview_thread is not None:
+            return
+        self._overview_bits = self._app.num_bits
+        self._overview_thread = _IndexThread(self._app.build_overview)
+        self._overview_thread.progress.connect(self.overview_progress)
+        self._overview_thread.finished.connect(self._on_overview_finished)
+        self._overview_thread.start()
+
+    def _stop_overview(self):
+        if self._overview_thread is None:
+            return
+        self._overview_thread.stop()
+        self._overview_thread.wait()
+        self._overview_thread = None
+
+    def _on_overview_finished(self):
+        if self._overview_thread is not self.sender():
             return
+        self._overview_thread = None
+        if self._zoom_out:
+            # Draws the tiles left blank, and those of data that grew since.
+            self._data_version += 1
+            self._tile_cache.clear()
+            self._frame = None
+            self.schedule_repaint()
+        if self._app.num_bits != self._overview_bits:
+            # The data grew while the overview was built.
+            self._start_overview()
+        self.overview_finished.emit()
+
+    def _start_difference_index(self):
+        # The differences are indexed once the sizes of both files are known.
+        if not self._app.is_comparing or self._index_thread is not None:
+            return
+        self._stop_analysis()
+        self._difference_thread = _IndexThread(self._app.build_difference_index)
+        self._difference_thread.progress.connect(self.difference_index_progress)
+        self._difference_thread.finished.connect(self._on_difference_index_finished)
+        self._difference_thread.start()
+
+    def _stop_difference_index(self):
+        if self._difference_thread is None:
+            return
+        self._difference_thread.stop()
+        self._difference_thread.wait()
+        self._difference_thread = None
+
+    def _on_difference_index_finished(self):
+        if self._difference_thread is not self.sender():
+            return
+        self._difference_thread = None
+        self.difference_index_finished.emit()
+
+    @property
+    def framing(self):
+        return self._app.framing
+
+    @property
+    def frame_index(self):
+        return self._app.frame_index
+
+    @property
+    def framing_error(self):
+        return self._app.framing_error
+
+    @property
+    def is_indexing_frames(self) -> bool:
+        return self._frames_thread is not None
+
+    def set_framing(self, framing):
+        self._stop_frame_index()
+        self._cancel_export()
+        self._renderer.cancel_all()
+        self._app.set_framing(framing)
+        self._invalidate()
+        self._start_frame_index()
+
+    def _start_frame_index(self):
+        # The frames are indexed once the size of the data is known.
+        if self._app.framing is None or self._index_thread is not None:
+            return
+        self._stop_frame_index()
+        self._frames_thread = _IndexThread(self._app.build_frame_index)
+        self._frames_thread.progress.connect(self.frame_index_progress)
+        self._frames_thread.finished.connect(self._on_frame_index_finished)
+        self._frames_thread.start()
+
+    def _stop_frame_index(self):
+        if self._frames_thread is None:
+            return
+        self._frames_thread.stop()
+        self._frames_thread.wait()
+        self._frames_thread = None
+
+    def _on_frame_index_finished(self):
+        if self._frames_thread is not self.sender():
+            return
+        self._frames_thread = None
+        # Rows of an export started before the frames were indexed would
+        # change under it.
+        self._cancel_export()
+        self._renderer.cancel_all()
+        self._invalidate()
+        self.schedule_repaint()
+        self.frame_index_finished.emit()
+
+    @property
+    def selection(self):
+        # The selected bits, or None.
+        if self._selection is None:
+            return None
+        first_row, last_row, first_column, last_column = self._selection
+        symbol_bits = self._symbol_bits
+        return Selection(
+            self._offset,
+            self._row_width * symbol_bits,
+            first_row,
+            last_row,
+            first_column * symbol_bits,
+            last_column * symbol_bits,
+        )
+
+    def export_selection(self, output, realign: bool) -> bool:
+        # Writes the selection on this thread, e.g. to the clipboard.
+        return self._app.export_selection(output, self.selection, realign)
+
+    def export_selection_to_file(self, filename, realign: bool):
+        # Written in the background, which stop_indexing() stops.
+        self._stop_export()
+        self._export_filename = filename
+        self._export_error = None
+        export = partial(self._export, filename, self.selection, realign)
+        self._export_thread = _IndexThread(export)
+        self._export_thread.progress.connect(self.export_progress)
+        self._export_thread.finished.connect(self._on_export_finished)
+        self._export_thread.start()
+
+    @property
+    def export_filename(self):
+        return self._export_filename
+
+    @property
+    def export_error(self):
+        return self._export_error
+
+    def _export(self, filename, selection, realign, progress, should_stop):
+        # A stopped or failed export leaves no partial file. Errors are caught
+        # here since nothing handles them on the export thread.
+        try:
+            output = open(filename, "wb")
+        except OSError as e:
+            self._export_error = str(e)
+            return
+        done = False
+        try:
+            with output:
+                done = self._app.export_selection(
+                    output, selection, realign, progress, should_stop
+                )
+        except Exception as e:
+            self._export_error = str(e) or type(e).__name__
+        if not done:
+            try:
+                os.remove(filename)
+            except OSError:
+                pass
+
+    def _stop_export(self):
+        if self._export_thread is None:
+            return
+        self._export_thread.stop()
+        self._export_thread.wait()
+        self._export_thread = None
+
+    def _cancel_export(self):
+        # Called before the data changes, which would change the selected bits
+        # under the export.
+        if self._export_thread is None:
+            return
+        self._stop_export()
+        self._export_error = "The data changed while exporting"
+        self.export_finished.emit()
+
+    def _on_export_finished(self):
+        if self._export_thread is not self.sender():
+            return
+        self._export_thread = None
+        self.export_finished.emit()
+
+    def _clear_selection(self):
+        self._selection_anchor = None
+        if self._selection is not None:
+            self._selection = None
+            self.update()
+            self.selection_changed.emit()
+
+    def _cell_at(self, x, y):
+        row = self._position[0] + max(y, 0) // self._bit_size
+        column = self._position[1] + max(x, 0) // self._bit_size
+        return (
+            min(row, max(self._num_rows - 1, 0)),
+            min(column, max(self._row_width - 1, 0)),
+        )
+
+    def _select_to(self, row, column):
+        anchor_row, anchor_column = self._selection_anchor
+        if self._select_rows:
+            first_column, last_column = 0, self._row_width
+        else:
+            first_column = min(anchor_column, column)
+            last_column = max(anchor_column, column) + 1
+        selection = (
+            min(anchor_row, row),
+            max(anchor_row, row) + 1,
+            first_column,
+            last_column,
+        )
+        if selection != self._selection:
+            self._selection = selection
+            self.update()
+            self.selection_changed.emit()
+
+    def _draw_selection(self):
+        if self._selection is None:
+            return
+        first_row, last_row, first_column, last_column = self._selection
+        row, column = self._position
+        rect = QRect(
+            (first_column - column) * self._bit_size,
+            (first_row - row) * self._bit_size,
+            (last_column - first_column) * self._bit_size,
+            (last_row - first_row) * self._bit_size,
+        )
+        rect &= QRect(0, 0, self._bits_area_width, self._bits_area_height)
+        if rect.isEmpty():
+            return
+        painter = QPainter(self)
+        painter.fillRect(rect, _SELECTION_FILL)
+        painter.setPen(QPen(_SELECTION_BORDER, 1))
+        painter.drawRect(rect.adjusted(0, 0, -1, -1))
+        painter.end()
+
+    def _update_statistics_bar(self):
+        self._statistics_bar.set_file(
+            self.filename,
+            self.file_num_bytes,
+            self.max_bytes,
+            self.transforms,
+            self._app.file_key,
+        )
+
+    def save_analysis(self):
+        self._app.save_analysis()
+
+    def refresh(self):
+        old_bits = self._app.num_bits
+        old_cells = self._num_cells
+        if self._app.refresh() * 8 == old_bits:
+            return
+        if self._app.num_bits < old_bits:
+            self._data_version += 1
+            self._tile_cache.clear()
+            self._frame = None
+        if self._zoom_out:
+            self._start_overview()
 
         self._painting = True
+        position = (self._v_scrollbar.position, self._h_scrollbar.position)
         self._set_scrollbars()
-        self._paint_bits()
-
-        self._draw_grid()
+        if self._auto_scroll:
+            self._v_scrollbar.set_position(self._v_scrollbar.position_maximum)
+        scrolled = position != (self._v_scrollbar.position, self._h_scrollbar.position)
         self._painting = False
+        if self._frame is None or scrolled:
+            self.update()
+            return
+
+        # Only the rows from the previous last row onwards changed.
+        first_row = max(old_cells - 1, 0) // self._row_width
+        if self._has_frames:
+            first_row = max(self._num_rows - 1, 0)
+        top = max((first_row - self._position[0]) * self._bit_size, 0)
+        if top < self._bits_area_height:
+            self.update(0, top, self._bits_area_width, self._bits_area_height - top)
+
+    def find_row_widths(self, max_row_width):
+        return self._app.find_row_widths(max_row_width)
+
+    @property
+    def filename(self):
+        return self._app.filename
 
-    def _paint_bits(self):
+    @property
+    def num_bytes(self):
+        return self._app.num_bytes
+
+    @property
+    def file_num_bytes(self):
+        return self._app.file_num_bytes
+
+    @property
+    def max_bytes(self):
+        return self._app.max_bytes
+
+    @property
+    def transforms(self):
+        return self._app.transforms
+
+    def set_transforms(self, transforms):
+        self._stop_analysis()
+        self._cancel_export()
+        self._renderer.cancel_all()
+        self._app.set_transforms(transforms)
+        self._invalidate()
+        if not self.is_indexing:
+            self._update_statistics_bar()
+            self._start_analysis()
+
+    @property
+    def visible_bits(self):
+        # The range of bits from the first to the last row on screen.
+        start_row = self._position[0]
+        visible_rows = self._bits_area_height // self._bit_size + 1
+        last_row = min(start_row + visible_rows, self._num_rows)
+        return self._row_to_bit(start_row), self._row_to_bit(last_row)
+
+    def scroll_to_bit(self, position, at_top=False):
+        # The row of the bit is centered, or is the first row shown at_top.
+        cell = (position - self._offset) // self._symbol_bits
+        if self._zoom_out:
+            cell = position // (zoom_block_bytes(self._zoom_out) * 8)
+            cell -= self._offset // (zoom_block_bytes(self._zoom_out) * 8)
+        if self._has_frames:
+            row = self._app.frame_index.row_of(position - self._offset)
+            column = (position - self._row_to_bit(row)) // self._symbol_bits
+            column = max(column, 0)
+        else:
+            row, column = divmod(max(cell, 0), self._row_width)
         visible_columns = self._bits_area_width // self._bit_size
         visible_rows = self._bits_area_height // self._bit_size
-        bitmap = self._app.create_bitmap(
-            self._offset,
-            self._row_width,
-            self._h_scrollbar.value(),
-            self._v_scrollbar.value(),
-            visible_rows,
-            visible_columns,
+
+        self._painting = True
+        self._set_scrollbars()
+        if not column < self._h_scrollbar.position + visible_columns:
+            self._h_scrollbar.set_position(column - visible_columns // 2)
+        elif column < self._h_scrollbar.position:
+            self._h_scrollbar.set_position(column)
+        self._v_scrollbar.set_position(row if at_top else row - visible_rows // 2)
+        self._painting = False
+        self._schedule_frame()
+
+    def schedule_repaint(self):
+        # Merges the changes made until the next frame into a single repaint.
+        self._repaint_pending = True
+        self._schedule_frame()
+
+    def _schedule_frame(self):
+        if not self._frame_timer.isActive():
+            elapsed = self._frame_clock.elapsed()
+            self._frame_timer.start(max(_FRAME_INTERVAL_MS - elapsed, 0))
+
+    def _on_frame_timer(self):
+        self._frame_clock.restart()
+        if self._repaint_pending or not self._scroll_frame():
+            self.update()
+        self._repaint_pending = False
+
+    def _scroll_frame(self) -> bool:
+        # Moves the pixels on screen when only the position changed, so only
+        # the newly exposed rows or columns are painted.
+        if self._frame is None or self._frame_key != self._view_key():
+            return False
+        if self._profiler.timing:
+            # The overlay would move along.
+            return False
+
+        position = (self._v_scrollbar.position, self._h_scrollbar.position)
+        dx = (self._position[1] - position[1]) * self._bit_size
+        dy = (self._position[0] - position[0]) * self._bit_size
+        if abs(dx) >= self._bits_area_width or abs(dy) >= self._bits_area_height:
+            return False
+        if self._frame_right != self._view_right(position[1]):
+            return False
+        if dx or dy:
+            self._position = position
+            self.scroll(dx, dy, QRect(0, 0, self._frame_right, self._bits_area_height))
+        return True
+
+    def paintEvent(self, a0: QPaintEvent) -> None:
+        super().paintEvent(a0)
+        if not self._app.num_bits:
+            self._fill_background(a0.region())
+            return
+
+        with self._profiler.frame():
+            self._painting = True
+            with self._profiler.stage("paint.scrollbars"):
+                self._set_scrollbars()
+            position = (self._v_scrollbar.position, self._h_scrollbar.position)
+            if a0.region().contains(self._bits_area.geometry()):
+                self._position = position
+            elif position != self._position:
+                # Painted only in part, e.g. under a scroll bar, so the rest of
+                # the screen still shows the previous position.
+                self._schedule_frame()
+            self._paint_bits(a0.region())
+
+            with self._profiler.stage("paint.grid"):
+                self._draw_grid()
+            self._draw_selection()
+            self._painting = False
+        if self._profiler.timing:
+            self._draw_overlay()
+
+    def _paint_bits(self, region: QRegion):
+        start_row, start_column = self._position
+        visible_columns = self._bits_area_width // self._bit_size
+        visible_rows = self._bits_area_height // self._bit_size + 1
+        last_column = min(start_column + visible_columns, self._row_width)
+        last_row = min(start_row + visible_rows, self._num_rows)
+
+        self._statistics_bar.set_view(
+            self._row_to_bit(start_row) // 8, self._row_to_bit(last_row) // 8
         )
-        pixmap = self._create_pixmap(bitmap.data, bitmap.width, bitmap.bytes_per_row)
+
+        with self._profiler.stage("paint.tiles"):
+            tiles = self._tile_specs(start_row, last_row, start_column, last_column)
+            prefetch = self._prefetch_specs(
+                start_row, last_row, start_column, last_column, visible_rows
+            )
+            self._renderer.set_wanted(list(tiles) + prefetch)
+            self._last_position = (start_row, start_column)
+            for spec in prefetch:
+                if spec not in self._tile_cache:
+                    self._renderer.request(spec, _PREFETCH_PRIORITY)
+
+            ready = {}
+            for spec in tiles:
+                tile = self._tile_cache.get(spec)
+                if tile is None:
+                    self._renderer.request(spec, _VISIBLE_PRIORITY)
+                else:
+                    ready[spec] = tile
+
+        position = (start_row, start_column)
+        key = self._view_key()
+        with self._profiler.stage("paint.compose"):
+            if self._frame is not None and key == self._frame_key:
+                self._update_frame(tiles, ready, position)
+            elif len(ready) == len(tiles) or self._frame is None:
+                # Until then, the previous frame is shown as it was.
+                self._compose_frame(tiles, ready, position, key)
+        with self._profiler.stage("paint.blit"):
+            painter = QPainter(self)
+            painter.drawPixmap(0, 0, self._frame, 0, 0, self._frame_right, -1)
+            painter.end()
+            self._fill_background(
+                region - QRegion(0, 0, self._frame_right, self._frame.height())
+            )
+
+    def _fill_background(self, region: QRegion):
+        if region.isEmpty():
+            return
         painter = QPainter(self)
-        painter.drawPixmap(0, 0, pixmap)
-        self._draw_bit_separators(painter, pixmap.width(), pixmap.height())
-        self._draw_last_row_of_bits(painter, bitmap.remainder, pixmap)
+        painter.setClipRegion(region)
+        painter.fillRect(region.boundingRect(), self.palette().window())
         painter.end()
 
-    def _draw_bit_separators(self, painter: QPainter, right, bottom):
-        if self._bit_size <= self._bit_border_threshold:
-            return
+    def _view_key(self):
+        # What the frame depends on, other than the position.
+        return self._tile_spec(0, 0), self._app.num_bits, self._bits_area.size()
 
-        painter.setPen(QPen(Qt.black, 1))
-        self._draw_h_grid(painter, right, bottom, 1, 0)
-        self._draw_v_grid(painter, right, bottom, 1, 0)
-
-    def _draw_last_row_of_bits(self, painter, last_row_of_bits, pixmap):
-        painter.setPen(
-            QPen(
-                Qt.black
-                if self._bit_size > self._bit_border_threshold
-                else Qt.transparent,
-                1,
-                Qt.SolidLine,
-            )
-        )
-        for i, b in enumerate(last_row_of_bits):
-            self._draw_bit(painter, i, pixmap.height() // self._bit_size, b)
+    def _view_right(self, start_column):
+        visible_columns = self._bits_area_width // self._bit_size
+        last_column = min(start_column + visible_columns, self._row_width)
+        right = (last_column - start_column) * self._bit_size
+        if self._bit_size > self._bit_border_threshold:
+            right += 1
+        return right
+
+    def _compose_frame(self, tiles, ready, position, key):
+        if self._frame is None or self._frame.size() != self._bits_area.size():
+            self._frame = QPixmap(self._bits_area.size())
+        self._frame.fill(self.palette().window().color())
+
+        painter = QPainter(self._frame)
+        for spec, tile in ready.items():
+            painter.drawPixmap(*tiles[spec], tile)
+        painter.end()
+        self._frame_key = key
+        self._frame_position = position
+        self._frame_right = self._view_right(position[1])
+        self._frame_tiles = set(ready)
+
+    def _update_frame(self, tiles, ready, position):
+        # Shifts the frame to the new position, and draws the exposed parts and
+        # the tiles that were not ready before.
+        frame_rect = self._frame.rect()
+        exposed = QRegion()
+        if position != self._frame_position:
+            dx = (self._frame_position[1] - position[1]) * self._bit_size
+            dy = (self._frame_position[0] - position[0]) * self._bit_size
+            if abs(dx) < frame_rect.width() and abs(dy) < frame_rect.height():
+                exposed = self._frame.scroll(dx, dy, frame_rect)
+            else:
+                exposed = QRegion(frame_rect)
+            self._frame_position = position
+        self._frame_right = self._view_right(position[1])
+
+        painter = QPainter(self._frame)
+        if not exposed.isEmpty():
+            painter.setClipRegion(exposed)
+            painter.fillRect(frame_rect, self.palette().window())
+        drawn = set()
+        tile_pixels = cells_per_tile(self._bit_size) * self._bit_size + 1
+        for spec, (x, y) in tiles.items():
+            tile_rect = QRect(x, y, tile_pixels, tile_pixels)
+            is_drawn = spec in self._frame_tiles
+            if is_drawn and not exposed.intersects(tile_rect):
+                drawn.add(spec)
+            elif spec in ready:
+                if is_drawn:
+                    painter.setClipRegion(exposed)
+                else:
+                    painter.setClipping(False)
+                painter.drawPixmap(x, y, ready[spec])
+                drawn.add(spec)
+        painter.end()
+        self._frame_tiles = drawn
+
+    def _tile_specs(self, start_row, last_row, start_column, last_column):
+        cells = cells_per_tile(self._bit_size)
+        tile_pixels = cells * self._bit_size
+        specs = {}
+        for tile_row in range(start_row // cells, ceil(last_row / cells)):
+            for tile_column in range(start_column // cells, ceil(last_column / cells)):
+                specs[self._tile_spec(tile_row, tile_column)] = (
+                    tile_column * tile_pixels - start_column * self._bit_size,
+                    tile_row * tile_pixels - start_row * self._bit_size,
+                )
+        return specs
+
+    def _prefetch_specs(
+        self, start_row, last_row, start_column, last_column, visible_rows
+    ):
+        last_start_row, last_start_column = self._last_position
+        visible_columns = last_column - start_column
+        if start_row > last_start_row:
+            start_row, last_row = last_row, last_row + visible_rows
+        elif start_row < last_start_row:
+            start_row, last_row = start_row - visible_rows, start_row
+        elif start_column > last_start_column:
+            start_column, last_column = last_column, last_column + visible_columns
+        elif start_column < last_start_column:
+            start_column, last_column = start_column - visible_columns, start_column
+        else:
+            return []
+
+        start_row, last_row = max(start_row, 0), min(last_row, self._num_rows)
+        start_column = max(start_column, 0)
+        last_column = min(last_column, self._row_width)
+        return list(self._tile_specs(start_row, last_row, start_column, last_column))
 
-    def _draw_bit(self, painter: QPainter, x, y, bit):
-        painter.setBrush(
-            QBrush(self._one_color if bit else self._zero_color, Qt.SolidPattern)
+    def _cell_to_bit(self, cell):
+        if not self._zoom_out:
+            return self._offset + cell * self._symbol_bits
+        block_bits = zoom_block_bytes(self._zoom_out) * 8
+        return (self._offset // block_bits + cell) * block_bits
+
+    def _row_to_bit(self, row):
+        # The first bit of the row, or the end of the data past the last row.
+        if not self._has_frames:
+            return self._cell_to_bit(row * self._row_width)
+        frame_index = self._app.frame_index
+        if row >= len(frame_index):
+            return self._app.num_bits
+        return int(frame_index.starts[row]) + self._offset
+
+    def _tile_spec(self, tile_row, tile_column) -> TileSpec:
+        end_bit = self._row_to_bit((tile_row + 1) * cells_per_tile(self._bit_size))
+        return TileSpec(
+            self._data_version,
+            min(end_bit, self._app.num_bits),
+            self._offset,
+            self._row_width,
+            self._bit_size,
+            self._symbol_bits,
+            self._bit_size > self._bit_border_threshold,
+            self._show_missing,
+            tuple(self._color_table),
+            self._zoom_out,
+            tile_row,
+            tile_column,
         )
-        painter.drawRect(
-            x * self._bit_size, y * self._bit_size, self._bit_size, self._bit_size
+
+    def _on_tile_ready(self, spec: TileSpec, image: QImage):
+        if spec.data_version != self._data_version:
+            return
+
+        with self._profiler.stage("tile.upload"):
+            self._tile_cache.put(spec, QPixmap.fromImage(image))
+        if self._frame_key != self._view_key():
+            self.schedule_repaint()
+            return
+
+        # Only the tile's part of the screen changed.
+        tile_pixels = spec.cells * self._bit_size
+        start_row, start_column = self._position
+        self.update(
+            spec.tile_column * tile_pixels - start_column * self._bit_size,
+            spec.tile_row * tile_pixels - start_row * self._bit_size,
+            image.width(),
+            image.height(),
         )
 
+    def _draw_overlay(self):
+        rows = [["ms"] + [f"p{p}" for p in PERCENTILES]]
+        for name, values in sorted(self._profiler.percentiles().items()):
+            rows.append([name] + [f"{value * 1e3:.2f}" for value in values])
+
+        painter = QPainter(self)
+        metrics = painter.fontMetrics()
+        margin = _OVERLAY_MARGIN
+        widths = [
+            max(metrics.horizontalAdvance(row[i]) for row in rows) + 2 * margin
+            for i in range(len(rows[0]))
+        ]
+        width, height = sum(widths), metrics.lineSpacing() * len(rows) + 2 * margin
+        left = max(self._bits_area_width - width, 0)
+        painter.fillRect(left, 0, width, height, QColor(0, 0, 0, 160))
+        painter.setPen(Qt.white)
+        for i, row in enumerate(rows):
+            top = margin + i * metrics.lineSpacing()
+            x = left
+            for column, (text, column_width) in enumerate(zip(row, widths)):
+                # The stage names are aligned left, and the times right.
+                alignment = Qt.AlignRight if column else Qt.AlignLeft
+                rect = QRect(x + margin, top, column_width - 2 * margin, height)
+                painter.drawText(rect, alignment | Qt.AlignTop, text)
+                x += column_width
+        painter.end()
+
     def _draw_grid(self):
         if not self._grid_width and not self._grid_height:
             return
@@ -214,54 +1134,30 @@ class BitsWidget(QWidget):
         painter.setPen(QPen(Qt.red, 1, Qt.SolidLine))
 
         right = min(
-            (self._row_width - self._h_scrollbar.value()) * self._bit_size,
+            (self._row_width - self._position[1]) * self._bit_size,
             self._bits_area_width,
         )
         bottom = min(
-            (self._num_rows - self._v_scrollbar.value()) * self._bit_size,
+            (self._num_rows - self._position[0]) * self._bit_size,
             self._bits_area_height,
         )
-        self._draw_h_grid(
+        draw_h_grid(
             painter,
             right,
             bottom,
+            self._bit_size,
             self._grid_width,
-            self._grid_h_offset - self._h_scrollbar.value(),
+            self._grid_h_offset - self._position[1],
         )
-        self._draw_v_grid(
+        draw_v_grid(
             painter,
             right,
             bottom,
+            self._bit_size,
             self._grid_height,
-            self._grid_v_offset - self._v_scrollbar.value(),
+            self._grid_v_offset - self._position[0],
         )
 
-    def _create_pixmap(self, data: bytes, width, bytes_per_row: int):
-        height = len(data) // bytes_per_row
-        image = QImage(data, width, height, bytes_per_row, QImage.Format_Mono)
-        image.setColorTable(self._color_table)
-        return QPixmap.fromImage(image).scaled(
-            width * self._bit_size, height * self._bit_size
-        )
-
-    def _draw_h_grid(self, painter, right, bottom, grid_width, grid_offset):
-        if not grid_width:
-            return
-
-        start_offset = grid_offset % grid_width
-        start = start_offset * self._bit_size
-        for x in range(start, right + 1, grid_width * self._bit_size):
-            painter.drawLine(x, 0, x, bottom)
-
-    def _draw_v_grid(self, painter, right, bottom, grid_height, grid_offset):
-        if not grid_height:
-            return
-
-        start_offset = grid_offset % grid_height
-        start = start_offset * self._bit_size
-        for y in range(start, bottom + 1, grid_height * self._bit_size):
-            painter.drawLine(0, y, right, y)
-
     def _set_scrollbars(self):
         self._set_h_scrollbar()
         v_visibility_changed = self._set_v_scrollbar()
@@ -274,11 +1170,11 @@ class BitsWidget(QWidget):
         h_scroll_max = self._calc_h_scrollbar_max()
         was_visible = self._h_scrollbar.isVisible()
         if h_scroll_max > 0:
-            self._h_scrollbar.setMaximum(h_scroll_max)
+            self._h_scrollbar.set_position_maximum(h_scroll_max)
             self._h_scrollbar.show()
             return not was_visible
         else:
-            self._h_scrollbar.setValue(0)
+            self._h_scrollbar.set_position(0)
             self._h_scrollbar.hide()
             return was_visible
 
@@ -286,11 +1182,11 @@ class BitsWidget(QWidget):
         v_scroll_max = self._calc_v_scrollbar_max()
         was_visible = self._v_scrollbar.isVisible()
         if v_scroll_max > 0:
-            self._v_scrollbar.setMaximum(v_scroll_max)
+            self._v_scrollbar.set_position_maximum(v_scroll_max)
             self._v_scrollbar.show()
             return not was_visible
         else:
-            self._v_scrollbar.setValue(0)
+            self._v_scrollbar.set_position(0)
             self._v_scrollbar.hide()
             return was_visible
 
@@ -305,12 +1201,12 @@ class BitsWidget(QWidget):
         y_delta = event.angleDelta().y()
         if y_delta:
             notches = ceil(y_delta / 120)
-            self._v_scrollbar.setValue(self._v_scrollbar.value() - notches)
+            self._v_scrollbar.set_position(self._v_scrollbar.position - notches)
 
         x_delta = event.angleDelta().x()
         if x_delta:
             notches = ceil(x_delta / 120)
-            self._h_scrollbar.setValue(self._h_scrollbar.value() - notches)
+            self._h_scrollbar.set_position(self._h_scrollbar.position - notches)
 
     def mousePressEvent(self, a0: QMouseEvent) -> None:
         if (
@@ -338,6 +1234,29 @@ class BitsWidget(QWidget):
         else:
             self._easter_egg = 0
 
+        # Dragging selects cells, and a click clears the selection. Shift
+        # selects whole rows, from the row clicked.
+        if a0.button() == Qt.LeftButton and not self._zoom_out and self._num_rows:
+            self._selection_anchor = self._cell_at(a0.x(), a0.y())
+            self._select_rows = bool(a0.modifiers() & Qt.ShiftModifier)
+            if self._select_rows:
+                self._select_to(*self._selection_anchor)
+
+    def mouseMoveEvent(self, a0: QMouseEvent) -> None:
+        if self._selection_anchor is None or not a0.buttons() & Qt.LeftButton:
+            return
+        cell = self._cell_at(a0.x(), a0.y())
+        if cell != self._selection_anchor or self._selection is not None:
+            self._select_to(*cell)
+
+    def mouseReleaseEvent(self, a0: QMouseEvent) -> None:
+        if a0.button() != Qt.LeftButton or self._selection_anchor is None:
+            return
+        cell = self._cell_at(a0.x(), a0.y())
+        if cell == self._selection_anchor and not self._select_rows:
+            self._clear_selection()
+        self._selection_anchor = None
+
     def _on_scrollbar_change(self):
         if not self._painting:
-            self.repaint()
+            self._schedule_frame()
@@ -0,0 +1,83 @@
+from typing import Optional
+
+from PyQt5.QtCore import Qt
+from PyQt5.QtWidgets import (
+    QDialog,
+    QPushButton,
+    QVBoxLayout,
+    QHBoxLayout,
+    QWidget,
+    QLabel,
+    QLineEdit,
+)
+
+from frames import Framing, parse_framing
+
+_HELP = (
+    "Rows start where frames start, and the offset is into each frame.\n"
+    "Leave empty for rows of the same width.\n"
+    "\n"
+    "sync:<pattern>\tFrames start at each match, e.g. sync:0x47 or sync:0b01x1\n"
+    "length:<offset>,<bits>[,<adjust>[,<unit>]]\tA length field <offset> bits\n"
+    "\tinto each frame, <bits> wide, of (length + adjust) * unit bits (8 by default)\n"
+    "file:<path>\tA text file with the bit offset of each frame on its own line"
+)
+
+
+class FramesDialog(QDialog):
+    def __init__(self, parent, framing: Optional[Framing]) -> None:
+        super().__init__(parent, Qt.WindowTitleHint | Qt.WindowSystemMenuHint)
+
+        self.setWindowTitle("Frames")
+        self._framing = framing
+        self._spec = QLineEdit(framing.spec if framing is not None else "")
+        self._error = QLabel()
+
+        outer_layout = QVBoxLayout()
+        outer_layout.addWidget(self._create_main())
+        outer_layout.addWidget(self._create_footer())
+
+        self.setLayout(outer_layout)
+
+    @property
+    def framing(self) -> Optional[Framing]:
+        return self._framing
+
+    def _create_main(self):
+        main = QWidget()
+        layout = QVBoxLayout()
+
+        layout.addWidget(QLabel(_HELP))
+        self._spec.returnPressed.connect(self._ok_clicked)
+        layout.addWidget(self._spec)
+        self._error.setStyleSheet("color: red")
+        layout.addWidget(self._error)
+
+        main.setLayout(layout)
+        return main
+
+    def _create_footer(self):
+        footer = QWidget()
+        layout = QHBoxLayout()
+
+        ok_button = QPushButton("Apply")
+        ok_button.clicked.connect(self._ok_clicked)
+        layout.addWidget(ok_button)
+
+        cancel_button = QPushButton("Cancel")
+        cancel_button.clicked.connect(self._cancel_clicked)
+        layout.addWidget(cancel_button)
+
+        footer.setLayout(layout)
+        return footer
+
+    def _ok_clicked(self):
+        try:
+            self._framing = parse_framing(self._spec.text())
+        except ValueError as e:
+            self._error.setText(str(e))
+            return
+        self.accept()
+
+    def _cancel_clicked(self):
+        self.reject()
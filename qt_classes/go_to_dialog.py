@@ -0,0 +1,103 @@
+from typing import Optional
+
+from PyQt5.QtCore import Qt
+from PyQt5.QtWidgets import (
+    QDialog,
+    QPushButton,
+    QVBoxLayout,
+    QHBoxLayout,
+    QWidget,
+    QLabel,
+    QLineEdit,
+    QComboBox,
+)
+
+_UNITS = {"Bit": 1, "Byte": 8}
+
+
+def parse_position(text: str, unit_bits: int) -> int:
+    text = "".join(text.split()).replace("_", "")
+    try:
+        value = int(text, 16) if text[:2].lower() == "0x" else int(text)
+    except ValueError:
+        raise ValueError(
+            "Enter a decimal number, or a hex number starting with 0x"
+        ) from None
+    if value < 0:
+        raise ValueError("The offset can't be negative")
+    return value * unit_bits
+
+
+class GoToDialog(QDialog):
+    def __init__(self, parent, num_bits: int) -> None:
+        super().__init__(parent, Qt.WindowTitleHint | Qt.WindowSystemMenuHint)
+
+        self.setWindowTitle("Go to Offset")
+        self._num_bits = num_bits
+        self._position: Optional[int] = None
+        self._offset = QLineEdit()
+        self._unit = QComboBox()
+        self._error = QLabel()
+
+        outer_layout = QVBoxLayout()
+        outer_layout.addWidget(self._create_main())
+        outer_layout.addWidget(self._create_footer())
+
+        self.setLayout(outer_layout)
+
+    @property
+    def position(self) -> Optional[int]:
+        return self._position
+
+    def _create_main(self):
+        main = QWidget()
+        layout = QVBoxLayout()
+
+        layout.addWidget(QLabel(f"Offset, of {self._num_bits:,} bits:"))
+        row = QWidget()
+        row_layout = QHBoxLayout()
+        row_layout.setContentsMargins(0, 0, 0, 0)
+        self._offset.setPlaceholderText("e.g. 1024 or 0x400")
+        self._offset.returnPressed.connect(self._ok_clicked)
+        row_layout.addWidget(self._offset, stretch=1)
+        self._unit.addItems(list(_UNITS))
+        row_layout.addWidget(self._unit)
+        row.setLayout(row_layout)
+        layout.addWidget(row)
+        self._error.setStyleSheet("color: red")
+        layout.addWidget(self._error)
+
+        main.setLayout(layout)
+        return main
+
+    def _create_footer(self):
+        footer = QWidget()
+        layout = QHBoxLayout()
+
+        ok_button = QPushButton("Go")
+        ok_button.clicked.connect(self._ok_clicked)
+        layout.addWidget(ok_button)
+
+        cancel_button = QPushButton("Cancel")
+        cancel_button.clicked.connect(self._cancel_clicked)
+        layout.addWidget(cancel_button)
+
+        footer.setLayout(layout)
+        return footer
+
+    def _ok_clicked(self):
+        try:
+            position = parse_position(
+                self._offset.text(), _UNITS[self._unit.currentText()]
+            )
+        except ValueError as e:
+            self._error.setText(str(e))
+            return
+        if position >= self._num_bits:
+            self._error.setText("The offset is past the end of the data")
+            return
+        self._position = position
+        self.accept()
+
+    def _cancel_clicked(self):
+        self.reject()
@@ -1,24 +1,46 @@
 import json
 from dataclasses import asdict
-from os.path import exists
+from io import BytesIO
+from os.path import abspath, exists
 
+from PyQt5.QtCore import QMimeData, Qt
 from PyQt5.QtWidgets import (
+    QApplication,
     QMainWindow,
     QVBoxLayout,
     QHBoxLayout,
     QWidget,
     QLabel,
     QSpinBox,
+    QComboBox,
     QAction,
     QFileDialog,
+    QProgressBar,
+    QPushButton,
 )
 
+from analysis_cache import AnalysisCache
 from qt_classes.bits_widget import BitsWidget
+from qt_classes.frames_dialog import FramesDialog
+from qt_classes.go_to_dialog import GoToDialog
+from qt_classes.row_width_dialog import RowWidthDialog
+from qt_classes.search_dialog import SearchDialog
 from qt_classes.settings_dialog import SettingsDialog
+from qt_classes.transforms_dialog import TransformsDialog
+from renderer import SYMBOL_BITS
 from settings import Settings
 
 _SETTINGS_FILE = "settings.json"
+_CACHE_DIRECTORY = "analysis_cache"
 _MAX_BIT_SIZE = 100
+_MAX_ZOOM_OUT = 40
+_MAX_COMPARE_SHIFT = 2**31 - 1
+_MESSAGE_MS = 3000
+_MB = 2**20
+# Larger selections are exported to a file instead.
+_MAX_CLIPBOARD_BYTES = 16 * _MB
+_CHROME_TRACE = "Chrome Trace (*.json)"
+_EVENTS_TRACE = "Frame Events (*.json)"
 
 
 class MainWindow(QMainWindow):
@@ -32,10 +54,21 @@ class MainWindow(QMainWindow):
         self._offset_spin_box = QSpinBox()
         self._row_width_spin_box = QSpinBox()
         self._bit_size_spin_box = QSpinBox()
+        self._symbol_bits_combo_box = QComboBox()
+        self._zoom_out_spin_box = QSpinBox()
         self._grid_width_spin_box = QSpinBox()
         self._grid_h_offset_spin_box = QSpinBox()
         self._grid_height_spin_box = QSpinBox()
         self._grid_v_offset_spin_box = QSpinBox()
+        self._compare_shift_label = QLabel(text="Compare Shift:")
+        self._compare_shift_spin_box = QSpinBox()
+        self._loading_progress_bar = QProgressBar()
+        self._cancel_loading_button = QPushButton("Cancel")
+        # The last difference jumped to.
+        self._difference = None
+        self._analysis_cache = AnalysisCache(
+            _CACHE_DIRECTORY, settings.analysis_cache_mb * _MB
+        )
         self._bits_widget = BitsWidget(
             0,
             settings.bit_size,
@@ -43,7 +76,30 @@ class MainWindow(QMainWindow):
             0,
             0,
             self._settings_dialog.min_bit_size_borders - 1,
+            settings.tile_cache_mb * _MB,
+            self._analysis_cache,
+        )
+
+        self._bits_widget.index_progress.connect(self._on_index_progress)
+        self._bits_widget.index_finished.connect(self._on_index_finished)
+        self._bits_widget.difference_index_progress.connect(
+            self._on_difference_index_progress
         )
+        self._bits_widget.difference_index_finished.connect(
+            self._on_difference_index_finished
+        )
+        self._bits_widget.overview_progress.connect(self._on_overview_progress)
+        self._bits_widget.overview_finished.connect(self._on_overview_finished)
+        self._bits_widget.frame_index_progress.connect(self._on_frame_index_progress)
+        self._bits_widget.frame_index_finished.connect(self._on_frame_index_finished)
+        self._bits_widget.selection_changed.connect(self._on_selection_changed)
+        self._bits_widget.export_progress.connect(self._on_export_progress)
+        self._bits_widget.export_finished.connect(self._on_export_finished)
+
+        self._bits_widget.statistics_bar.position_clicked.connect(self._go_to_bit)
+
+        self._search_dialog = SearchDialog(self)
+        self._search_dialog.match_selected.connect(self._on_match_selected)
 
         self._init_main_window(settings.row_width, settings.bit_size, 0, 0)
         self._create_menu()
@@ -62,6 +118,17 @@ class MainWindow(QMainWindow):
         layout.addWidget(self._header)
         layout.addWidget(self._bits_widget, stretch=1)
         root.setLayout(layout)
+        self._init_status_bar()
+
+    def _init_status_bar(self):
+        self._loading_progress_bar.setMaximumWidth(150)
+        self._cancel_loading_button.setToolTip(
+            "Stop loading in the background, keeping what was loaded so far"
+        )
+        self._cancel_loading_button.clicked.connect(self._on_cancel_loading)
+        self.statusBar().addPermanentWidget(self._loading_progress_bar)
+        self.statusBar().addPermanentWidget(self._cancel_loading_button)
+        self._update_loading()
 
     def _create_menu(self):
         open_file = QAction(text="&Open", parent=self)
@@ -71,13 +138,126 @@ class MainWindow(QMainWindow):
         settings = QAction(text="&Setting", parent=self)
         settings.triggered.connect(self._open_settings)
 
+        export_bits = QAction(text="&Export Selected Bits...", parent=self)
+        export_bits.setShortcut("Ctrl+Shift+E")
+        export_bits.setToolTip("Writes the selected bits one after the other")
+        export_bits.triggered.connect(lambda: self._on_export_selection(True))
+
+        export_rectangle = QAction(text="Export Selected &Rectangle...", parent=self)
+        export_rectangle.setToolTip("Writes each selected row padded to whole bytes")
+        export_rectangle.triggered.connect(lambda: self._on_export_selection(False))
+
+        copy_bits = QAction(text="&Copy Selected Bits", parent=self)
+        copy_bits.setShortcut("Ctrl+C")
+        copy_bits.triggered.connect(self._on_copy_selection)
+
         file_menu = self.menuBar().addMenu("&File")
         file_menu.addAction(open_file)
+        file_menu.addAction(export_bits)
+        file_menu.addAction(export_rectangle)
+        file_menu.addAction(copy_bits)
         file_menu.addAction(settings)
 
+        detect_row_width = QAction(text="Detect &Row Width", parent=self)
+        detect_row_width.setShortcut("Ctrl+R")
+        detect_row_width.triggered.connect(self._on_detect_row_width)
+
+        find_bit_pattern = QAction(text="&Find Bit Pattern", parent=self)
+        find_bit_pattern.setShortcut("Ctrl+F")
+        find_bit_pattern.triggered.connect(self._on_find_bit_pattern)
+
+        follow = QAction(text="&Follow File", parent=self)
+        follow.setShortcut("Ctrl+T")
+        follow.setCheckable(True)
+        follow.setToolTip("Show data appended to the file while it is being written")
+        follow.toggled.connect(self._on_follow_toggled)
+
+        auto_scroll = QAction(text="&Auto Scroll to End", parent=self)
+        auto_scroll.setCheckable(True)
+        auto_scroll.toggled.connect(self._on_auto_scroll_toggled)
+
+        transforms = QAction(text="&Transforms...", parent=self)
+        transforms.setShortcut("Ctrl+K")
+        transforms.triggered.connect(self._on_transforms)
+
+        frames = QAction(text="Fra&mes...", parent=self)
+        frames.setShortcut("Ctrl+L")
+        frames.setToolTip("Starts rows where frames of different lengths start")
+        frames.triggered.connect(self._on_frames)
+
+        go_to = QAction(text="&Go to Offset...", parent=self)
+        go_to.setShortcut("Ctrl+G")
+        go_to.triggered.connect(self._on_go_to)
+
+        frame_times = QAction(text="Frame Times &Overlay", parent=self)
+        frame_times.setCheckable(True)
+        frame_times.toggled.connect(self._on_frame_times_toggled)
+
+        record_trace = QAction(text="&Record Frame Trace", parent=self)
+        record_trace.setCheckable(True)
+        record_trace.setToolTip("Saves the recorded trace when unchecked")
+        record_trace.toggled.connect(self._on_record_trace_toggled)
+
+        statistics_bar = QAction(text="&Entropy Sidebar", parent=self)
+        statistics_bar.setShortcut("Ctrl+E")
+        statistics_bar.setCheckable(True)
+        statistics_bar.setToolTip(
+            "Shows the entropy and the density of ones of the whole data"
+        )
+        statistics_bar.toggled.connect(self._bits_widget.statistics_bar.setVisible)
+
+        view_menu = self.menuBar().addMenu("&View")
+        view_menu.addAction(go_to)
+        view_menu.addAction(follow)
+        view_menu.addAction(auto_scroll)
+        view_menu.addAction(transforms)
+        view_menu.addAction(frames)
+        view_menu.addAction(statistics_bar)
+        view_menu.addSeparator()
+        view_menu.addAction(frame_times)
+        view_menu.addAction(record_trace)
+
+        analysis_menu = self.menuBar().addMenu("&Analysis")
+        analysis_menu.addAction(detect_row_width)
+        analysis_menu.addAction(find_bit_pattern)
+
+        self._create_compare_menu()
+
+    def _create_compare_menu(self):
+        compare_with = QAction(text="&Compare With...", parent=self)
+        compare_with.setShortcut("Ctrl+D")
+        compare_with.setToolTip("Shows the XOR of the open file and another file")
+        compare_with.triggered.connect(self._on_compare_with)
+
+        close_compare = QAction(text="C&lose Comparison", parent=self)
+        close_compare.triggered.connect(self._on_close_compare)
+
+        next_difference = QAction(text="&Next Difference", parent=self)
+        next_difference.setShortcut("F8")
+        next_difference.triggered.connect(lambda: self._jump_to_difference(True))
+
+        previous_difference = QAction(text="&Previous Difference", parent=self)
+        previous_difference.setShortcut("Shift+F8")
+        previous_difference.triggered.connect(lambda: self._jump_to_difference(False))
+
+        show_missing = QAction(text="Show &Missing Bits", parent=self)
+        show_missing.setCheckable(True)
+        show_missing.setToolTip("Shows bits that only one of the files has in orange")
+        show_missing.toggled.connect(self._on_show_missing_toggled)
+
+        compare_menu = self.menuBar().addMenu("&Compare")
+        compare_menu.addAction(compare_with)
+        compare_menu.addAction(close_compare)
+        compare_menu.addSeparator()
+        compare_menu.addAction(next_difference)
+        compare_menu.addAction(previous_difference)
+        compare_menu.addAction(show_missing)
+
     def _init_settings(self, settings):
         self._settings_dialog.max_bytes = settings.max_bytes
         self._settings_dialog.min_bit_size_borders = settings.bit_borders_start
+        self._settings_dialog.tile_cache_mb = settings.tile_cache_mb
+        self._settings_dialog.analysis_cache_mb = settings.analysis_cache_mb
 
     def _init_header(self, row_width, bit_size, grid_width, grid_height):
         layout = QHBoxLayout()
@@ -110,6 +290,30 @@ class MainWindow(QMainWindow):
 
         layout.addSpacing(10)
 
+        layout.addWidget(QLabel(text="Symbol Bits:"))
+        for symbol_bits in SYMBOL_BITS:
+            self._symbol_bits_combo_box.addItem(str(symbol_bits), symbol_bits)
+        self._symbol_bits_combo_box.setToolTip("Each cell shows a symbol of n bits")
+        self._symbol_bits_combo_box.currentIndexChanged.connect(
+            self._on_symbol_bits_change
+        )
+        layout.addWidget(self._symbol_bits_combo_box)
+
+        layout.addSpacing(10)
+
+        layout.addWidget(QLabel(text="Zoom Out:"))
+        self._zoom_out_spin_box.setMinimum(0)
+        self._zoom_out_spin_box.setMaximum(_MAX_ZOOM_OUT)
+        self._zoom_out_spin_box.setSpecialValueText("Off")
+        self._zoom_out_spin_box.setValue(0)
+        self._zoom_out_spin_box.setToolTip(
+            "Each cell shows the density of ones in a block of 2^(n-1) bytes"
+        )
+        self._zoom_out_spin_box.valueChanged.connect(self._on_zoom_out_change)
+        layout.addWidget(self._zoom_out_spin_box)
+
+        layout.addSpacing(10)
+
         layout.addWidget(QLabel(text="Grid Width:"))
         self._grid_width_spin_box.setMinimum(0)
         self._grid_width_spin_box.setMaximum(10240)
@@ -148,50 +352,413 @@ class MainWindow(QMainWindow):
         self._grid_v_offset_spin_box.valueChanged.connect(self._on_grid_v_offset_change)
         layout.addWidget(self._grid_v_offset_spin_box)
 
+        layout.addSpacing(10)
+
+        layout.addWidget(self._compare_shift_label)
+        self._compare_shift_spin_box.setMinimum(-_MAX_COMPARE_SHIFT)
+        self._compare_shift_spin_box.setMaximum(_MAX_COMPARE_SHIFT)
+        self._compare_shift_spin_box.setValue(0)
+        self._compare_shift_spin_box.setToolTip(
+            "Bit i of the compared file is compared to bit i + n of the open file"
+        )
+        self._compare_shift_spin_box.valueChanged.connect(self._on_compare_shift_change)
+        layout.addWidget(self._compare_shift_spin_box)
+        self._set_compare_shift_visible(False)
+
         layout.addStretch()
         self._header.setLayout(layout)
 
     def _on_offset_change(self):
         self._bits_widget.offset = self._offset_spin_box.value()
-        self._bits_widget.repaint()
+        self._bits_widget.schedule_repaint()
 
     def _on_row_width_change(self):
         self._bits_widget.row_width = self._row_width_spin_box.value()
-        self._bits_widget.repaint()
+        self._bits_widget.schedule_repaint()
 
     def _on_bit_size_change(self):
         self._bits_widget.bit_size = self._bit_size_spin_box.value()
-        self._bits_widget.repaint()
+        self._bits_widget.schedule_repaint()
+
+    def _on_symbol_bits_change(self):
+        self._bits_widget.symbol_bits = self._symbol_bits_combo_box.currentData()
+        self._bits_widget.schedule_repaint()
+
+    def _on_zoom_out_change(self):
+        self._bits_widget.zoom_out = self._zoom_out_spin_box.value()
+        self._bits_widget.schedule_repaint()
 
     def _on_grid_width_change(self):
         self._bits_widget.grid_width = self._grid_width_spin_box.value()
         self._grid_h_offset_spin_box.setMaximum(
             max(self._grid_width_spin_box.value() - 1, 0)
         )
-        self._bits_widget.repaint()
+        self._bits_widget.schedule_repaint()
 
     def _on_grid_h_offset_change(self):
         self._bits_widget.grid_h_offset = self._grid_h_offset_spin_box.value()
-        self._bits_widget.repaint()
+        self._bits_widget.schedule_repaint()
 
     def _on_grid_height_change(self):
         self._bits_widget.grid_height = self._grid_height_spin_box.value()
         self._grid_v_offset_spin_box.setMaximum(
             max(self._grid_height_spin_box.value() - 1, 0)
         )
-        self._bits_widget.repaint()
+        self._bits_widget.schedule_repaint()
 
     def _on_grid_v_offset_change(self):
         self._bits_widget.grid_v_offset = self._grid_v_offset_spin_box.value()
-        self._bits_widget.repaint()
+        self._bits_widget.schedule_repaint()
+
+    def _on_compare_shift_change(self):
+        self._bits_widget.compare_shift = self._compare_shift_spin_box.value()
+        self._difference = None
+        self._bits_widget.schedule_repaint()
 
     def _on_open_file(self):
         filename, _ = QFileDialog.getOpenFileName(self, "Open File")
         if not filename:
             return
+        self.open_file(filename)
+
+    def open_file(self, filename, offset=None, row_width=None, bit_size=None):
+        # The first screen is shown right away, while the rest of the file is
+        # indexed and summarized in the background. The given values override
+        # the view the file was last closed with.
+        self._save_view_state()
+        try:
+            self._bits_widget.load_file(filename, self._settings_dialog.max_bytes)
+        except OSError as e:
+            self._update_search_file()
+            self._update_loading()
+            self._bits_widget.schedule_repaint()
+            self.statusBar().showMessage(
+                f"Could not open {filename}: {e.strerror or e}"
+            )
+            return
+        self._set_compare_shift_visible(False)
+        self._update_search_file()
+        self._restore_view_state()
+        for value, spin_box in (
+            (row_width, self._row_width_spin_box),
+            (bit_size, self._bit_size_spin_box),
+        ):
+            if value is not None:
+                spin_box.setValue(value)
+        if offset is not None:
+            self._set_offset(offset)
+        self._update_loading()
+        self._bits_widget.schedule_repaint()
+
+    def _save_view_state(self):
+        filename = self._bits_widget.filename
+        if filename is None:
+            return
+        state = {name: spin_box.value() for name, spin_box in self._view_spin_boxes()}
+        state["offset"] = self._offset_spin_box.value()
+        self._analysis_cache.save_json(("view", abspath(filename)), "view", state)
+
+    def _restore_view_state(self):
+        # The view of the file as it was last closed, even if it changed since.
+        key = ("view", abspath(self._bits_widget.filename))
+        state = self._analysis_cache.load_json(key, "view")
+        if not isinstance(state, dict):
+            return
+        for name, spin_box in self._view_spin_boxes():
+            if isinstance(state.get(name), int):
+                spin_box.setValue(state[name])
+        if isinstance(state.get("offset"), int):
+            self._set_offset(state["offset"])
+
+    def _set_offset(self, offset):
+        # Shows the bit at offset first. Offsets past the range of the offset box
+        # are scrolled to, as by Go to Offset, with the offset box set so that a
+        # row starts there.
+        if offset > self._offset_spin_box.maximum():
+            offset, position = offset % self._row_width_spin_box.value(), offset
+        else:
+            position = offset
+        self._offset_spin_box.setValue(offset)
+        self._bits_widget.scroll_to_bit(position, at_top=True)
+
+    def _view_spin_boxes(self):
+        # Each grid size comes before its offset, which it limits. The offset is
+        # set by _set_offset(), after the row width.
+        return [
+            ("row_width", self._row_width_spin_box),
+            ("bit_size", self._bit_size_spin_box),
+            ("grid_width", self._grid_width_spin_box),
+            ("grid_h_offset", self._grid_h_offset_spin_box),
+            ("grid_height", self._grid_height_spin_box),
+            ("grid_v_offset", self._grid_v_offset_spin_box),
+        ]
+
+    def _on_compare_with(self):
+        if self._bits_widget.filename is None:
+            return
+        filename, _ = QFileDialog.getOpenFileName(self, "Compare With")
+        if not filename:
+            return
+
+        self._bits_widget.load_compare_file(filename, self._settings_dialog.max_bytes)
+        self._difference = None
+        self._set_compare_shift_visible(True)
+        self._bits_widget.schedule_repaint()
+
+    def _on_close_compare(self):
+        if not self._bits_widget.is_comparing:
+            return
+        self._bits_widget.close_compare()
+        self._difference = None
+        self._set_compare_shift_visible(False)
+        self.statusBar().clearMessage()
+        self._bits_widget.schedule_repaint()
+
+    def _set_compare_shift_visible(self, visible):
+        self._compare_shift_label.setVisible(visible)
+        self._compare_shift_spin_box.setVisible(visible)
+
+    def _on_show_missing_toggled(self, checked):
+        self._bits_widget.show_missing = checked
+        self._bits_widget.schedule_repaint()
+
+    def _on_difference_index_progress(self, percent):
+        self.statusBar().showMessage(f"Indexing differences: {percent}%")
+        self._update_loading(percent)
+
+    def _on_difference_index_finished(self):
+        self._update_loading()
+        index = self._bits_widget.difference_index
+        if index is None:
+            return
+        self.statusBar().showMessage(
+            f"{len(index):,} differing regions, {index.differing_bits:,} bits"
+        )
+
+    def _jump_to_difference(self, forward):
+        index = self._bits_widget.difference_index
+        if index is None:
+            if self._bits_widget.is_indexing_differences:
+                self.statusBar().showMessage(
+                    "The differences are still being indexed", _MESSAGE_MS
+                )
+            return
+
+        # From the last difference jumped to, while it is still on screen.
+        first, end = self._bits_widget.visible_bits
+        current = self._difference
+        if current is None or not first <= current < end:
+            current = first - 1 if forward else first
+        position = index.next(current) if forward else index.previous(current)
+        if position is None:
+            self.statusBar().showMessage("No more differences", _MESSAGE_MS)
+            return
+        self._difference = position
+        self._go_to_bit(position)
+
+    def _on_index_progress(self, percent):
+        self.statusBar().showMessage(f"Indexing compressed file: {percent}%")
+        self._update_loading(percent)
+
+    def _on_index_finished(self):
+        self.statusBar().clearMessage()
+        self._update_search_file()
+        self._update_loading()
+
+    def _on_overview_progress(self, percent):
+        self.statusBar().showMessage(f"Building overview: {percent}%")
+        self._update_loading(percent)
+
+    def _on_overview_finished(self):
+        if self.statusBar().currentMessage().startswith("Building overview"):
+            self.statusBar().clearMessage()
+        self._update_loading()
+
+    def _on_frames(self):
+        dialog = FramesDialog(self, self._bits_widget.framing)
+        if dialog.exec():
+            self._bits_widget.set_framing(dialog.framing)
+            self._update_loading()
+            self._bits_widget.schedule_repaint()
+
+    def _on_frame_index_progress(self, percent):
+        self.statusBar().showMessage(f"Indexing frames: {percent}%")
+        self._update_loading(percent)
+
+    def _on_frame_index_finished(self):
+        self._update_loading()
+        error = self._bits_widget.framing_error
+        frame_index = self._bits_widget.frame_index
+        if error is not None:
+            self.statusBar().showMessage(f"Could not index the frames: {error}")
+        elif frame_index is not None:
+            self.statusBar().showMessage(f"{len(frame_index):,} frames")
+
+    def _on_selection_changed(self):
+        selection = self._bits_widget.selection
+        if selection is None:
+            self.statusBar().clearMessage()
+            return
+        rows = selection.last_row - selection.first_row
+        self.statusBar().showMessage(
+            f"Selected {rows:,} rows of {selection.width:,} bits, from row "
+            f"{selection.first_row:,} and bit {selection.first_column:,}"
+        )
+
+    def _on_export_selection(self, realign):
+        if self._bits_widget.selection is None:
+            self.statusBar().showMessage("Select bits to export first", _MESSAGE_MS)
+            return
+        filename, _ = QFileDialog.getSaveFileName(self, "Export Selection")
+        if not filename:
+            return
+        self._bits_widget.export_selection_to_file(filename, realign)
+        self._update_loading()
+
+    def _on_export_progress(self, percent):
+        self.statusBar().showMessage(f"Exporting: {percent}%")
+        self._update_loading(percent)
+
+    def _on_export_finished(self):
+        self._update_loading()
+        error = self._bits_widget.export_error
+        if error is not None:
+            self.statusBar().showMessage(f"Could not export the selection: {error}")
+        else:
+            self.statusBar().showMessage(
+                f"Exported to {self._bits_widget.export_filename}"
+            )
+
+    def _on_copy_selection(self):
+        # The bits as hex text, and as raw bytes for applications that take
+        # them.
+        selection = self._bits_widget.selection
+        if selection is None:
+            return
+        rows = selection.last_row - selection.first_row
+        if rows * (selection.width // 8 + 1) > _MAX_CLIPBOARD_BYTES:
+            self.statusBar().showMessage(
+                "The selection is too large for the clipboard, export it instead",
+                _MESSAGE_MS,
+            )
+            return
+        output = BytesIO()
+        self._bits_widget.export_selection(output, True)
+        data = output.getvalue()
+        mime_data = QMimeData()
+        mime_data.setText(data.hex())
+        mime_data.setData("application/octet-stream", data)
+        QApplication.clipboard().setMimeData(mime_data)
+        self.statusBar().showMessage(f"Copied {len(data):,} bytes", _MESSAGE_MS)
+
+    def _on_cancel_loading(self):
+        if not self._bits_widget.is_loading:
+            return
+        self._bits_widget.cancel_loading()
+        self._update_search_file()
+        self._update_loading()
+        self.statusBar().showMessage("Loading cancelled", _MESSAGE_MS)
+        self._bits_widget.schedule_repaint()
+
+    def _update_loading(self, percent=None):
+        # The progress bar and the cancel button are shown while loading.
+        loading = self._bits_widget.is_loading
+        if percent is not None:
+            self._loading_progress_bar.setValue(percent)
+        elif not loading:
+            self._loading_progress_bar.reset()
+        self._loading_progress_bar.setVisible(loading)
+        self._cancel_loading_button.setVisible(loading)
+
+    def _on_follow_toggled(self, checked):
+        self._bits_widget.follow = checked
+        if checked:
+            self._bits_widget.refresh()
+
+    def _on_auto_scroll_toggled(self, checked):
+        self._bits_widget.auto_scroll = checked
+
+    def _on_frame_times_toggled(self, checked):
+        self._bits_widget.profiler.timing = checked
+        self._bits_widget.update()
+
+    def _on_record_trace_toggled(self, checked):
+        profiler = self._bits_widget.profiler
+        profiler.recording = checked
+        if checked:
+            return
+
+        filename, selected_filter = QFileDialog.getSaveFileName(
+            self,
+            "Save Frame Trace",
+            "trace.json",
+            f"{_CHROME_TRACE};;{_EVENTS_TRACE}",
+        )
+        if filename:
+            profiler.save_trace(filename, chrome=selected_filter != _EVENTS_TRACE)
+
+    def _on_detect_row_width(self):
+        QApplication.setOverrideCursor(Qt.WaitCursor)
+        try:
+            result = self._bits_widget.find_row_widths(
+                self._row_width_spin_box.maximum()
+            )
+        finally:
+            QApplication.restoreOverrideCursor()
+        if result is None:
+            return
+
+        dialog = RowWidthDialog(self, result)
+        if dialog.exec() and dialog.row_width is not None:
+            self._row_width_spin_box.setValue(dialog.row_width)
+
+    def _on_find_bit_pattern(self):
+        if self._bits_widget.filename is None:
+            return
+
+        self._update_search_file()
+        self._search_dialog.show()
+        self._search_dialog.raise_()
+        self._search_dialog.activateWindow()
+
+    def _update_search_file(self):
+        self._search_dialog.set_file(
+            self._bits_widget.filename,
+            self._bits_widget.file_num_bytes,
+            self._bits_widget.max_bytes,
+            self._bits_widget.transforms,
+        )
+
+    def _on_transforms(self):
+        dialog = TransformsDialog(self, self._bits_widget.transforms)
+        if dialog.exec():
+            self._bits_widget.set_transforms(dialog.transforms)
+            self._update_search_file()
+            self._bits_widget.schedule_repaint()
+
+    def _on_go_to(self):
+        if not self._bits_widget.num_bytes:
+            return
 
-        self._bits_widget.load_file(filename, self._settings_dialog.max_bytes)
-        self._bits_widget.repaint()
+        dialog = GoToDialog(self, self._bits_widget.num_bytes * 8)
+        if dialog.exec() and dialog.position is not None:
+            self._go_to_bit(dialog.position)
+
+    def _on_match_selected(self, position):
+        self._go_to_bit(position)
+
+    def _go_to_bit(self, position):
+        # The offset is set without repainting, so the view is only painted
+        # once, at the target.
+        offset = self._offset_spin_box.value()
+        if position < offset:
+            offset %= self._row_width_spin_box.value()
+            offset = offset if offset <= position else 0
+            self._offset_spin_box.blockSignals(True)
+            self._offset_spin_box.setValue(offset)
+            self._offset_spin_box.blockSignals(False)
+            self._bits_widget.offset = offset
+        self._bits_widget.scroll_to_bit(position)
 
     def _open_settings(self):
         accepted = self._settings_dialog.exec()
@@ -199,22 +766,31 @@ class MainWindow(QMainWindow):
             settings = Settings(
                 max_bytes=self._settings_dialog.max_bytes,
                 bit_borders_start=self._settings_dialog.min_bit_size_borders,
+                tile_cache_mb=self._settings_dialog.tile_cache_mb,
+                analysis_cache_mb=self._settings_dialog.analysis_cache_mb,
             )
             self._bits_widget.set_bit_border_threshold(settings.bit_borders_start - 1)
+            self._bits_widget.set_tile_cache_size(settings.tile_cache_mb * _MB)
+            self._analysis_cache.max_bytes = settings.analysis_cache_mb * _MB
             self._save_settings(settings)
         else:
             settings = self._load_settings()
-            self._settings_dialog.max_bytes = settings.max_bytes
-            self._settings_dialog.min_bit_size_borders = settings.bit_borders_start
+            self._init_settings(settings)
 
     def closeEvent(self, a0) -> None:
         settings = Settings(
             max_bytes=self._settings_dialog.max_bytes,
             bit_borders_start=self._settings_dialog.min_bit_size_borders,
+            tile_cache_mb=self._settings_dialog.tile_cache_mb,
+            analysis_cache_mb=self._settings_dialog.analysis_cache_mb,
             row_width=self._bits_widget.row_width,
             bit_size=self._bits_widget.bit_size,
         )
         self._save_settings(settings)
+        self._save_view_state()
+        self._bits_widget.stop_indexing()
+        self._bits_widget.save_analysis()
+        self._bits_widget.statistics_bar.stop()
         super().closeEvent(a0)
 
     @staticmethod
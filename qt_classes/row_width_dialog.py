@@ -0,0 +1,79 @@
+from typing import Optional
+
+from PyQt5.QtCore import Qt
+from PyQt5.QtWidgets import (
+    QDialog,
+    QPushButton,
+    QVBoxLayout,
+    QHBoxLayout,
+    QWidget,
+    QLabel,
+    QListWidget,
+    QListWidgetItem,
+)
+
+from autocorrelation import AutocorrelationResult
+
+
+class RowWidthDialog(QDialog):
+    def __init__(self, parent, result: AutocorrelationResult) -> None:
+        super().__init__(parent, Qt.WindowTitleHint | Qt.WindowSystemMenuHint)
+
+        self.setWindowTitle("Detect Row Width")
+        self._candidates = QListWidget()
+
+        outer_layout = QVBoxLayout()
+        outer_layout.addWidget(self._create_main(result))
+        outer_layout.addWidget(self._create_footer())
+
+        self.setLayout(outer_layout)
+
+    @property
+    def row_width(self) -> Optional[int]:
+        item = self._candidates.currentItem()
+        return item.data(Qt.UserRole) if item is not None else None
+
+    def _create_main(self, result: AutocorrelationResult):
+        main = QWidget()
+        layout = QVBoxLayout()
+
+        layout.addWidget(
+            QLabel(
+                f"Analyzed {result.bits_analyzed:,} bits "
+                f"in {result.elapsed:.2f} seconds."
+            )
+        )
+        if not result.periods:
+            layout.addWidget(QLabel("No periodic structure found."))
+
+        for period, score in result.periods:
+            item = QListWidgetItem(f"{period} (correlation {score:.3f})")
+            item.setData(Qt.UserRole, period)
+            self._candidates.addItem(item)
+        self._candidates.setCurrentRow(0)
+        self._candidates.itemDoubleClicked.connect(self._ok_clicked)
+        layout.addWidget(self._candidates)
+
+        main.setLayout(layout)
+        return main
+
+    def _create_footer(self):
+        footer = QWidget()
+        layout = QHBoxLayout()
+
+        ok_button = QPushButton("Apply")
+        ok_button.clicked.connect(self._ok_clicked)
+        layout.addWidget(ok_button)
+
+        cancel_button = QPushButton("Cancel")
+        cancel_button.clicked.connect(self._cancel_clicked)
+        layout.addWidget(cancel_button)
+
+        footer.setLayout(layout)
+        return footer
+
+    def _ok_clicked(self):
+        self.accept()
+
+    def _cancel_clicked(self):
+        self.reject()
@@ -0,0 +1,190 @@
+from math import ceil
+
+from PyQt5.QtCore import Qt, QThread, pyqtSignal
+from PyQt5.QtWidgets import (
+    QDialog,
+    QPushButton,
+    QVBoxLayout,
+    QHBoxLayout,
+    QWidget,
+    QLabel,
+    QLineEdit,
+    QListWidget,
+    QListWidgetItem,
+)
+
+from bit_search import CHUNK_BYTES, BitPattern, parse_pattern, search_file
+
+_MAX_RESULTS = 100000
+
+
+class _SearchThread(QThread):
+    found = pyqtSignal(list, int)
+
+    def __init__(
+        self, filename, size, max_bytes, transforms, pattern: BitPattern
+    ) -> None:
+        super().__init__()
+        self._filename = filename
+        self._size = size
+        self._max_bytes = max_bytes
+        self._transforms = transforms
+        self._pattern = pattern
+        self._stopped = False
+
+    @property
+    def stopped(self) -> bool:
+        return self._stopped
+
+    def stop(self):
+        self._stopped = True
+
+    def run(self):
+        results = search_file(
+            self._filename,
+            self._size,
+            self._pattern,
+            self._max_bytes,
+            self._transforms,
+        )
+        searched = 0
+        try:
+            for positions in results:
+                if self._stopped:
+                    break
+                searched += 1
+                self.found.emit(positions, searched)
+        finally:
+            results.close()
+
+
+class SearchDialog(QDialog):
+    match_selected = pyqtSignal(object)
+
+    def __init__(self, parent) -> None:
+        super().__init__(parent, Qt.WindowTitleHint | Qt.WindowSystemMenuHint)
+
+        self.setWindowTitle("Find Bit Pattern")
+        self._filename = None
+        self._size = 0
+        self._max_bytes = 0
+        self._transforms = []
+        self._thread = None
+        self._num_chunks = 0
+        self._num_results = 0
+
+        self._pattern = QLineEdit()
+        self._search_button = QPushButton("Search")
+        self._stop_button = QPushButton("Stop")
+        self._status = QLabel()
+        self._results = QListWidget()
+
+        outer_layout = QVBoxLayout()
+        outer_layout.addWidget(self._create_header())
+        outer_layout.addWidget(self._status)
+        outer_layout.addWidget(self._results, stretch=1)
+        self.setLayout(outer_layout)
+
+    def set_file(self, filename, size, max_bytes=0, transforms=()):
+        transforms = list(transforms)
+        if (filename, transforms) != (self._filename, self._transforms):
+            self._stop()
+            self._results.clear()
+            self._status.clear()
+        self._filename = filename
+        self._size = size
+        self._max_bytes = max_bytes
+        self._transforms = transforms
+
+    def _create_header(self):
+        header = QWidget()
+        layout = QHBoxLayout()
+        layout.setContentsMargins(0, 0, 0, 0)
+
+        layout.addWidget(QLabel(text="Pattern:"))
+        self._pattern.setToolTip(
+            "Binary starting with 0b (0b1011x01) or hex starting with 0x "
+            "(0x47??1F), where x or ? are don't care bits or nibbles"
+        )
+        self._pattern.returnPressed.connect(self._search)
+        layout.addWidget(self._pattern, stretch=1)
+
+        self._search_button.clicked.connect(self._search)
+        layout.addWidget(self._search_button)
+
+        self._stop_button.clicked.connect(self._stop)
+        self._stop_button.setEnabled(False)
+        layout.addWidget(self._stop_button)
+
+        self._results.currentItemChanged.connect(self._on_result_selected)
+
+        header.setLayout(layout)
+        return header
+
+    def _search(self):
+        if self._filename is None:
+            return
+        try:
+            pattern = parse_pattern(self._pattern.text())
+        except ValueError as e:
+            self._status.setText(str(e))
+            return
+
+        self._stop()
+        self._results.clear()
+        self._num_chunks = ceil(self._size / CHUNK_BYTES)
+        self._num_results = 0
+        self._thread = _SearchThread(
+            self._filename, self._size, self._max_bytes, self._transforms, pattern
+        )
+        self._thread.found.connect(self._on_found)
+        self._thread.finished.connect(self._on_finished)
+        self._search_button.setEnabled(False)
+        self._stop_button.setEnabled(True)
+        self._status.setText("Searching...")
+        self._thread.start()
+
+    def _stop(self):
+        if self._thread is None:
+            return
+        self._thread.stop()
+        self._thread.wait()
+
+    def _on_found(self, positions, searched):
+        if self._thread is None or self.sender() is not self._thread:
+            return
+        for position in positions[: _MAX_RESULTS - self._num_results]:
+            item = QListWidgetItem(
+                f"Bit {position:,} (byte {position // 8:,} + {position % 8})"
+            )
+            item.setData(Qt.UserRole, position)
+            self._results.addItem(item)
+        self._num_results += len(positions)
+        self._status.setText(
+            f"{self._num_results:,} matches, "
+            f"searched {min(searched / max(self._num_chunks, 1), 1):.0%}"
+        )
+        if self._num_results >= _MAX_RESULTS:
+            self._thread.stop()
+
+    def _on_finished(self):
+        if self.sender() is not self._thread:
+            return
+        stopped = self._thread.stopped
+        self._thread = None
+        self._search_button.setEnabled(True)
+        self._stop_button.setEnabled(False)
+        if self._num_results >= _MAX_RESULTS:
+            self._status.setText(f"Stopped after {_MAX_RESULTS:,} matches")
+        elif stopped:
+            self._status.setText(f"Stopped, {self._num_results:,} matches")
+        else:
+            self._status.setText(f"{self._num_results:,} matches")
+
+    def _on_result_selected(self, item):
+        if item is not None:
+            self.match_selected.emit(item.data(Qt.UserRole))
+
+    def done(self, a0):
+        self._stop()
+        super().done(a0)
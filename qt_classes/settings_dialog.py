@@ -17,6 +17,8 @@ class SettingsDialog(QDialog):
         self.setWindowTitle("Settings")
         self._max_bytes_spin_box = QSpinBox()
         self._min_size_bit_border_spin_box = QSpinBox()
+        self._tile_cache_spin_box = QSpinBox()
+        self._analysis_cache_spin_box = QSpinBox()
 
         outer_layout = QVBoxLayout()
         outer_layout.addWidget(self._create_main(max_bit_size))
@@ -40,11 +42,29 @@ class SettingsDialog(QDialog):
     def min_bit_size_borders(self, m: int):
         self._min_size_bit_border_spin_box.setValue(m)
 
+    @property
+    def tile_cache_mb(self) -> int:
+        return self._tile_cache_spin_box.value()
+
+    @tile_cache_mb.setter
+    def tile_cache_mb(self, m: int):
+        self._tile_cache_spin_box.setValue(m)
+
+    @property
+    def analysis_cache_mb(self) -> int:
+        return self._analysis_cache_spin_box.value()
+
+    @analysis_cache_mb.setter
+    def analysis_cache_mb(self, m: int):
+        self._analysis_cache_spin_box.setValue(m)
+
     def _create_main(self, max_bit_size):
         main = QWidget()
         layout = QVBoxLayout()
         layout.addWidget(self._create_max_bytes())
         layout.addWidget(self._create_bit_borders(max_bit_size))
+        layout.addWidget(self._create_tile_cache())
+        layout.addWidget(self._create_analysis_cache())
         main.setLayout(layout)
         return main
 
@@ -69,8 +89,9 @@ class SettingsDialog(QDialog):
 
         layout.addWidget(QLabel("Max bytes to read: "))
 
-        self._max_bytes_spin_box.setMinimum(1)
+        self._max_bytes_spin_box.setMinimum(0)
         self._max_bytes_spin_box.setMaximum(2 ** 30)
+        self._max_bytes_spin_box.setSpecialValueText("Whole file")
         layout.addWidget(self._max_bytes_spin_box)
 
         w.setLayout(layout)
@@ -89,6 +110,36 @@ class SettingsDialog(QDialog):
         w.setLayout(layout)
         return w
 
+    def _create_tile_cache(self):
+        w = QWidget()
+        layout = QHBoxLayout()
+
+        layout.addWidget(QLabel("Tile cache size (MiB): "))
+
+        self._tile_cache_spin_box.setMinimum(1)
+        self._tile_cache_spin_box.setMaximum(2 ** 14)
+        layout.addWidget(self._tile_cache_spin_box)
+
+        w.setLayout(layout)
+        return w
+
+    def _create_analysis_cache(self):
+        w = QWidget()
+        layout = QHBoxLayout()
+
+        layout.addWidget(QLabel("Analysis cache size (MiB): "))
+
+        self._analysis_cache_spin_box.setMinimum(0)
+        self._analysis_cache_spin_box.setMaximum(2 ** 20)
+        self._analysis_cache_spin_box.setSpecialValueText("Off")
+        self._analysis_cache_spin_box.setToolTip(
+            "Keeps overviews, statistics and indexes of files between runs"
+        )
+        layout.addWidget(self._analysis_cache_spin_box)
+
+        w.setLayout(layout)
+        return w
+
     def _ok_clicked(self):
         self.accept()
 
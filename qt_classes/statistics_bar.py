@@ -0,0 +1,220 @@
+from math import ceil
+
+import numpy as np
+from PyQt5.QtCore import QThread, Qt, pyqtSignal
+from PyQt5.QtGui import QColor, QImage, QMouseEvent, QPainter, QPaintEvent, QPen
+from PyQt5.QtWidgets import QToolTip, QWidget
+
+from analysis_cache import AnalysisCache
+from block_statistics import BlockStatistics, compute_statistics, statistics_block_bytes
+
+_COLUMN_WIDTH = 10
+_MAX_ENTROPY = 8
+
+
+class _StatisticsThread(QThread):
+    computed = pyqtSignal(object)
+
+    def __init__(self, filename, size, block_bytes, max_bytes, transforms) -> None:
+        super().__init__()
+        self._filename = filename
+        self._size = size
+        self._block_bytes = block_bytes
+        self._max_bytes = max_bytes
+        self._transforms = transforms
+        self._stopped = False
+
+    def stop(self):
+        self._stopped = True
+
+    def run(self):
+        results = compute_statistics(
+            self._filename,
+            self._size,
+            self._block_bytes,
+            self._max_bytes,
+            self._transforms,
+        )
+        try:
+            for statistics in results:
+                if self._stopped:
+                    break
+                self.computed.emit(statistics)
+        finally:
+            results.close()
+
+
+class StatisticsBar(QWidget):
+    # Shows the entropy (left) and the density of ones (right) of the blocks of
+    # the whole data, from top to bottom like the vertical scroll bar, and the
+    # part of the data in view.
+    position_clicked = pyqtSignal(object)
+
+    def __init__(self) -> None:
+        super().__init__()
+        self.setFixedWidth(2 * _COLUMN_WIDTH)
+        self.setMouseTracking(True)
+        self._file = None
+        self._cache = None
+        self._cache_key = None
+        self._started = None
+        self._thread = None
+        self._size = 0
+        self._block_bytes = 0
+        self._entropy = np.zeros(0)
+        self._density = np.zeros(0)
+        self._view = (0, 0)
+        self._image = None
+
+    def set_cache(self, cache: AnalysisCache):
+        self._cache = cache
+
+    def set_file(self, filename, size, max_bytes, transforms, file_key=None):
+        # The statistics of a file with a key are kept in the cache.
+        file = (filename, size, max_bytes, tuple(transforms))
+        if file == self._file:
+            return
+
+        self.stop()
+        self._file = file
+        self._size = size
+        self._block_bytes = statistics_block_bytes(size)
+        num_blocks = ceil(size / self._block_bytes)
+        self._entropy = np.full(num_blocks, np.nan)
+        self._density = np.full(num_blocks, np.nan)
+        self._image = None
+        self._cache_key = None
+        if self._cache is not None and file_key is not None:
+            self._cache_key = file_key + (size, self._block_bytes)
+            self._load_cached()
+        if self.isVisible():
+            self._start()
+        self.update()
+
+    def _load_cached(self):
+        arrays = self._cache.load(self._cache_key, "statistics")
+        if arrays is None or len(arrays["entropy"]) != len(self._entropy):
+            return
+        self._entropy = arrays["entropy"]
+        self._density = arrays["density"]
+        # Nothing is left to compute.
+        self._started = self._file
+
+    def set_view(self, start_byte, end_byte):
+        if (start_byte, end_byte) != self._view:
+            self._view = (start_byte, end_byte)
+            self.update()
+
+    def stop(self):
+        if self._thread is None:
+            return
+        self._thread.stop()
+        self._thread.wait()
+        self._thread = None
+        self._started = None
+
+    def showEvent(self, a0) -> None:
+        super().showEvent(a0)
+        self._start()
+
+    def _start(self):
+        filename, size, max_bytes, transforms = self._file or (None, 0, 0, ())
+        if not filename or not size or self._started == self._file:
+            return
+
+        self._started = self._file
+        self._thread = _StatisticsThread(
+            filename, size, self._block_bytes, max_bytes, list(transforms)
+        )
+        self._thread.computed.connect(self._on_computed)
+        self._thread.start()
+
+    def _on_computed(self, statistics: BlockStatistics):
+        if self._thread is not self.sender():
+            return
+        end = statistics.first_block + len(statistics.entropy)
+        self._entropy[statistics.first_block : end] = statistics.entropy
+        self._density[statistics.first_block : end] = statistics.density
+        self._image = None
+        self.update()
+        if self._cache_key is not None and not np.isnan(self._entropy).any():
+            arrays = {"entropy": self._entropy, "density": self._density}
+            self._cache.save(self._cache_key, "statistics", arrays)
+
+    def paintEvent(self, a0: QPaintEvent) -> None:
+        super().paintEvent(a0)
+        if not self._size or not self.height():
+            return
+
+        if self._image is None or self._image.height() != self.height():
+            self._image = self._create_image(self.height())
+        painter = QPainter(self)
+        painter.drawImage(0, 0, self._image)
+
+        top, bottom = (self._byte_to_y(byte) for byte in self._view)
+        painter.setPen(QPen(Qt.red, 1))
+        painter.setBrush(Qt.NoBrush)
+        painter.drawRect(0, top, self.width() - 1, max(bottom - top, 1))
+        painter.end()
+
+    def _create_image(self, height) -> QImage:
+        # Each pixel row shows the mean of its blocks. Blocks not computed yet
+        # are left out of the mean, and rows without any are transparent.
+        num_blocks = len(self._entropy)
+        computed = ~np.isnan(self._entropy)
+        if num_blocks >= height:
+            rows = (np.arange(num_blocks) * height // num_blocks)[computed]
+            counts = np.bincount(rows, minlength=height)
+            entropy = np.bincount(rows, self._entropy[computed], height)
+            density = np.bincount(rows, self._density[computed], height)
+        else:
+            # Each block spans several rows.
+            blocks = np.arange(height) * num_blocks // height
+            counts = computed[blocks].astype(np.int64)
+            entropy = np.nan_to_num(self._entropy[blocks])
+            density = np.nan_to_num(self._density[blocks])
+
+        image = QImage(2 * _COLUMN_WIDTH, height, QImage.Format_ARGB32)
+        image.fill(Qt.transparent)
+        painter = QPainter(image)
+        for y in np.flatnonzero(counts).tolist():
+            painter.fillRect(
+                0, y, _COLUMN_WIDTH, 1, _entropy_color(entropy[y] / counts[y])
+            )
+            value = 255 - int(255 * density[y] / counts[y])
+            painter.fillRect(
+                _COLUMN_WIDTH, y, _COLUMN_WIDTH, 1, QColor(value, value, value)
+            )
+        painter.end()
+        return image
+
+    def _byte_to_y(self, byte) -> int:
+        return byte * self.height() // max(self._size, 1)
+
+    def _y_to_block(self, y) -> int:
+        byte = max(y, 0) * self._size // max(self.height(), 1)
+        return min(byte // self._block_bytes, len(self._entropy) - 1)
+
+    def mousePressEvent(self, a0: QMouseEvent) -> None:
+        if a0.button() == Qt.LeftButton and self._size:
+            self.position_clicked.emit(self._y_to_block(a0.y()) * self._block_bytes * 8)
+
+    def mouseMoveEvent(self, a0: QMouseEvent) -> None:
+        if not self._size:
+            return
+
+        block = self._y_to_block(a0.y())
+        start = block * self._block_bytes
+        text = f"Bytes {start:,} to {min(start + self._block_bytes, self._size):,}"
+        if not np.isnan(self._entropy[block]):
+            text += (
+                f"\nEntropy {self._entropy[block]:.3f} bits per byte"
+                f"\nOnes {self._density[block]:.1%}"
+            )
+        QToolTip.showText(a0.globalPos(), text, self)
+
+
+def _entropy_color(entropy) -> QColor:
+    # From blue for constant data, through green, to red for random data.
+    hue = int(240 * (1 - min(entropy / _MAX_ENTROPY, 1)))
+    return QColor.fromHsv(hue, 255, 230)
@@ -0,0 +1,80 @@
+from collections import OrderedDict
+from typing import Hashable, Optional
+
+from PyQt5.QtGui import QPixmap
+
+
+class TileCache:
+    def __init__(self, max_bytes: int) -> None:
+        super().__init__()
+        self._max_bytes = max_bytes
+        self._tiles: "OrderedDict[Hashable, QPixmap]" = OrderedDict()
+        self._memory_used = 0
+        self._hits = 0
+        self._misses = 0
+
+    @property
+    def max_bytes(self) -> int:
+        return self._max_bytes
+
+    @max_bytes.setter
+    def max_bytes(self, max_bytes: int):
+        self._max_bytes = max_bytes
+        self._evict()
+
+    @property
+    def memory_used(self) -> int:
+        return self._memory_used
+
+    @property
+    def hits(self) -> int:
+        return self._hits
+
+    @property
+    def misses(self) -> int:
+        return self._misses
+
+    @property
+    def hit_rate(self) -> float:
+        lookups = self._hits + self._misses
+        return self._hits / lookups if lookups else 0.0
+
+    def __len__(self):
+        return len(self._tiles)
+
+    def __contains__(self, key: Hashable):
+        return key in self._tiles
+
+    def get(self, key: Hashable) -> Optional[QPixmap]:
+        tile = self._tiles.get(key)
+        if tile is None:
+            self._misses += 1
+            return None
+
+        self._hits += 1
+        self._tiles.move_to_end(key)
+        return tile
+
+    def put(self, key: Hashable, tile: QPixmap):
+        if key in self._tiles:
+            self._memory_used -= self._tile_size(self._tiles.pop(key))
+        self._tiles[key] = tile
+        self._memory_used += self._tile_size(tile)
+        self._evict()
+
+    def clear(self):
+        self._tiles.clear()
+        self._memory_used = 0
+
+    def reset_stats(self):
+        self._hits = 0
+        self._misses = 0
+
+    def _evict(self):
+        while self._memory_used > self._max_bytes and len(self._tiles) > 1:
+            _, tile = self._tiles.popitem(last=False)
+            self._memory_used -= self._tile_size(tile)
+
+    @staticmethod
+    def _tile_size(tile: QPixmap) -> int:
+        return tile.width() * tile.height() * tile.depth() // 8
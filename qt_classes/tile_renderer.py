@@ -0,0 +1,371 @@
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Dict, Iterable, Optional, Set, Tuple
+
+import numpy as np
+from PyQt5.QtCore import QLine, QObject, QRect, QRunnable, QThreadPool, Qt, pyqtSignal
+from PyQt5.QtGui import QColor, QImage, QPainter, QPen
+
+from app import App
+from bitmap import thread_bitmap
+from profiler import NO_PROFILER, Profiler
+from renderer import (
+    BACKGROUND,
+    ONE,
+    PALETTE,
+    ZERO,
+    RenderOptions,
+    palette_index,
+    rasterize,
+    symbol_palette,
+)
+
+TILE_PIXELS = 256
+
+
+@dataclass(frozen=True)
+class TileSpec:
+    data_version: int
+    # The number of bits up to the end of the tile's last row, capped to the
+    # data, so tiles at the end of a growing file are rendered again.
+    data_end: int
+    offset: int
+    row_width: int
+    bit_size: int
+    symbol_bits: int
+    bit_borders: bool
+    show_missing: bool
+    color_table: Tuple[int, ...]
+    zoom_out: int
+    tile_row: int
+    tile_column: int
+
+    @property
+    def cells(self) -> int:
+        return cells_per_tile(self.bit_size)
+
+    @property
+    def block_bytes(self) -> int:
+        return zoom_block_bytes(self.zoom_out)
+
+
+def cells_per_tile(bit_size) -> int:
+    return max(TILE_PIXELS // bit_size, 1)
+
+
+def zoom_block_bytes(zoom_out) -> int:
+    return 2 ** (zoom_out - 1) if zoom_out else 0
+
+
+def render_tile(app: App, spec: TileSpec, profiler: Profiler = NO_PROFILER) -> QImage:
+    if spec.zoom_out:
+        with profiler.stage("tile.density"):
+            return _render_density_tile(app, spec)
+
+    if _is_bits_tile(app, spec):
+        with profiler.stage("tile.bits"):
+            image = _render_bits_tile(app, spec)
+        if image is not None:
+            return image
+
+    options = RenderOptions(
+        offset=spec.offset,
+        row_width=spec.row_width,
+        bit_size=spec.bit_size,
+        start_row=spec.tile_row * spec.cells,
+        rows=spec.cells,
+        start_column=spec.tile_column * spec.cells,
+        columns=spec.cells,
+        bit_borders=spec.bit_borders,
+        symbol_bits=spec.symbol_bits,
+        show_missing=spec.show_missing,
+    )
+    try:
+        with profiler.stage("tile.rasterize"):
+            pixels = rasterize(app, options)
+    except ValueError:
+        return QImage()
+
+    color_table = _tile_color_table(spec.color_table, spec.symbol_bits)
+    # Converted here, on the rendering thread, rather than by QPixmap.fromImage
+    # on the GUI thread.
+    with profiler.stage("tile.convert"):
+        if pixels.dtype != np.uint8:
+            # More symbols than an indexed image has colors.
+            colors = np.take(_tile_colors(spec.color_table, spec.symbol_bits), pixels)
+            return _pixels_image(colors, QImage.Format_ARGB32_Premultiplied).copy()
+        image = _pixels_image(pixels, QImage.Format_Indexed8)
+        image.setColorTable(color_table)
+        return image.convertToFormat(QImage.Format_ARGB32_Premultiplied)
+
+
+def _is_bits_tile(app: App, spec: TileSpec) -> bool:
+    return (
+        spec.symbol_bits == 1
+        and not spec.bit_borders
+        and (not spec.show_missing or app.common_bits is None)
+        and app.frame_index is None
+    )
+
+
+def _render_bits_tile(app: App, spec: TileSpec) -> Optional[QImage]:
+    # A tile of whole rows of bits is a one bit image of the packed rows, which
+    # are wrapped as they are and converted and scaled by Qt, without unpacking
+    # them to pixels. Tiles with a partial row are rasterized, returning None.
+    start_column = spec.tile_column * spec.cells
+    bitmap = app.create_bitmap(
+        spec.offset,
+        spec.row_width,
+        start_column,
+        spec.tile_row * spec.cells,
+        spec.cells - 1,
+        min(spec.cells, spec.row_width - start_column),
+        thread_bitmap(),
+    )
+    if (
+        bitmap is None
+        or bitmap.width <= 0
+        or bitmap.num_rows != spec.cells
+        or bitmap.remainder_bits
+    ):
+        return None
+    image = QImage(
+        bitmap.rows.data,
+        bitmap.width,
+        bitmap.num_rows,
+        bitmap.stride,
+        QImage.Format_Mono,
+    )
+    image.setColorTable(_tile_color_table(spec.color_table, 1)[: ONE + 1])
+    image = image.convertToFormat(QImage.Format_ARGB32_Premultiplied)
+    if spec.bit_size > 1:
+        image = image.scaled(
+            bitmap.width * spec.bit_size, bitmap.num_rows * spec.bit_size
+        )
+    return image
+
+
+def _pixels_image(pixels: np.ndarray, image_format) -> QImage:
+    return QImage(
+        pixels.data, pixels.shape[1], pixels.shape[0], pixels.strides[0], image_format
+    )
+
+
+def _render_density_tile(app: App, spec: TileSpec) -> QImage:
+    start_column = spec.tile_column * spec.cells
+    density_map = app.create_density_map(
+        spec.offset,
+        spec.row_width,
+        start_column,
+        spec.tile_row * spec.cells,
+        spec.cells - 1,
+        min(spec.cells, spec.row_width - start_column),
+        spec.block_bytes,
+    )
+    if density_map is None:
+        # Drawn once the overview is built.
+        return QImage()
+    full_rows = len(density_map.data) // density_map.bytes_per_row
+    remainder = density_map.remainder
+    if not full_rows and not remainder:
+        return QImage()
+
+    color_table = _density_color_table(spec.color_table)
+    right = density_map.width * spec.bit_size
+    bottom = full_rows * spec.bit_size
+    image = _create_tile_image(spec, right, bottom, bool(remainder))
+    painter = QPainter(image)
+    if full_rows:
+        densities = QImage(
+            density_map.data,
+            density_map.width,
+            full_rows,
+            density_map.bytes_per_row,
+            QImage.Format_Indexed8,
+        )
+        densities.setColorTable(color_table)
+        painter.drawImage(0, 0, densities.scaled(right, bottom))
+        _draw_bit_separators(painter, spec, right, bottom)
+    if remainder:
+        last_row = QImage(
+            remainder, len(remainder), 1, len(remainder), QImage.Format_Indexed8
+        )
+        last_row.setColorTable(color_table)
+        painter.drawImage(
+            0, bottom, last_row.scaled(len(remainder) * spec.bit_size, spec.bit_size)
+        )
+        if spec.bit_borders:
+            painter.setPen(QPen(Qt.black, 1))
+            painter.setBrush(Qt.NoBrush)
+            painter.drawRects(
+                [
+                    QRect(i * spec.bit_size, bottom, spec.bit_size, spec.bit_size)
+                    for i in range(len(remainder))
+                ]
+            )
+    painter.end()
+    return image
+
+
+def _create_tile_image(spec: TileSpec, right, bottom, has_remainder) -> QImage:
+    image = QImage(
+        right + 1,
+        bottom + has_remainder * spec.bit_size + 1,
+        QImage.Format_ARGB32_Premultiplied,
+    )
+    image.fill(Qt.transparent)
+    return image
+
+
+@lru_cache(maxsize=8)
+def _tile_color_table(color_table, symbol_bits):
+    palette = list(PALETTE)
+    palette[ZERO], palette[ONE] = (QColor(color).getRgb()[:3] for color in color_table)
+    palette = symbol_palette(symbol_bits, tuple(palette))
+    colors = [QColor(*color).rgb() for color in palette]
+    colors[palette_index(symbol_bits, BACKGROUND)] = QColor(Qt.transparent).rgba()
+    return colors
+
+
+@lru_cache(maxsize=8)
+def _tile_colors(color_table, symbol_bits) -> np.ndarray:
+    return np.array(_tile_color_table(color_table, symbol_bits), dtype=np.uint32)
+
+
+@lru_cache(maxsize=8)
+def _density_color_table(color_table):
+    zero, one = QColor(color_table[0]), QColor(color_table[1])
+    return [
+        QColor(
+            zero.red() + (one.red() - zero.red()) * i // 255,
+            zero.green() + (one.green() - zero.green()) * i // 255,
+            zero.blue() + (one.blue() - zero.blue()) * i // 255,
+        ).rgb()
+        for i in range(256)
+    ]
+
+
+def _draw_bit_separators(painter: QPainter, spec: TileSpec, right, bottom):
+    if not spec.bit_borders:
+        return
+
+    painter.setPen(QPen(Qt.black, 1))
+    draw_h_grid(painter, right, bottom, spec.bit_size, 1, 0)
+    draw_v_grid(painter, right, bottom, spec.bit_size, 1, 0)
+
+
+def draw_h_grid(painter, right, bottom, bit_size, grid_width, grid_offset):
+    if not grid_width:
+        return
+
+    start_offset = grid_offset % grid_width
+    start = start_offset * bit_size
+    painter.drawLines(
+        [QLine(x, 0, x, bottom) for x in range(start, right + 1, grid_width * bit_size)]
+    )
+
+
+def draw_v_grid(painter, right, bottom, bit_size, grid_height, grid_offset):
+    if not grid_height:
+        return
+
+    start_offset = grid_offset % grid_height
+    start = start_offset * bit_size
+    painter.drawLines(
+        [
+            QLine(0, y, right, y)
+            for y in range(start, bottom + 1, grid_height * bit_size)
+        ]
+    )
+
+
+class _TileTask(QRunnable):
+    def __init__(self, renderer: "TileRenderer", spec: TileSpec, generation) -> None:
+        super().__init__()
+        self.setAutoDelete(False)
+        self._renderer = renderer
+        self.spec = spec
+        self.generation = generation
+
+    def run(self) -> None:
+        renderer = self._renderer
+        image = None
+        if self.spec in renderer.wanted and self.generation == renderer.generation:
+            try:
+                image = render_tile(renderer.app, self.spec, renderer.profiler)
+            except Exception:
+                # Cancelled tiles may be rendered from data that was replaced.
+                if self.generation == renderer.generation:
+                    raise
+        try:
+            renderer._task_finished.emit(self, image)
+        except RuntimeError:
+            # The renderer was deleted while the tile was being rendered.
+            pass
+
+
+class TileRenderer(QObject):
+    tile_ready = pyqtSignal(object, QImage)
+    _task_finished = pyqtSignal(object, object)
+
+    def __init__(self, app: App, parent=None, profiler: Profiler = NO_PROFILER) -> None:
+        super().__init__(parent)
+        self._app = app
+        self._profiler = profiler
+        self._pool = QThreadPool(self)
+        self._pending: Dict[TileSpec, _TileTask] = {}
+        # Cancelled tasks still running, kept until they finish.
+        self._cancelled: Set[_TileTask] = set()
+        self._generation = 0
+        self._wanted = frozenset()
+        self._task_finished.connect(self._on_task_finished)
+
+    @property
+    def app(self) -> App:
+        return self._app
+
+    @property
+    def profiler(self) -> Profiler:
+        return self._profiler
+
+    @property
+    def wanted(self) -> frozenset:
+        return self._wanted
+
+    @property
+    def generation(self) -> int:
+        return self._generation
+
+    def is_pending(self, spec: TileSpec) -> bool:
+        return spec in self._pending
+
+    def set_wanted(self, specs: Iterable[TileSpec]):
+        self._wanted = frozenset(specs)
+        for spec, task in list(self._pending.items()):
+            if spec not in self._wanted and self._pool.tryTake(task):
+                del self._pending[spec]
+
+    def request(self, spec: TileSpec, priority=0):
+        if spec in self._pending:
+            return
+
+        task = _TileTask(self, spec, self._generation)
+        self._pending[spec] = task
+        self._pool.start(task, priority)
+
+    def cancel_all(self):
+        # Doesn't wait for the running tiles, whose images are dropped.
+        self._generation += 1
+        self._wanted = frozenset()
+        for task in self._pending.values():
+            if not self._pool.tryTake(task):
+                self._cancelled.add(task)
+        self._pending.clear()
+
+    def _on_task_finished(self, task: _TileTask, image):
+        self._cancelled.discard(task)
+        if task.generation != self._generation:
+            return
+        self._pending.pop(task.spec, None)
+        if image is not None:
+            self.tile_ready.emit(task.spec, image)
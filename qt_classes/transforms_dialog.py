@@ -0,0 +1,86 @@
+from typing import List, Sequence
+
+from PyQt5.QtCore import Qt
+from PyQt5.QtWidgets import (
+    QDialog,
+    QPushButton,
+    QVBoxLayout,
+    QHBoxLayout,
+    QWidget,
+    QLabel,
+    QLineEdit,
+)
+
+from transforms import Transform, format_transforms, parse_transforms
+
+_HELP = (
+    "Transforms applied to the data in order, separated by |, e.g.\n"
+    "skip:1 | manchester | descramble:12,17\n"
+    "\n"
+    "xor:<hex key>\tXOR with a repeating key\n"
+    "invert\tInvert all bits\n"
+    "reverse\tReverse the bits of each byte\n"
+    "nrzi\tDecode transitions to 1 and no transition to 0\n"
+    "manchester[:thomas]\tDecode 01 to 1 and 10 to 0, or the other way around\n"
+    "descramble:<taps>\tSelf-synchronizing descrambler, e.g. 12,17 for 1+x^12+x^17\n"
+    "skip:<bits>\tSkip bits, e.g. to align Manchester bit pairs"
+)
+
+
+class TransformsDialog(QDialog):
+    def __init__(self, parent, transforms: Sequence[Transform]) -> None:
+        super().__init__(parent, Qt.WindowTitleHint | Qt.WindowSystemMenuHint)
+
+        self.setWindowTitle("Transforms")
+        self._transforms = list(transforms)
+        self._chain = QLineEdit(format_transforms(transforms))
+        self._error = QLabel()
+
+        outer_layout = QVBoxLayout()
+        outer_layout.addWidget(self._create_main())
+        outer_layout.addWidget(self._create_footer())
+
+        self.setLayout(outer_layout)
+
+    @property
+    def transforms(self) -> List[Transform]:
+        return list(self._transforms)
+
+    def _create_main(self):
+        main = QWidget()
+        layout = QVBoxLayout()
+
+        layout.addWidget(QLabel(_HELP))
+        self._chain.returnPressed.connect(self._ok_clicked)
+        layout.addWidget(self._chain)
+        self._error.setStyleSheet("color: red")
+        layout.addWidget(self._error)
+
+        main.setLayout(layout)
+        return main
+
+    def _create_footer(self):
+        footer = QWidget()
+        layout = QHBoxLayout()
+
+        ok_button = QPushButton("Apply")
+        ok_button.clicked.connect(self._ok_clicked)
+        layout.addWidget(ok_button)
+
+        cancel_button = QPushButton("Cancel")
+        cancel_button.clicked.connect(self._cancel_clicked)
+        layout.addWidget(cancel_button)
+
+        footer.setLayout(layout)
+        return footer
+
+    def _ok_clicked(self):
+        try:
+            self._transforms = parse_transforms(self._chain.text())
+        except ValueError as e:
+            self._error.setText(str(e))
+            return
+        self.accept()
+
+    def _cancel_clicked(self):
+        self.reject()
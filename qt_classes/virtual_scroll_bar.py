@@ -0,0 +1,76 @@
+from PyQt5.QtCore import pyqtSignal
+from PyQt5.QtWidgets import QAbstractSlider, QScrollBar
+
+# QScrollBar values are 32 bit ints, so larger ranges are scaled onto this one.
+_MAX_VALUE = 2 ** 30
+
+
+class VirtualScrollBar(QScrollBar):
+    # A scroll bar over a position of any size. Dragging the slider maps it onto
+    # the whole range, while steps move the exact position, even where one
+    # slider value covers many positions.
+    position_changed = pyqtSignal()
+
+    def __init__(self, orientation) -> None:
+        super().__init__(orientation)
+        self._position = 0
+        self._maximum = 0
+        self.setMinimum(0)
+        self.actionTriggered.connect(self._on_action)
+        self.valueChanged.connect(self._on_value_changed)
+
+    @property
+    def position(self) -> int:
+        return self._position
+
+    @property
+    def position_maximum(self) -> int:
+        return self._maximum
+
+    def set_position_maximum(self, maximum: int):
+        self._maximum = max(maximum, 0)
+        self.setMaximum(min(self._maximum, _MAX_VALUE))
+        self.set_position(self._position)
+
+    def set_position(self, position: int):
+        position = min(max(position, 0), self._maximum)
+        changed = position != self._position
+        self._position = position
+        self.setValue(self._to_value(position))
+        if changed:
+            self.position_changed.emit()
+
+    def _to_value(self, position) -> int:
+        if self._maximum <= _MAX_VALUE:
+            return position
+        return position * _MAX_VALUE // self._maximum
+
+    def _to_position(self, value) -> int:
+        # Rounded up, so the position maps back to the same value.
+        if self._maximum <= _MAX_VALUE:
+            return value
+        return -(-value * self._maximum // _MAX_VALUE)
+
+    def _on_action(self, action):
+        steps = {
+            QAbstractSlider.SliderSingleStepAdd: self.singleStep(),
+            QAbstractSlider.SliderSingleStepSub: -self.singleStep(),
+            QAbstractSlider.SliderPageStepAdd: self.pageStep(),
+            QAbstractSlider.SliderPageStepSub: -self.pageStep(),
+        }
+        if action not in steps:
+            return
+        position = min(max(self._position + steps[action], 0), self._maximum)
+        if position == self._position:
+            return
+        # The value follows the slider position once the action is done, and
+        # then already matches the new position.
+        self._position = position
+        self.setSliderPosition(self._to_value(position))
+        self.position_changed.emit()
+
+    def _on_value_changed(self, value):
+        if value == self._to_value(self._position):
+            return
+        self._position = min(self._to_position(value), self._maximum)
+        self.position_changed.emit()
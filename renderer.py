@@ -0,0 +1,463 @@
+import os
+import zlib
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from functools import lru_cache
+from math import ceil
+from struct import pack
+from typing import BinaryIO, Optional, Sequence, Tuple
+
+import numpy as np
+
+from app import App
+from bitmap import Bitmap, thread_bitmap
+from frames import Framing
+from transforms import Transform
+
+ZERO, ONE, BORDER, GRID, BACKGROUND, MISSING = range(6)
+PALETTE = [
+    (255, 255, 255),
+    (0, 0, 255),
+    (0, 0, 0),
+    (255, 0, 0),
+    (255, 255, 255),
+    (255, 160, 0),
+]
+GRAYS = [255, 0, 128, 96, 255, 192]
+SYMBOL_BITS = (1, 2, 4, 8)
+_STRIP_PIXELS = 2 ** 24
+# Smaller images, such as the tiles of the viewer, are rendered on the calling
+# thread, where starting threads would cost more than it saves.
+_PARALLEL_PIXELS = 2 ** 21
+_MIN_BAND_PIXELS = 2 ** 18
+# Bands per thread, so threads that finish early take more of the work.
+_BANDS_PER_THREAD = 4
+_PNG_SIGNATURE = b"\x89PNG\r\n\x1a\n"
+_PNG_INDEXED = 3
+_PNG_RGBA = 6
+
+
+@dataclass
+class RenderOptions:
+    offset: int = 0
+    row_width: int = 80
+    bit_size: int = 1
+    start_row: int = 0
+    rows: Optional[int] = None
+    start_column: int = 0
+    columns: Optional[int] = None
+    bit_borders: bool = False
+    grid_width: int = 0
+    grid_h_offset: int = 0
+    grid_height: int = 0
+    grid_v_offset: int = 0
+    # Each cell shows a symbol of this many bits.
+    symbol_bits: int = 1
+    # While comparing files, cells of bits that only one of them has are shown
+    # in their own color.
+    show_missing: bool = False
+
+
+class _Layout:
+    def __init__(self, app: App, options: RenderOptions) -> None:
+        self.options = options
+        symbol_bits = options.symbol_bits
+        if symbol_bits not in SYMBOL_BITS:
+            raise ValueError(f"Symbols must be 1, 2, 4 or 8 bits, not {symbol_bits}")
+        num_cells = max(app.num_bits - options.offset, 0) // symbol_bits
+        total_rows = ceil(num_cells / options.row_width)
+        # Rows start where the frames start, and end with them.
+        self.has_frames = app.frame_index is not None
+        if self.has_frames:
+            total_rows = len(app.frame_index)
+        self.rows = max(total_rows - options.start_row, 0)
+        if options.rows is not None:
+            self.rows = min(self.rows, options.rows)
+        self.columns = max(options.row_width - options.start_column, 0)
+        if options.columns is not None:
+            self.columns = min(self.columns, options.columns)
+        if not self.rows or not self.columns:
+            raise ValueError("Nothing to render in the requested range")
+
+        has_lines = options.bit_borders or options.grid_width or options.grid_height
+        self.right = self.columns * options.bit_size
+        self.bottom = self.rows * options.bit_size
+        self.width = self.right + bool(has_lines)
+        self.height = self.bottom + bool(has_lines)
+
+        self.common_bits = app.common_bits if options.show_missing else None
+        # The symbols are followed by the border, grid, background and missing
+        # indices. The missing color is only there when it can be used.
+        has_missing = self.common_bits is not None
+        num_colors = 2 ** symbol_bits + MISSING - BORDER + has_missing
+        self.palette = symbol_palette(symbol_bits, tuple(PALETTE))[:num_colors]
+        grays = tuple((gray,) for gray in GRAYS)
+        self.grays = symbol_palette(symbol_bits, grays)[:num_colors]
+        self.border, self.grid, self.background, self.missing = (
+            palette_index(symbol_bits, color)
+            for color in (BORDER, GRID, BACKGROUND, MISSING)
+        )
+        self.dtype = np.uint8 if len(self.palette) <= 256 else np.uint16
+
+    @property
+    def is_plain(self) -> bool:
+        options = self.options
+        return (
+            options.bit_size == 1
+            and options.symbol_bits == 1
+            and self.width == self.right
+            and self.common_bits is None
+            and not self.has_frames
+        )
+
+    def strips(self, row_pixels, strip_pixels=_STRIP_PIXELS):
+        strip_rows = max(strip_pixels // (row_pixels * self.options.bit_size), 1)
+        for first_row in range(0, self.rows, strip_rows):
+            yield first_row, min(first_row + strip_rows, self.rows)
+
+
+@lru_cache(maxsize=16)
+def symbol_palette(
+    symbol_bits, palette: Tuple[Tuple[int, ...], ...]
+) -> Tuple[Tuple[int, ...], ...]:
+    # Symbols blend from the color of zero to the color of one, and are followed
+    # by the border, grid, background and missing colors.
+    zero, one = palette[ZERO], palette[ONE]
+    last = 2 ** symbol_bits - 1
+    symbols = [
+        tuple(z + (o - z) * i // last for z, o in zip(zero, one))
+        for i in range(last + 1)
+    ]
+    return tuple(symbols) + palette[BORDER:]
+
+
+def palette_index(symbol_bits, color) -> int:
+    # The index in a symbol palette of a color from BORDER on.
+    return 2 ** symbol_bits + color - BORDER
+
+
+def render(
+    app: App,
+    options: RenderOptions,
+    output: BinaryIO,
+    image_format: str = "png",
+    compress_level: int = 6,
+):
+    _check_format(image_format)
+    _write_image(app, _Layout(app, options), output, image_format, compress_level)
+
+
+def _check_format(image_format):
+    if image_format not in ("png", "pgm"):
+        raise ValueError(f"Unknown image format: {image_format}")
+
+
+def _write_image(app: App, layout: _Layout, output: BinaryIO, image_format, level):
+    if image_format == "png":
+        _write_png(app, layout, output, level)
+    else:
+        _write_pgm(app, layout, output)
+
+
+def rasterize(app: App, options: RenderOptions) -> np.ndarray:
+    layout = _Layout(app, options)
+    if _num_threads(layout) == 1:
+        return _indexed_strip(app, layout, 0, layout.rows)
+    return np.concatenate(list(_iter_bands(app, layout, _indexed_strip, layout.width)))
+
+
+def render_file(
+    filename,
+    output_filename,
+    options: RenderOptions,
+    image_format: Optional[str] = None,
+    max_bytes: int = 0,
+    compress_level: int = 6,
+    transforms: Sequence[Transform] = (),
+    compare_filename: Optional[str] = None,
+    compare_shift: int = 0,
+    framing: Optional[Framing] = None,
+):
+    if image_format is None:
+        image_format = "pgm" if output_filename.lower().endswith(".pgm") else "png"
+    app = App()
+    app.set_transforms(transforms)
+    app.load_file(filename, max_bytes)
+    try:
+        if compare_filename is not None:
+            app.load_compare_file(compare_filename, max_bytes, compare_shift)
+        if not app.is_sized:
+            app.build_index()
+            app.build_compare_index()
+            app.refresh()
+        if framing is not None:
+            app.set_framing(framing)
+            app.build_frame_index()
+            if app.framing_error is not None:
+                raise ValueError(app.framing_error)
+        # Checked before the output is created, so that nothing is left behind
+        # for an empty range or an unknown format.
+        _check_format(image_format)
+        layout = _Layout(app, options)
+        output = open(output_filename, "wb")
+        try:
+            with output:
+                _write_image(app, layout, output, image_format, compress_level)
+        except BaseException:
+            _remove(output_filename)
+            raise
+    finally:
+        app.close()
+
+
+def _remove(filename):
+    try:
+        os.remove(filename)
+    except OSError:
+        pass
+
+
+def _write_png(app: App, layout: _Layout, output: BinaryIO, compress_level):
+    # Without lines to draw and one pixel per bit, the packed rows of the bitmap
+    # are already valid one bit per pixel PNG scanlines.
+    bit_depth, color_type = _png_format(layout)
+    output.write(_PNG_SIGNATURE)
+    _write_png_chunk(
+        output,
+        b"IHDR",
+        pack(">IIBBBBB", layout.width, layout.height, bit_depth, color_type, 0, 0, 0),
+    )
+    alphas = [0 if i == layout.background else 255 for i in range(len(layout.palette))]
+    if color_type == _PNG_INDEXED:
+        palette = layout.palette[: 2 ** bit_depth]
+        _write_png_chunk(output, b"PLTE", bytes(c for color in palette for c in color))
+        if not layout.is_plain:
+            _write_png_chunk(output, b"tRNS", bytes(alphas))
+    else:
+        # More symbols than a PNG palette has colors.
+        rgba = np.array(
+            [color + (alpha,) for color, alpha in zip(layout.palette, alphas)],
+            dtype=np.uint8,
+        )
+
+    compressor = zlib.compressobj(compress_level)
+    previous = None
+    for pixels in _iter_strips(app, layout):
+        if color_type == _PNG_RGBA:
+            pixels = rgba[pixels].reshape(len(pixels), -1)
+        elif bit_depth == 4:
+            pixels = _pack_nibbles(pixels)
+        compressed = compressor.compress(_up_filter(pixels, previous).data)
+        previous = pixels[-1]
+        if compressed:
+            _write_png_chunk(output, b"IDAT", compressed)
+    _write_png_chunk(output, b"IDAT", compressor.flush())
+    _write_png_chunk(output, b"IEND", b"")
+
+
+def _png_format(layout: _Layout) -> Tuple[int, int]:
+    if layout.is_plain:
+        return 1, _PNG_INDEXED
+    if len(layout.palette) <= 16:
+        return 4, _PNG_INDEXED
+    if len(layout.palette) <= 256:
+        return 8, _PNG_INDEXED
+    return 8, _PNG_RGBA
+
+
+def _pack_nibbles(pixels: np.ndarray) -> np.ndarray:
+    if pixels.shape[1] % 2:
+        pixels = np.pad(pixels, ((0, 0), (0, 1)))
+    return (pixels[:, ::2] << 4) | pixels[:, 1::2]
+
+
+def _up_filter(rows: np.ndarray, previous: Optional[np.ndarray]) -> np.ndarray:
+    # Scaled bits repeat every row of pixels bit_size times, and the "Up" filter
+    # turns the repeated rows into zeros, which compress much faster.
+    scanlines = np.empty((len(rows), rows.shape[1] + 1), dtype=np.uint8)
+    scanlines[:, 0] = 2
+    scanlines[:, 1:] = rows
+    scanlines[1:, 1:] -= rows[:-1]
+    if previous is not None:
+        scanlines[0, 1:] -= previous
+    return scanlines
+
+
+def _write_png_chunk(output: BinaryIO, chunk_type: bytes, data: bytes):
+    output.write(pack(">I", len(data)))
+    output.write(chunk_type)
+    output.write(data)
+    output.write(pack(">I", zlib.crc32(data, zlib.crc32(chunk_type))))
+
+
+def _write_pgm(app: App, layout: _Layout, output: BinaryIO):
+    output.write(f"P5\n{layout.width} {layout.height}\n255\n".encode())
+    grays = np.array([gray for gray, in layout.grays], dtype=np.uint8)
+    ones = grays[[ZERO, ONE]]
+    for pixels in _iter_strips(app, layout):
+        if layout.is_plain:
+            pixels = ones[np.unpackbits(pixels, axis=1)[:, : layout.width]]
+        else:
+            pixels = grays[pixels]
+        output.write(pixels.data)
+
+
+def _iter_strips(app: App, layout: _Layout):
+    if layout.is_plain:
+        yield from _iter_bands(app, layout, _packed_strip, ceil(layout.columns / 8))
+    else:
+        yield from _iter_bands(app, layout, _indexed_strip, layout.width)
+
+
+def _iter_bands(app: App, layout: _Layout, strip, row_pixels):
+    # Large images are split into horizontal bands rendered on a thread pool,
+    # where numpy releases the GIL, and yielded in order. Only a few bands are
+    # rendered ahead of the one being written, which bounds the memory used.
+    num_threads = _num_threads(layout)
+    if num_threads == 1:
+        for first_row, last_row in layout.strips(row_pixels):
+            yield strip(app, layout, first_row, last_row)
+        return
+
+    total_pixels = layout.rows * row_pixels * layout.options.bit_size
+    band_pixels = total_pixels // (num_threads * _BANDS_PER_THREAD)
+    band_pixels = min(max(band_pixels, _MIN_BAND_PIXELS), _STRIP_PIXELS)
+    with ThreadPoolExecutor(num_threads) as executor:
+        pending = deque()
+        for first_row, last_row in layout.strips(row_pixels, band_pixels):
+            pending.append(executor.submit(strip, app, layout, first_row, last_row))
+            if len(pending) > num_threads * 2:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+
+
+def _num_threads(layout: _Layout) -> int:
+    if layout.width * layout.height < _PARALLEL_PIXELS:
+        return 1
+    return os.cpu_count() or 1
+
+
+def _create_bitmap(app: App, layout: _Layout, first_row, last_row) -> Bitmap:
+    # Symbols are extracted as rows of bits, into the thread's bitmap, which is
+    # only read until the next strip.
+    options = layout.options
+    symbol_bits = options.symbol_bits
+    return app.create_bitmap(
+        options.offset,
+        options.row_width * symbol_bits,
+        options.start_column * symbol_bits,
+        options.start_row + first_row,
+        last_row - first_row - 1,
+        layout.columns * symbol_bits,
+        thread_bitmap(),
+    )
+
+
+def _packed_strip(app: App, layout: _Layout, first_row, last_row) -> np.ndarray:
+    # The last row is padded with zeros, since a one bit image has no
+    # background color.
+    bitmap = _create_bitmap(app, layout, first_row, last_row)
+    rows = np.zeros((last_row - first_row, bitmap.bytes_per_row), dtype=np.uint8)
+    rows[: bitmap.height] = bitmap.rows[:, : bitmap.bytes_per_row]
+    return rows
+
+
+def _indexed_strip(app: App, layout: _Layout, first_row, last_row) -> np.ndarray:
+    options = layout.options
+    bit_size = options.bit_size
+    symbol_bits = options.symbol_bits
+    bitmap = _create_bitmap(app, layout, first_row, last_row)
+    cells = np.full(
+        (last_row - first_row, layout.columns), layout.background, dtype=layout.dtype
+    )
+    full_rows = bitmap.num_rows
+    if full_rows:
+        symbols = unpack_symbols(bitmap.full_rows, symbol_bits)
+        cells[:full_rows] = symbols[:, : layout.columns]
+    # A partial symbol at the end of the data is not shown.
+    remainder_columns = bitmap.remainder_bits // symbol_bits
+    if remainder_columns:
+        symbols = unpack_symbols(bitmap.remainder[None], symbol_bits)
+        cells[full_rows, :remainder_columns] = symbols[0, :remainder_columns]
+    if bitmap.row_bits is not None:
+        row_columns = bitmap.row_bits[:, None] // symbol_bits
+        cells[:full_rows][np.arange(layout.columns) >= row_columns] = layout.background
+    if layout.common_bits is not None:
+        _mark_missing(app, cells, layout, first_row)
+
+    is_last = last_row == layout.rows
+    height = (last_row - first_row) * bit_size
+    if is_last:
+        height += layout.height - layout.bottom
+    pixels = np.full((height, layout.width), layout.background, dtype=layout.dtype)
+    if bit_size > 1:
+        cells = np.repeat(np.repeat(cells, bit_size, axis=0), bit_size, axis=1)
+    pixels[: len(cells), : layout.right] = cells
+
+    top = first_row * bit_size
+    if options.bit_borders:
+        _draw_borders(pixels, layout, full_rows, remainder_columns, is_last)
+    if options.grid_width:
+        start = (options.grid_h_offset - options.start_column) % options.grid_width
+        pixels[:, start * bit_size :: options.grid_width * bit_size] = layout.grid
+    if options.grid_height:
+        start = (options.grid_v_offset - options.start_row) % options.grid_height
+        step = options.grid_height * bit_size
+        pixels[(start * bit_size - top) % step :: step] = layout.grid
+    return pixels
+
+
+def _mark_missing(app: App, cells: np.ndarray, layout: _Layout, first_row):
+    # Cells with bits outside the common bits of the compared files.
+    options = layout.options
+    symbol_bits = options.symbol_bits
+    common_start, common_end = layout.common_bits
+    starts = app.row_starts(
+        options.offset,
+        options.row_width * symbol_bits,
+        options.start_row + first_row,
+        len(cells),
+    )
+    starts += options.start_column * symbol_bits
+    end_bit = int(starts.max()) + layout.columns * symbol_bits
+    if common_start <= starts.min() and end_bit <= common_end:
+        return
+
+    columns = np.arange(layout.columns, dtype=np.int64) * symbol_bits
+    bits = starts[:, None] + columns
+    missing = (bits < common_start) | (bits + symbol_bits > common_end)
+    cells[missing & (cells != layout.background)] = layout.missing
+
+
+def unpack_symbols(rows: np.ndarray, symbol_bits) -> np.ndarray:
+    # Packed rows of bits to rows of symbols, from the most significant bits.
+    if symbol_bits == 1:
+        return np.unpackbits(rows, axis=1)
+    if symbol_bits == 8:
+        return rows
+    per_byte = 8 // symbol_bits
+    symbols = np.empty((len(rows), rows.shape[1] * per_byte), dtype=np.uint8)
+    for i in range(per_byte):
+        shift = 8 - (i + 1) * symbol_bits
+        np.bitwise_and(rows >> shift, 2 ** symbol_bits - 1, out=symbols[:, i::per_byte])
+    return symbols
+
+
+def _draw_borders(pixels, layout: _Layout, full_rows, remainder_columns, is_last):
+    bit_size = layout.options.bit_size
+    full_bottom = full_rows * bit_size
+    border = layout.border
+    pixels[:full_bottom:bit_size, : layout.right + 1] = border
+    pixels[:full_bottom, : layout.right + 1 : bit_size] = border
+
+    if remainder_columns:
+        right = remainder_columns * bit_size
+        pixels[full_bottom, : layout.right + 1] = border
+        pixels[full_bottom : full_bottom + bit_size + 1, : right + 1 : bit_size] = (
+            border
+        )
+        pixels[full_bottom + bit_size, : right + 1] = border
+    elif is_last:
+        pixels[full_bottom, : layout.right + 1] = border
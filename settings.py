@@ -3,7 +3,9 @@ from dataclasses import dataclass
 
 @dataclass
 class Settings:
-    max_bytes: int = 2 ** 20
+    max_bytes: int = 0
     bit_borders_start: int = 3
     row_width: int = 80
     bit_size: int = 10
+    tile_cache_mb: int = 64
+    analysis_cache_mb: int = 512
@@ -0,0 +1,321 @@
+from collections import OrderedDict
+from dataclasses import dataclass
+from math import ceil
+from threading import Lock
+from typing import List, Sequence, Tuple
+
+import numpy as np
+
+from data_source import DataSource
+
+BLOCK_BYTES = 2 ** 14
+DEFAULT_CACHE_BYTES = 2 ** 25
+_BIT_REVERSE = np.array(
+    [int(format(i, "08b")[::-1], 2) for i in range(256)], dtype=np.uint8
+)
+# The second (odd) bit of each of the four bit pairs of a byte.
+_ODD_BITS = np.array(
+    [sum(((i >> (6 - 2 * j)) & 1) << (3 - j) for j in range(4)) for i in range(256)],
+    dtype=np.uint8,
+)
+
+
+class Transform:
+    # Maps the bytes of the data below it to the bytes it outputs. Output bytes
+    # [start, end) are computed from the input bytes in input_range(start, end),
+    # where bytes before the start or past the end of the input are zeros.
+
+    @property
+    def spec(self) -> str:
+        raise NotImplementedError
+
+    def output_size(self, input_size: int) -> int:
+        return input_size
+
+    def input_range(self, start: int, end: int) -> Tuple[int, int]:
+        return start, end
+
+    def apply(self, buf: np.ndarray, start: int, end: int) -> np.ndarray:
+        raise NotImplementedError
+
+
+@dataclass(frozen=True)
+class Xor(Transform):
+    key: bytes
+
+    @property
+    def spec(self) -> str:
+        return f"xor:{self.key.hex()}"
+
+    def apply(self, buf, start, end):
+        key = np.roll(np.frombuffer(self.key, dtype=np.uint8), -(start % len(self.key)))
+        return buf ^ np.resize(key, len(buf))
+
+
+@dataclass(frozen=True)
+class Invert(Transform):
+    @property
+    def spec(self) -> str:
+        return "invert"
+
+    def apply(self, buf, start, end):
+        return ~buf
+
+
+@dataclass(frozen=True)
+class BitReverse(Transform):
+    @property
+    def spec(self) -> str:
+        return "reverse"
+
+    def apply(self, buf, start, end):
+        return _BIT_REVERSE[buf]
+
+
+@dataclass(frozen=True)
+class Nrzi(Transform):
+    # Differential decoding: a bit is 1 where the input changes, and 0 where it
+    # stays the same. The bit before the data is taken as 0.
+
+    @property
+    def spec(self) -> str:
+        return "nrzi"
+
+    def input_range(self, start, end):
+        return start - 1, end
+
+    def apply(self, buf, start, end):
+        return buf[1:] ^ _delayed(buf, 1, 1)
+
+
+@dataclass(frozen=True)
+class Manchester(Transform):
+    # IEEE 802.3 decodes 01 to 1 and 10 to 0, G. E. Thomas the other way around.
+    thomas: bool = False
+
+    @property
+    def spec(self) -> str:
+        return "manchester:thomas" if self.thomas else "manchester"
+
+    def output_size(self, input_size):
+        return input_size // 2
+
+    def input_range(self, start, end):
+        return start * 2, end * 2
+
+    def apply(self, buf, start, end):
+        result = (_ODD_BITS[buf[::2]] << 4) | _ODD_BITS[buf[1::2]]
+        return ~result if self.thomas else result
+
+
+@dataclass(frozen=True)
+class Descramble(Transform):
+    # A self-synchronizing descrambler, where each bit is XORed with the input
+    # bits `taps` bits before it, so it can start anywhere in the data. The
+    # polynomial 1 + x^12 + x^17 has the taps (12, 17).
+    taps: Tuple[int, ...]
+
+    @property
+    def spec(self) -> str:
+        return "descramble:" + ",".join(str(tap) for tap in self.taps)
+
+    @property
+    def _history(self):
+        return ceil(max(self.taps) / 8) + 1
+
+    def input_range(self, start, end):
+        return start - self._history, end
+
+    def apply(self, buf, start, end):
+        history = self._history
+        result = buf[history:].copy()
+        for tap in self.taps:
+            result ^= _delayed(buf, tap, history)
+        return result
+
+
+@dataclass(frozen=True)
+class Skip(Transform):
+    bits: int
+
+    @property
+    def spec(self) -> str:
+        return f"skip:{self.bits}"
+
+    def output_size(self, input_size):
+        return max((input_size * 8 - self.bits) // 8, 0)
+
+    def input_range(self, start, end):
+        return start + self.bits // 8, end + self.bits // 8 + 1
+
+    def apply(self, buf, start, end):
+        shift = self.bits % 8
+        if not shift:
+            return buf[:-1]
+        wide = buf.astype(np.uint16)
+        return ((wide[:-1] << shift | wide[1:] >> (8 - shift)) & 0xFF).astype(np.uint8)
+
+
+def _delayed(buf: np.ndarray, bits: int, first: int) -> np.ndarray:
+    # The bits that are `bits` bits before each byte of buf from `first` on.
+    whole, shift = divmod(bits, 8)
+    wide = buf.astype(np.uint16)
+    low = wide[first - whole : len(buf) - whole]
+    high = wide[first - whole - 1 : len(buf) - whole - 1]
+    return ((high << 8 | low) >> shift).astype(np.uint8)
+
+
+_TRANSFORMS = {
+    "xor": lambda arg: Xor(_parse_key(arg)),
+    "invert": lambda arg: Invert(),
+    "reverse": lambda arg: BitReverse(),
+    "nrzi": lambda arg: Nrzi(),
+    "manchester": lambda arg: Manchester(_parse_convention(arg)),
+    "descramble": lambda arg: Descramble(_parse_taps(arg)),
+    "skip": lambda arg: Skip(_parse_int(arg, "skip")),
+}
+
+
+def parse_transforms(text: str) -> List[Transform]:
+    transforms = []
+    for part in text.split("|"):
+        part = "".join(part.split())
+        if not part:
+            continue
+        name, _, arg = part.partition(":")
+        if name.lower() not in _TRANSFORMS:
+            raise ValueError(f"Unknown transform: {name!r}")
+        transforms.append(_TRANSFORMS[name.lower()](arg))
+    return transforms
+
+
+def format_transforms(transforms: Sequence[Transform]) -> str:
+    return " | ".join(transform.spec for transform in transforms)
+
+
+def _parse_key(arg):
+    text = arg[2:] if arg[:2].lower() == "0x" else arg
+    try:
+        key = bytes.fromhex(text)
+    except ValueError:
+        raise ValueError(f"Invalid hex key: {arg!r}") from None
+    if not key:
+        raise ValueError("xor needs a key, e.g. xor:5A")
+    return key
+
+
+def _parse_convention(arg):
+    if arg.lower() not in ("", "ieee", "thomas"):
+        raise ValueError(f"Unknown Manchester convention: {arg!r}")
+    return arg.lower() == "thomas"
+
+
+def _parse_taps(arg):
+    taps = tuple(_parse_int(tap, "descramble") for tap in arg.split(",") if tap)
+    if not taps or min(taps) <= 0:
+        raise ValueError("descramble needs positive taps, e.g. descramble:12,17")
+    return taps
+
+
+def _parse_int(arg, name):
+    try:
+        value = int(arg, 0)
+    except ValueError:
+        raise ValueError(f"{name} needs an integer argument") from None
+    if value < 0:
+        raise ValueError(f"{name} needs a non negative argument")
+    return value
+
+
+class TransformedDataSource(DataSource):
+    def __init__(
+        self,
+        source: DataSource,
+        transform: Transform,
+        cache_bytes: int = DEFAULT_CACHE_BYTES,
+    ) -> None:
+        super().__init__()
+        self._source = source
+        self._transform = transform
+        self._size = transform.output_size(len(source))
+        self._max_blocks = cache_bytes // BLOCK_BYTES
+        self._blocks: "OrderedDict[int, bytes]" = OrderedDict()
+        self._lock = Lock()
+
+    @property
+    def source(self) -> DataSource:
+        return self._source
+
+    @property
+    def transform(self) -> Transform:
+        return self._transform
+
+    def __len__(self) -> int:
+        return self._size
+
+    def read(self, start: int, size: int) -> bytes:
+        end = min(start + size, self._size)
+        if end <= start:
+            return b""
+        if end - start > self._max_blocks * BLOCK_BYTES // 4:
+            # Without a cache, or for large reads, e.g. while building the
+            # density pyramid, which would only evict the blocks of the view.
+            return self._compute(start, end).tobytes()
+
+        first, last = start // BLOCK_BYTES, (end - 1) // BLOCK_BYTES
+        blocks = b"".join(self._block(i) for i in range(first, last + 1))
+        offset = first * BLOCK_BYTES
+        return blocks[start - offset : end - offset]
+
+    def refresh(self) -> int:
+        old_size = self._size
+        size = self._transform.output_size(self._source.refresh())
+        with self._lock:
+            # The block holding the old end was partial, and any block may be
+            # stale if the data shrank.
+            first_stale = 0 if size < old_size else old_size // BLOCK_BYTES
+            for i in [i for i in self._blocks if i >= first_stale]:
+                del self._blocks[i]
+            self._size = size
+        return size
+
+    def close(self):
+        self._source.close()
+
+    def _block(self, index) -> bytes:
+        with self._lock:
+            block = self._blocks.get(index)
+            if block is not None:
+                self._blocks.move_to_end(index)
+                return block
+
+        start = index * BLOCK_BYTES
+        block = self._compute(start, min(start + BLOCK_BYTES, self._size)).tobytes()
+        with self._lock:
+            self._blocks[index] = block
+            while len(self._blocks) > self._max_blocks:
+                self._blocks.popitem(last=False)
+        return block
+
+    def _compute(self, start, end) -> np.ndarray:
+        in_start, in_end = self._transform.input_range(start, end)
+        buf = np.zeros(in_end - in_start, dtype=np.uint8)
+        first = max(in_start, 0)
+        chunk = self._source.read(first, max(in_end - first, 0))
+        buf[first - in_start : first - in_start + len(chunk)] = np.frombuffer(
+            chunk, dtype=np.uint8
+        )
+        return self._transform.apply(buf, start, end)
+
+
+def apply_transforms(
+    data: DataSource,
+    transforms: Sequence[Transform],
+    cache_bytes: int = DEFAULT_CACHE_BYTES,
+) -> DataSource:
+    # Only the last transform caches its blocks, since each of its blocks reads
+    # the transforms below it once.
+    for i, transform in enumerate(transforms):
+        last = i == len(transforms) - 1
+        data = TransformedDataSource(data, transform, cache_bytes if last else 0)
+    return data